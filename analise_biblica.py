@@ -1,25 +1,49 @@
 import streamlit as st
 import pandas as pd
-import networkx as nx
-import plotly.graph_objects as go
-import plotly.express as px
-from collections import Counter
-import re
+import numpy as np
+import importlib.util
+import io
+import os
 from datetime import datetime
+import time
 import math
-import random
+import uuid
 
-# Tenta importar a nova biblioteca do Google Gen AI
+from entidades import posting_rows, rows_with_all, rows_with_any, top_entities
+from busca import TESTAMENTOS, rank_bm25, search_inverted_index, verse_mask
+from referencias import chapter_rows, verse_rows
+from cache_colunar import content_hash, load_bible_bytes
+from ingestao import SUPPORTED_TYPES
+from dataset import build_dataset, dataset_frame, search_index, ranking_index, vector_index, vectors_ready, vocabulary_curve, passage_context, cooccurrence_table, reading_plan, plan_index, devotional_chapter, explorer_chapter
+from contexto import ORCAMENTO_ASSISTENTE, ORCAMENTO_VERSICULO
+from plano import reading_progress
+from progresso import ProgressStore
+from llm import buffer_lines, generate_cached, stream_cached
+from devocionais import day_text, devotional_get, devotional_prompt, devotional_put, reading_title
+from semantica import similar_verses
+from traducoes import aligned_text, build_translation_store, parse_translations, side_by_side, translation_ranking_index, translation_search_index
+from perfil import PERFIL_PATH, cached, export_json, prometheus_text, rerun_elapsed, rerun_table, serve_prometheus, span, start_rerun
+from linha_tempo import LIMIAR_PONTOS, bin_positions, timeline_bins, timeline_points
+from grafo import LAYOUTS, available_nodes, filter_edges_top, filter_edges_focus, node_count, graph_signature, compute_layout
+
+# Imports pesados ficam dentro das páginas que os usam (networkx no SNA,
+# plotly nos gráficos, google-genai nas páginas de IA): a partida e as outras
+# páginas não pagam por eles. Aqui só se verifica se o google-genai existe.
 try:
-    from google import genai
-    from google.genai import types
-    HAS_GENAI = True
+    HAS_GENAI = importlib.util.find_spec('google.genai') is not None
 except ImportError:
     HAS_GENAI = False
 
 # Configuração da Página
 st.set_page_config(page_title="A Bíblia é o seu caminho", layout="wide", page_icon="📖")
 
+# Perfil opcional (BIBLIA_PERFIL=1 ou ?perfil=1): tempos e caches de cada rerun
+PERFIL_ATIVO = os.environ.get('BIBLIA_PERFIL') == '1' or st.query_params.get('perfil') == '1'
+perfil_rerun = start_rerun(PERFIL_ATIVO)
+erro_metricas = None
+if PERFIL_ATIVO and os.environ.get('BIBLIA_PERFIL_PORTA'):
+    _, erro_metricas = serve_prometheus(int(os.environ['BIBLIA_PERFIL_PORTA']))
+
 # =========================================================
 # 0. ESTILIZAÇÃO (CSS PERSONALIZADO)
 # =========================================================
@@ -235,69 +259,79 @@ st.markdown("""
 # 1. FUNÇÕES DE CARREGAMENTO E PROCESSAMENTO
 # =========================================================
 
-@st.cache_data
+@cached('load_data', st.cache_resource(show_spinner='Processando dados...'))
 def load_data(file):
+    # Camada única de ingestão (CSV/Excel): leitura, validação, tipos compactos e
+    # entidades em CSR, com cache colunar em disco pelo hash do conteúdo.
+    # Devolve um conjunto de dados imutável compartilhado por todas as sessões
+    # (st.cache_resource não copia), com os índices derivados construídos sob demanda.
     try:
-        df = pd.read_csv(file)
-        cols_map = {
-            'Book Name': 'Livro', 'Book Number': 'Livro_ID', 
-            'Chapter': 'Capitulo', 'Verse': 'Versiculo', 
-            'Text': 'Texto', 'Verse ID': 'ID_Global'
-        }
-        df.rename(columns=cols_map, inplace=True, errors='ignore')
-        required_cols = ['Livro', 'Capitulo', 'Versiculo', 'Texto']
-        if not all(col in df.columns for col in required_cols):
-            st.error(f"O arquivo deve conter as colunas: {required_cols}")
-            return None
-        return df
+        data = file.getvalue()
+        df, entity_csr = load_bible_bytes(data, file.name)
+        return build_dataset(df, entity_csr, chave=content_hash(data))
+    except ValueError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Erro ao carregar arquivo: {e}")
         return None
 
-STOPWORDS_PT = set(['a', 'o', 'as', 'os', 'de', 'do', 'da', 'dos', 'das', 'em', 'no', 'na', 'nos', 'nas', 'por', 'pelo', 'pela', 'para', 'que', 'e', 'é', 'era', 'foi', 'com', 'sem', 'seu', 'sua', 'seus', 'suas', 'ele', 'ela', 'eles', 'elas', 'mas', 'ou', 'quando', 'como', 'onde', 'quem', 'porque', 'se', 'eu', 'tu', 'nós', 'vós', 'me', 'te', 'lhe', 'nos', 'vos', 'lhes', 'mim', 'ti', 'si', 'este', 'esta', 'isto', 'esse', 'essa', 'isso', 'aquele', 'aquela', 'aquilo', 'meu', 'teu', 'nosso', 'vosso', 'tua', 'minha', 'nossa', 'vossa', 'senhor', 'deus', 'jesus', 'cristo', 'não', 'eis', 'quis', 'então', 'amém', 'segunda', 'Assim'])
-
-BIG_ENTITIES = ['Deus', 'Jesus', 'Senhor', 'Espírito', 'Moisés', 'Arão', 'Faraó', 'Josué', 'Davi', 'Saul', 'Salomão', 'Elias', 'Eliseu', 'Isaías', 'Jeremias', 'Ezequiel', 'Daniel', 'Pedro', 'Paulo', 'João', 'Tiago', 'Maria', 'José', 'Abraão', 'Isaque', 'Jacó', 'José', 'Judá', 'Pilatos', 'Herodes', 'Judas', 'Timóteo', 'Barnabé', 'Silas', 'Tito', 'Noé', 'Adão', 'Eva', 'Caim', 'Abel', 'Golias', 'Jonas', 'Jó', 'Samuel', 'Absalão', 'Nabucodonosor', 'Calebe']
-
-def simple_entity_extractor(text):
-    if not isinstance(text, str): return []
-    clean_text = re.sub(r'[^\w\s]', '', text)
-    words = clean_text.split()
-    entities = []
-    for i, word in enumerate(words):
-        if word in BIG_ENTITIES:
-            entities.append(word)
-            continue
-        if i > 0 and word[0].isupper() and word.lower() not in STOPWORDS_PT:
-            if len(word) > 2: entities.append(word)
-    return list(set(entities))
-
-@st.cache_data
-def process_entities(df):
-    df['Entidades'] = df['Texto'].apply(simple_entity_extractor)
-    return df
-
-@st.cache_data
-def generate_reading_plan(df):
-    if 'Livro_ID' in df.columns:
-        chapters = df[['Livro_ID', 'Livro', 'Capitulo']].drop_duplicates().sort_values(['Livro_ID', 'Capitulo'])
-    else:
-        chapters = df[['Livro', 'Capitulo']].drop_duplicates()
-        
-    chapters_list = chapters[['Livro', 'Capitulo']].values.tolist()
-    total_chapters = len(chapters_list)
-    
-    random.seed(42)
-    random.shuffle(chapters_list)
-    
-    plan = {}
-    chunk_size = total_chapters / 365
-    current_idx = 0
-    for day in range(1, 366):
-        end_idx = int(day * chunk_size)
-        daily_chapters = chapters_list[current_idx:end_idx]
-        plan[day] = daily_chapters
-        current_idx = end_idx
-    return plan, total_chapters
+@st.cache_resource
+def read_default_file(caminho):
+    with open(caminho, 'rb') as f:
+        return f.read()
+
+def default_file():
+    # Sem upload, usa o arquivo de BIBLIA_ARQUIVO (servidor pré-configurado, benchmark de páginas)
+    caminho = os.environ.get('BIBLIA_ARQUIVO')
+    if not caminho or not os.path.isfile(caminho):
+        return None
+    arquivo = io.BytesIO(read_default_file(caminho))
+    # Caminho absoluto: o cache do Streamlit identifica objetos de arquivo por nome + mtime
+    arquivo.name = os.path.abspath(caminho)
+    return arquivo
+
+@cached('load_translations', st.cache_resource(show_spinner='Carregando traduções...', max_entries=8))
+def load_translations(chave_principal, _df, files):
+    # Outras traduções alinhadas à Bíblia principal pela chave (Livro_ID, Capitulo, Versiculo).
+    # Vários arquivos são lidos em paralelo (processos); o texto só é carregado quando usado.
+    try:
+        traducoes = parse_translations([(f.name, f.getvalue()) for f in files])
+        return build_translation_store(_df, traducoes)
+    except ValueError as e:
+        st.error(str(e))
+        return None
+    except Exception as e:
+        st.error(f"Erro ao carregar traduções: {e}")
+        return None
+
+@cached('get_genai_client', st.cache_resource(max_entries=32))
+def get_genai_client(api_key):
+    # Um cliente por chave, reutilizado entre cliques e sessões
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+@st.cache_resource
+def get_progress_store():
+    # Um pool de conexões e uma thread de escrita para todas as sessões
+    return ProgressStore()
+
+def reader_id():
+    # Identificador do leitor no link (?leitor=...): sobrevive ao refresh e pode ser salvo nos favoritos
+    if 'leitor' not in st.query_params:
+        st.query_params['leitor'] = uuid.uuid4().hex[:12]
+    return st.query_params['leitor']
+
+@cached('load_graph_layout', st.cache_data(max_entries=64))
+def load_graph_layout(assinatura, layout_opt, _G, _pos_anterior=None):
+    # Chave: (assinatura das arestas, layout). O grafo e as posições anteriores
+    # (usadas só como ponto de partida) ficam fora do hash.
+    return compute_layout(_G, layout_opt, _pos_anterior)
+
+def show_chart(fig, secao, **kwargs):
+    # st.plotly_chart serializa a figura inteira a cada rerun: medida à parte no perfil
+    with span(f"{secao}: st.plotly_chart"):
+        return st.plotly_chart(fig, use_container_width=True, **kwargs)
 
 def apply_theme_to_plot(fig, transparent=True, dark_text=False):
     paper_color = 'rgba(0,0,0,0)' if transparent else 'white'
@@ -316,6 +350,39 @@ def apply_theme_to_plot(fig, transparent=True, dark_text=False):
 def fmt_num(num):
     return f"{num:,.0f}".replace(",", ".")
 
+def similar_verses_frame(dataset, df, linha, top_k=10):
+    # "Versículos como este" a partir do rótulo da linha no df
+    posicoes, similaridades = similar_verses(vector_index(dataset), df.index.get_loc(linha), top_k)
+    vizinhos = df.iloc[posicoes][['Livro', 'Capitulo', 'Versiculo', 'Texto']]
+    vizinhos.insert(0, 'Similaridade', similaridades.astype(float).round(3))
+    return vizinhos
+
+def show_profile(rerun):
+    # Painel lateral do perfil; chamado também antes de st.stop(), que encerra o script
+    if rerun is None:
+        return
+    with st.sidebar.expander("⏱️ Perfil deste rerun"):
+        st.metric("Tempo do rerun", f"{rerun_elapsed(rerun) * 1000:.0f} ms")
+        tabela_spans = pd.DataFrame(rerun_table(rerun), columns=['Etapa', 'ms', '% do rerun'])
+        st.dataframe(tabela_spans.round(1), hide_index=True, use_container_width=True)
+        if rerun['caches']:
+            tabela_caches = pd.DataFrame([(nome, acertos, falhas) for nome, (acertos, falhas) in rerun['caches'].items()],
+                                         columns=['Cache', 'Acertos', 'Falhas'])
+            st.dataframe(tabela_caches, hide_index=True, use_container_width=True)
+        c_json, c_prom = st.columns(2)
+        if c_json.button("Gravar JSON", help=f"Totais de todos os reruns em {PERFIL_PATH}"):
+            st.caption(f"Gravado em {export_json()}")
+        c_prom.download_button("Prometheus", prometheus_text(), file_name='biblia_metricas.prom', mime='text/plain')
+    if erro_metricas is not None:
+        st.sidebar.warning(f"Servidor de métricas Prometheus indisponível: {erro_metricas}")
+
+def semantic_lookup_enabled(dataset, key):
+    # O expander não adia a execução: sem vetores prontos (em memória ou no disco,
+    # ver 'python cache_colunar.py seed'), o cálculo só começa quando pedido
+    if vectors_ready(dataset):
+        return True
+    return st.toggle("Calcular vetores semânticos (a primeira vez leva alguns segundos)", key=key)
+
 # =========================================================
 # 2. INTERFACE E NAVEGAÇÃO
 # =========================================================
@@ -323,22 +390,26 @@ def fmt_num(num):
 st.sidebar.markdown("# ✝️ Seu Guia Bíblico")
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📥 Carregar Dados")
-uploaded_file = st.sidebar.file_uploader("Arquivo CSV/Excel", type=['csv', 'xlsx'], label_visibility="collapsed")
+uploaded_file = st.sidebar.file_uploader("Arquivo CSV/Excel", type=SUPPORTED_TYPES, label_visibility="collapsed")
+if uploaded_file is None:
+    uploaded_file = default_file()
 
 if uploaded_file is not None:
-    if uploaded_file.name.endswith('.csv'):
-        df = load_data(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
-        cols_map = {'Book Name': 'Livro', 'Book Number': 'Livro_ID', 'Chapter': 'Capitulo', 'Verse': 'Versiculo', 'Text': 'Texto', 'Verse ID': 'ID_Global'}
-        df.rename(columns=cols_map, inplace=True, errors='ignore')
-
-    if df is not None:
-        with st.spinner('Processando dados...'):
-            if 'Entidades' not in df.columns:
-                df = process_entities(df)
-            
+    dataset = load_data(uploaded_file)
+
+    if dataset is not None:
+        df = dataset_frame(dataset)
+        ref_index = dataset['referencias']
         st.sidebar.success(f"Carregado: {fmt_num(len(df))} versículos")
+        arquivos_traducoes = st.sidebar.file_uploader("Outras traduções (opcional)", type=SUPPORTED_TYPES,
+                                                      accept_multiple_files=True, key='traducoes')
+        traducoes = load_translations(dataset['chave'], dataset['df'], arquivos_traducoes) if arquivos_traducoes else None
+        if traducoes is not None:
+            for nome in traducoes['nomes']:
+                st.sidebar.caption(f"🌐 {nome}: {traducoes['cobertura'][nome]:.0%} dos versículos alinhados")
+            for nome, aviso in traducoes['avisos'].items():
+                st.sidebar.warning(f"{nome}: {aviso}")
+        nome_principal = os.path.basename(uploaded_file.name).rsplit('.', 1)[0]
         st.sidebar.markdown("---")
         
         menu = st.sidebar.radio("Navegação", [
@@ -364,11 +435,13 @@ if uploaded_file is not None:
             st.title("Devocional Anual")
             st.markdown("*Uma jornada aleatória e inspiradora através das escrituras.*")
             
-            plan, total_chapters = generate_reading_plan(df)
+            plan, total_chapters = reading_plan(dataset)
             
-            # Inicializar estado de leitura se não existir
-            if 'read_days' not in st.session_state:
-                st.session_state['read_days'] = []
+            # Inicializar estado de leitura a partir do progresso salvo (uma leitura por sessão e Bíblia)
+            if st.session_state.get('read_days_biblia') != dataset['chave']:
+                st.session_state['read_days'] = get_progress_store().load(reader_id(), dataset['chave'])
+                st.session_state['read_days_biblia'] = dataset['chave']
+                st.session_state.pop('dias_lidos_widget', None)
 
             col_date, col_nav = st.columns([1, 2])
             with col_date:
@@ -387,41 +460,33 @@ if uploaded_file is not None:
             if not todays_chapters:
                 st.info("Nenhuma leitura programada.")
             else:
-                reading_refs = []
-                for book, chap in todays_chapters:
-                    reading_refs.append(f"{book} {chap}")
-                
-                reading_title = ", ".join(reading_refs[:3]) + f" e mais {len(reading_refs)-3}" if len(reading_refs) > 3 else ", ".join(reading_refs)
+                titulo_leitura = reading_title(todays_chapters)
                 
-                st.subheader(f"📖 Leitura de Hoje: {reading_title}")
+                st.subheader(f"📖 Leitura de Hoje: {titulo_leitura}")
                 
                 # --- SISTEMA DE ABAS (INCLUINDO NOVA ABA DE PROGRESSO) ---
                 tab_texto, tab_reflexao, tab_progresso = st.tabs(["Texto Bíblico", "Reflexão com IA", "📈 Meu Progresso"])
                 
-                full_text_devocional = ""
-                
                 with tab_texto:
                     for book, chap in todays_chapters:
                         st.markdown(f"#### {book} {chap}")
-                        subset = df[(df['Livro'] == book) & (df['Capitulo'] == chap)]
-                        text_content = ""
-                        
-                        html_text = ""
-                        for _, row in subset.iterrows():
-                            vers = row['Versiculo']
-                            txt = row['Texto']
-                            text_content += f"{vers}. {txt} "
-                            html_text += f"<div style='margin-bottom: 8px;'><span style='color:#833500; font-weight:bold;'>{vers}.</span> <span style='color:#353535;'>{txt}</span></div>"
-                        
+                        html_text, text_content = devotional_chapter(dataset, book, chap)
                         st.markdown(html_text, unsafe_allow_html=True)
-                        full_text_devocional += f"\n\nTexto de {book} {chap}:\n{text_content}"
                         st.markdown("<hr style='border-color: #c2baa6; opacity: 0.5;'>", unsafe_allow_html=True)
                 
                 with tab_reflexao:
+                    # Devocionais gerados em lote (python devocionais.py gerar ...) têm prioridade
+                    devocional_salvo = devotional_get(dataset['chave'], day_of_year)
                     col_ia_1, col_ia_2 = st.columns([1, 3])
                     with col_ia_1:
                         st.markdown("### ✨ Insights")
-                        if st.button("Gerar Devocional", use_container_width=True):
+                        if devocional_salvo is not None:
+                            st.caption("📦 Reflexão do dia já preparada.")
+                            gerar = st.button("🔄 Gerar Novamente", use_container_width=True,
+                                              help="Pede uma nova reflexão à IA e substitui a guardada")
+                        else:
+                            gerar = st.button("Gerar Devocional", use_container_width=True)
+                        if gerar:
                             if not HAS_GENAI:
                                 st.error("Biblioteca indisponível.")
                             elif not api_key:
@@ -429,22 +494,21 @@ if uploaded_file is not None:
                             else:
                                 try:
                                     with st.spinner("Meditando na palavra..."):
-                                        client = genai.Client(api_key=api_key)
-                                        prompt_devocional = f"""
-                                        Crie um devocional curto e inspirador baseado em: {reading_title}.
-                                        Trechos: {full_text_devocional[:20000]}
-                                        Foque em um tema de união entre os textos ou no texto mais forte.
-                                        Formate com Markdown bonito, usando negrito e itálico.
-                                        Estrutura: Versículo Chave, Reflexão Profunda, Aplicação Prática, Oração.
-                                        """
-                                        response = client.models.generate_content(model='gemini-2.5-flash-lite', contents=prompt_devocional)
-                                        st.session_state['devocional_result'] = response.text
+                                        client = get_genai_client(api_key)
+                                        prompt_devocional = devotional_prompt(titulo_leitura, day_text(dataset, todays_chapters))
+                                        with span("devocional: geração ia"):
+                                            texto, origem = generate_cached(client, prompt_devocional,
+                                                                            renovar=devocional_salvo is not None)
+                                        devotional_put(dataset['chave'], day_of_year, texto)
+                                        devocional_salvo = texto
+                                    if origem == 'cache':
+                                        st.caption("⚡ Reflexão recuperada do cache.")
                                 except Exception as e:
                                     st.error(f"Erro: {e}")
                     
                     with col_ia_2:
-                        if 'devocional_result' in st.session_state:
-                            st.markdown(f"""<div style="background-color: white; padding: 30px; border-radius: 10px; border-left: 5px solid #F18F01; box-shadow: 2px 2px 15px rgba(0,0,0,0.05);">{st.session_state['devocional_result']}</div>""", unsafe_allow_html=True)
+                        if devocional_salvo is not None:
+                            st.markdown(f"""<div style="background-color: white; padding: 30px; border-radius: 10px; border-left: 5px solid #F18F01; box-shadow: 2px 2px 15px rgba(0,0,0,0.05);">{devocional_salvo}</div>""", unsafe_allow_html=True)
                         else:
                             st.info("Clique no botão ao lado para gerar uma reflexão exclusiva para hoje.")
 
@@ -452,128 +516,141 @@ if uploaded_file is not None:
                 with tab_progresso:
                     st.markdown("### 🗓️ Controle de Leitura")
                     st.markdown("Marque os dias que você já concluiu para atualizar seu progresso nos livros.")
+
+                    # 'read_days' sobrevive à troca de página; a chave do widget é recriada a partir dela
+                    if 'dias_lidos_widget' not in st.session_state:
+                        st.session_state['dias_lidos_widget'] = st.session_state['read_days']
+
+                    def set_read_days(dias):
+                        st.session_state['read_days'] = dias
+                        st.session_state['dias_lidos_widget'] = dias
+                        get_progress_store().save(reader_id(), dataset['chave'], dias)
                     
                     # Layout para seleção de dias
                     c_sel, c_btn = st.columns([3, 1])
                     with c_sel:
-                        days_selected = st.multiselect(
+                        st.multiselect(
                             "Dias Concluídos (1 a 365)", 
                             options=range(1, 366),
-                            default=st.session_state['read_days']
+                            key='dias_lidos_widget',
+                            on_change=lambda: set_read_days(st.session_state['dias_lidos_widget']),
                         )
                     
                     with c_btn:
                         st.markdown("<br>", unsafe_allow_html=True) # Espaçamento
-                        if st.button("Marcar até Hoje", use_container_width=True):
-                            st.session_state['read_days'] = list(range(1, day_of_year + 1))
-                            st.rerun()
-                        if st.button("Limpar Tudo", use_container_width=True):
-                            st.session_state['read_days'] = []
-                            st.rerun()
-
-                    # Atualiza estado
-                    if days_selected != st.session_state['read_days']:
-                        st.session_state['read_days'] = days_selected
-                        st.rerun()
+                        # Callbacks rodam antes do script: sem st.rerun() extra
+                        st.button("Marcar até Hoje", use_container_width=True,
+                                  on_click=set_read_days, args=(list(range(1, day_of_year + 1)),))
+                        st.button("Limpar Tudo", use_container_width=True, on_click=set_read_days, args=([],))
 
+                    st.caption(f"💾 Progresso salvo para o leitor **{reader_id()}** — guarde este link para continuar depois.")
                     st.divider()
 
                     if not st.session_state['read_days']:
                         st.info("Nenhum dia marcado ainda.")
                     else:
-                        # CALCULO DE PROGRESSO
-                        read_chapters_set = set()
-                        for d in st.session_state['read_days']:
-                            chapters_in_day = plan.get(d, [])
-                            for book, chap in chapters_in_day:
-                                read_chapters_set.add((book, chap))
-                        
-                        if 'Livro_ID' in df.columns:
-                            all_chapters = df[['Livro_ID', 'Livro', 'Capitulo']].drop_duplicates()
-                            book_order = df[['Livro', 'Livro_ID']].drop_duplicates().sort_values('Livro_ID')['Livro'].tolist()
-                        else:
-                            all_chapters = df[['Livro', 'Capitulo']].drop_duplicates()
-                            book_order = sorted(df['Livro'].unique())
-                        
-                        total_counts = all_chapters.groupby('Livro').size()
-                        
-                        if read_chapters_set:
-                            read_df = pd.DataFrame(list(read_chapters_set), columns=['Livro', 'Capitulo'])
-                            read_counts = read_df.groupby('Livro').size()
-                        else:
-                            read_counts = pd.Series()
+                        # CALCULO DE PROGRESSO (máscara de dias + bincount por livro)
+                        indice_plano = plan_index(dataset)
+                        lidos = reading_progress(indice_plano, st.session_state['read_days'])
+                        totais = indice_plano['total_por_livro']
+                        iniciados = np.flatnonzero((lidos > 0) & (totais > 0))
 
                         st.markdown("#### Progresso por Livro")
                         
-                        cols = st.columns(3)
-                        count_displayed = 0
-                        
-                        for i, book in enumerate(book_order):
-                            total = total_counts.get(book, 0)
-                            read = read_counts.get(book, 0)
-                            
-                            if total > 0 and read > 0:
-                                pct = read / total
-                                if pct > 1.0: pct = 1.0
-                                
-                                with cols[count_displayed % 3]:
-                                    st.markdown(f"**{book}**")
-                                    st.progress(pct)
-                                    st.caption(f"{read}/{total} caps ({int(pct*100)}%)")
-                                count_displayed += 1
-                        
-                        if count_displayed == 0:
+                        if len(iniciados) == 0:
                             st.info("Os dias marcados não contêm capítulos processados no plano atual.")
+                        else:
+                            import plotly.graph_objects as go
+                            st.caption(f"{fmt_num(lidos.sum())}/{fmt_num(totais.sum())} capítulos lidos "
+                                       f"({lidos.sum() / max(totais.sum(), 1):.0%} da Bíblia)")
+                            livros = [indice_plano['livros'][i] for i in iniciados]
+                            pct = np.minimum(lidos[iniciados] / totais[iniciados], 1.0)
+                            # Um único gráfico para todos os livros em vez de um st.progress por livro
+                            fig_prog = go.Figure(go.Bar(
+                                x=pct * 100, y=livros, orientation='h',
+                                marker=dict(color=pct, colorscale=[[0, '#abacea'], [1, '#F18F01']], cmin=0, cmax=1),
+                                text=[f"{l}/{t} caps ({int(p * 100)}%)" for l, t, p in zip(lidos[iniciados], totais[iniciados], pct)],
+                                textposition='auto',
+                                hovertemplate='%{y}: %{text}<extra></extra>',
+                            ))
+                            apply_theme_to_plot(fig_prog)
+                            fig_prog.update_layout(
+                                height=max(250, 22 * len(livros) + 60),
+                                xaxis=dict(range=[0, 100], ticksuffix='%'),
+                                yaxis=dict(autorange='reversed'),
+                                margin=dict(l=0, r=0, t=10, b=0),
+                            )
+                            show_chart(fig_prog, "devocional")
 
         # ---------------------------------------------------------
         # DASHBOARD
         # ---------------------------------------------------------
         elif menu == "📊 Visão Geral":
             st.title("Visão Macro")
+            import plotly.express as px
+            import plotly.graph_objects as go
             
             st.markdown("<br>", unsafe_allow_html=True)
             
+            estatisticas = dataset['estatisticas']
+            totais = estatisticas['totais']
             c1, c2, c3, c4 = st.columns(4)
-            c1.metric("Livros", fmt_num(df['Livro'].nunique()))
-            c2.metric("Capítulos", fmt_num(df.groupby(['Livro', 'Capitulo']).ngroups))
-            c3.metric("Versículos", fmt_num(len(df)))
-            total_words = df['Texto'].astype(str).apply(lambda x: len(x.split())).sum()
-            c4.metric("Palavras (aprox.)", fmt_num(total_words))
+            c1.metric("Livros", fmt_num(totais['livros']))
+            c2.metric("Capítulos", fmt_num(totais['capitulos']))
+            c3.metric("Versículos", fmt_num(totais['versiculos']))
+            c4.metric("Palavras (aprox.)", fmt_num(totais['palavras']))
             
             st.markdown("### Distribuição de Conteúdo")
-            verse_counts = df['Livro'].value_counts().reset_index()
-            verse_counts.columns = ['Livro', 'Contagem']
-            if 'Livro_ID' in df.columns:
-                order_map = df[['Livro', 'Livro_ID']].drop_duplicates().set_index('Livro')['Livro_ID']
-                verse_counts['ID'] = verse_counts['Livro'].map(order_map)
-                verse_counts = verse_counts.sort_values('ID')
+            # Só o gráfico escolhido é montado (o vocabulário usa o índice de busca)
+            grafico = st.radio("Gráfico", ["Versículos por livro", "Palavras por capítulo", "Crescimento do vocabulário"],
+                               horizontal=True, label_visibility="collapsed")
+            por_capitulo = estatisticas['por_capitulo']
             
-            fig = px.bar(
-                verse_counts, x='Livro', y='Contagem', 
-                color='Contagem', color_continuous_scale=['#1e295a', '#F18F01']
-            )
+            if grafico == "Versículos por livro":
+                fig = px.bar(
+                    estatisticas['por_livro'], x='Livro', y='Versiculos',
+                    color='Versiculos', color_continuous_scale=['#1e295a', '#F18F01'],
+                    hover_data=['Capitulos', 'Palavras'], labels={'Versiculos': 'Contagem'}
+                )
+                fig.update_traces(marker_line_width=0)
+            elif grafico == "Palavras por capítulo":
+                fig = go.Figure(go.Bar(
+                    x=por_capitulo['Ordem'], y=por_capitulo['Palavras'],
+                    marker=dict(color=por_capitulo['Palavras'], colorscale=[[0, '#1e295a'], [1, '#F18F01']], line_width=0),
+                    customdata=np.column_stack([por_capitulo['Livro'].astype(str), por_capitulo['Capitulo'], por_capitulo['Versiculos']]),
+                    hovertemplate="%{customdata[0]} %{customdata[1]}<br>%{y} palavras em %{customdata[2]} versículos<extra></extra>",
+                ))
+            else:
+                vocabulario = vocabulary_curve(dataset)
+                fig = go.Figure(go.Scatter(
+                    x=por_capitulo['Ordem'], y=vocabulario, mode='lines',
+                    line=dict(color='#1e295a', width=2), fill='tozeroy', fillcolor='rgba(241,143,1,0.2)',
+                    customdata=np.column_stack([por_capitulo['Livro'].astype(str), por_capitulo['Capitulo']]),
+                    hovertemplate="até %{customdata[0]} %{customdata[1]}: %{y} palavras distintas<extra></extra>",
+                ))
             
-            fig.update_traces(marker_line_width=0)
             fig.update_layout(
                 paper_bgcolor='rgba(255,255,255,0.9)', 
                 plot_bgcolor='rgba(255,255,255,0.9)',
                 font=dict(color='black'),
                 xaxis=dict(title=None, tickfont=dict(color='black'), showgrid=False),
-                yaxis=dict(title=None, showticklabels=False, showgrid=False, visible=False),
+                yaxis=dict(title=None, showticklabels=grafico == "Crescimento do vocabulário", showgrid=False,
+                           visible=grafico != "Versículos por livro"),
                 coloraxis_showscale=False,
                 margin=dict(l=20, r=20, t=20, b=60),
                 height=500
             )
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart(fig, "visão geral")
 
         # ---------------------------------------------------------
         # ENTIDADES
         # ---------------------------------------------------------
         elif menu == "👥 Análise de Entidades":
             st.title("Personagens e Entidades")
+            import plotly.graph_objects as go
             
-            all_entities = [ent for sublist in df['Entidades'] for ent in sublist]
-            entity_counts = Counter(all_entities).most_common(50)
+            indice_entidades = dataset['indice_entidades']
+            entity_counts = top_entities(indice_entidades, top=50)
             df_ent = pd.DataFrame(entity_counts, columns=['Entidade', 'Frequência'])
             
             # Tabela de Frequência - largura total, sem colunas
@@ -581,186 +658,204 @@ if uploaded_file is not None:
             # Fundo transparente aplicado via CSS, aqui apenas chamamos o df
             st.dataframe(df_ent, height=600, use_container_width=True)
             
+            unique_entities_list = indice_entidades['vocab'].tolist()
+
+            st.divider()
+            st.subheader("Versículos em Comum")
+            c_ents, c_modo = st.columns([3, 1])
+            juntas = c_ents.multiselect("Entidades", unique_entities_list, placeholder="Ex: Pedro e João")
+            modo_juntas = c_modo.radio("Aparecem", ["Todas juntas", "Qualquer uma"])
+            if juntas:
+                # Interseção (ou união) das listas de versículos de cada entidade
+                with span("entidades: coocorrência"):
+                    posicoes_juntas = rows_with_all(indice_entidades, juntas) if modo_juntas == "Todas juntas" \
+                        else rows_with_any(indice_entidades, juntas)
+                st.metric("Versículos", fmt_num(len(posicoes_juntas)))
+                if len(posicoes_juntas):
+                    st.dataframe(df.iloc[posicoes_juntas][['Livro', 'Capitulo', 'Versiculo', 'Texto']], use_container_width=True)
+            
             st.divider()
             st.subheader("Rastreamento de Entidade (Modo Escuro)")
             
-            unique_entities_list = sorted(list(set(all_entities)))
             selected_entity = st.selectbox("Selecione uma entidade:", unique_entities_list)
             
             if selected_entity:
-                mask = df['Entidades'].apply(lambda x: selected_entity in x)
-                df_filtered = df[mask].copy()
+                with span("entidades: filtro"):
+                    posicoes_ent = posting_rows(indice_entidades, selected_entity)
+                    if 'ID_Global' in df.columns:
+                        posicoes_ent = posicoes_ent[np.argsort(df['ID_Global'].to_numpy()[posicoes_ent], kind='stable')]
                 
-                if 'ID_Global' in df_filtered.columns:
-                    df_filtered = df_filtered.sort_values('ID_Global')
-                else:
-                    df_filtered = df_filtered.sort_index()
-                
-                book_order = []
-                if 'Livro_ID' in df.columns:
-                    book_order = df[['Livro', 'Livro_ID']].drop_duplicates().sort_values('Livro_ID')['Livro'].tolist()
-                else:
-                    book_order = df['Livro'].unique().tolist()
-
-                fig_timeline = px.scatter(
-                    df_filtered, 
-                    x='ID_Global' if 'ID_Global' in df.columns else df_filtered.index, 
-                    y='Livro', 
-                    color='Livro',
-                    hover_data=['Capitulo', 'Versiculo', 'Texto'],
-                    title=f"Dispersão de '{selected_entity}' nas Escrituras",
-                    category_orders={"Livro": book_order}
-                )
-                
-                fig_timeline.update_traces(
-                    marker=dict(size=8, opacity=0.9, symbol='circle'),
-                    mode='markers'
-                )
-                
-                fig_timeline.update_layout(
-                    paper_bgcolor='black',
-                    plot_bgcolor='black',
-                    font_color='white',
-                    title_font_color='white',
-                    xaxis=dict(showgrid=False, title="Progresso na Bíblia", color='white', showticklabels=False),
-                    yaxis=dict(showgrid=True, gridcolor='#333', color='white'),
-                    legend=dict(
-                        bgcolor='rgba(0,0,0,0.5)',
-                        font=dict(color='white')
-                    ),
-                    height=600
-                )
-                st.plotly_chart(fig_timeline, use_container_width=True)
-                
-                with st.expander(f"Ver versículos citados ({len(df_filtered)})"):
-                    st.dataframe(df_filtered[['Livro', 'Capitulo', 'Versiculo', 'Texto']], use_container_width=True)
+                book_order = dataset['estatisticas']['por_livro']['Livro'].tolist()
+                modo_dispersao = st.radio("Exibição", ["Automático", "Pontos (WebGL)", "Densidade por capítulo"], horizontal=True,
+                                          help=f"Automático: um ponto por capítulo acima de {fmt_num(LIMIAR_PONTOS)} versículos")
+                por_capitulo = modo_dispersao == "Densidade por capítulo" or (
+                    modo_dispersao == "Automático" and len(posicoes_ent) > LIMIAR_PONTOS)
+
+                # Um único trace Scattergl (cor = livro) e hover curto; o texto completo
+                # só vai ao navegador para os pontos selecionados
+                with span("entidades: figura plotly"):
+                    if por_capitulo:
+                        caixas = timeline_bins(dataset['estatisticas'], posicoes_ent)
+                        trace = go.Scattergl(
+                            x=caixas['x'], y=caixas['livro'], mode='markers',
+                            marker=dict(size=np.clip(4 + 3 * np.sqrt(caixas['mencoes']), 6, 30), color=caixas['densidade'],
+                                        colorscale='Plasma', opacity=0.85, showscale=True,
+                                        colorbar=dict(title=dict(text="menções/vers.", font=dict(color='white')), tickfont=dict(color='white'))),
+                            customdata=np.column_stack([caixas['capitulo'], caixas['mencoes']]),
+                            hovertemplate="%{y} %{customdata[0]}: %{customdata[1]} menções<extra></extra>",
+                        )
+                    else:
+                        pontos = timeline_points(df, posicoes_ent)
+                        indice_livro = {livro: i for i, livro in enumerate(book_order)}
+                        trace = go.Scattergl(
+                            x=pontos['x'], y=pontos['livro'], mode='markers', text=pontos['hover'],
+                            marker=dict(size=8, opacity=0.9, colorscale='Plasma',
+                                        color=[indice_livro.get(livro, 0) for livro in pontos['livro']]),
+                            hovertemplate="%{y} %{text}<extra></extra>",
+                        )
+                    fig_timeline = go.Figure(trace)
+                    fig_timeline.update_layout(
+                        title=f"Dispersão de '{selected_entity}' nas Escrituras" + (" (por capítulo)" if por_capitulo else ""),
+                        paper_bgcolor='black',
+                        plot_bgcolor='black',
+                        font_color='white',
+                        title_font_color='white',
+                        xaxis=dict(showgrid=False, title="Progresso na Bíblia", color='white', showticklabels=False),
+                        yaxis=dict(showgrid=True, gridcolor='#333', color='white',
+                                   categoryorder='array', categoryarray=book_order, autorange='reversed'),
+                        height=600
+                    )
+                evento = show_chart(fig_timeline, "entidades", on_select="rerun", selection_mode=("points", "box"),
+                                    key=f"timeline_{selected_entity}_{por_capitulo}")
+
+                # Texto completo sob demanda: versículos (ou capítulos) selecionados no gráfico
+                selecionados = [p['point_index'] for p in (evento.selection.points if evento else [])]
+                if selecionados:
+                    if por_capitulo:
+                        posicoes_sel = np.concatenate([bin_positions(dataset['estatisticas'], posicoes_ent, caixas['x'][i])
+                                                       for i in selecionados])
+                    else:
+                        posicoes_sel = posicoes_ent[selecionados]
+                    st.caption(f"{fmt_num(len(posicoes_sel))} versículos selecionados")
+                    st.dataframe(df.iloc[posicoes_sel[:500]][['Livro', 'Capitulo', 'Versiculo', 'Texto']], use_container_width=True)
+                elif st.toggle(f"Ver versículos citados ({fmt_num(len(posicoes_ent))})"):
+                    st.dataframe(df.iloc[posicoes_ent][['Livro', 'Capitulo', 'Versiculo', 'Texto']], use_container_width=True)
 
         # ---------------------------------------------------------
         # REDES (SNA)
         # ---------------------------------------------------------
         elif menu == "🕸️ Redes de Conexão (SNA)":
             st.title("Redes Sociais Bíblicas")
+            import networkx as nx
+            import plotly.graph_objects as go
             st.info("Visualização de quem aparece junto com quem no mesmo versículo.")
             
-            edge_counter = Counter()
-            node_counter = Counter()
-            for entities in df['Entidades']:
-                if len(entities) > 1:
-                    sorted_ents = sorted(entities)
-                    for i in range(len(sorted_ents)):
-                        node_counter[sorted_ents[i]] += 1
-                        for j in range(i + 1, len(sorted_ents)):
-                            edge = (sorted_ents[i], sorted_ents[j])
-                            edge_counter[edge] += 1
+            cooc = cooccurrence_table(dataset)
+            nomes_nos = cooc['nos']
             
             with st.container():
                 c_filter_1, c_filter_2, c_filter_3 = st.columns(3)
                 with c_filter_1:
                     min_weight = st.slider("Força da Conexão (Peso Mínimo)", 1, 50, 5)
                 
-                all_available_nodes = sorted([k for k, v in node_counter.items() if v > 1])
+                all_available_nodes = available_nodes(cooc)
                 with c_filter_2:
                     focus_option = st.selectbox("Focar em:", ["Visão Geral (Top Conectados)"] + all_available_nodes)
                 
                 # Nova Funcionalidade: Layout do Grafo
                 with c_filter_3:
-                    layout_opt = st.selectbox("Layout do Grafo", ["Spring (Padrão)", "Circular", "Aleatório", "Shell"])
+                    layout_opt = st.selectbox("Layout do Grafo", LAYOUTS)
 
             max_nodes = 50
             if focus_option == "Visão Geral (Top Conectados)":
                 max_nodes = st.slider("Máximo de Nós", 10, 200, 50)
 
-            G = nx.Graph()
-            if focus_option == "Visão Geral (Top Conectados)":
-                top_nodes = [n for n, c in node_counter.most_common(max_nodes)]
-                for edge, weight in edge_counter.items():
-                    if weight >= min_weight:
-                        source, target = edge
-                        if source in top_nodes and target in top_nodes:
-                            G.add_edge(source, target, weight=weight)
-                            G.add_node(source, size=node_counter[source])
-                            G.add_node(target, size=node_counter[target])
-            else:
-                target_entity = focus_option
-                G.add_node(target_entity, size=node_counter[target_entity])
-                found = False
-                for edge, weight in edge_counter.items():
-                    if weight >= min_weight:
-                        if target_entity in edge:
-                            found = True
-                            neighbor = edge[1] if edge[0] == target_entity else edge[0]
-                            G.add_edge(target_entity, neighbor, weight=weight)
-                            G.add_node(neighbor, size=node_counter[neighbor])
-                if not found:
-                    st.warning(f"Sem conexões fortes para {target_entity} com peso >= {min_weight}.")
+            with span("sna: arestas e grafo"):
+                G = nx.Graph()
+                contagem_nos = cooc['contagem']
+                if focus_option == "Visão Geral (Top Conectados)":
+                    arestas = filter_edges_top(cooc, min_weight, max_nodes)
+                    for source_id, target_id, weight in arestas.itertuples(index=False):
+                        source, target = nomes_nos[source_id], nomes_nos[target_id]
+                        G.add_edge(source, target, weight=int(weight))
+                        G.add_node(source, size=int(contagem_nos[source_id]))
+                        G.add_node(target, size=int(contagem_nos[target_id]))
+                else:
+                    target_entity = focus_option
+                    G.add_node(target_entity, size=node_count(cooc, target_entity))
+                    arestas = filter_edges_focus(cooc, target_entity, min_weight)
+                    for source_id, target_id, weight in arestas.itertuples(index=False):
+                        neighbor_id = target_id if nomes_nos[source_id] == target_entity else source_id
+                        G.add_edge(target_entity, nomes_nos[neighbor_id], weight=int(weight))
+                        G.add_node(nomes_nos[neighbor_id], size=int(contagem_nos[neighbor_id]))
+                    if arestas.empty:
+                        st.warning(f"Sem conexões fortes para {target_entity} com peso >= {min_weight}.")
 
             if len(G.nodes) > 0:
                 # Aplicação da escolha de Layout
-                if layout_opt == "Spring (Padrão)":
-                    pos = nx.spring_layout(G, k=0.6, seed=42)
-                elif layout_opt == "Circular":
-                    pos = nx.circular_layout(G)
-                elif layout_opt == "Aleatório":
-                    pos = nx.random_layout(G, seed=42)
-                elif layout_opt == "Shell":
-                    pos = nx.shell_layout(G)
+                pos_anterior = st.session_state.get('sna_layout')
+                if pos_anterior is not None and pos_anterior[0] == layout_opt:
+                    pos_anterior = pos_anterior[1]
                 else:
-                    pos = nx.spring_layout(G, k=0.6, seed=42)
-
-                edge_x = []
-                edge_y = []
-                for edge in G.edges():
-                    if edge[0] in pos and edge[1] in pos:
-                        x0, y0 = pos[edge[0]]
-                        x1, y1 = pos[edge[1]]
-                        edge_x.append(x0); edge_x.append(x1); edge_x.append(None)
-                        edge_y.append(y0); edge_y.append(y1); edge_y.append(None)
-
-                edge_trace = go.Scatter(
-                    x=edge_x, y=edge_y,
-                    line=dict(width=0.5, color='#4c5187'),
-                    hoverinfo='none', mode='lines')
-
-                node_x = []
-                node_y = []
-                node_text = [] 
-                node_size = []
-                node_colors = []
+                    pos_anterior = None
+                pos = load_graph_layout(graph_signature(G), layout_opt, G, pos_anterior)
+                st.session_state['sna_layout'] = (layout_opt, pos)
+
+                with span("sna: figura plotly"):
+                    edge_x = []
+                    edge_y = []
+                    for edge in G.edges():
+                        if edge[0] in pos and edge[1] in pos:
+                            x0, y0 = pos[edge[0]]
+                            x1, y1 = pos[edge[1]]
+                            edge_x.append(x0); edge_x.append(x1); edge_x.append(None)
+                            edge_y.append(y0); edge_y.append(y1); edge_y.append(None)
+
+                    edge_trace = go.Scatter(
+                        x=edge_x, y=edge_y,
+                        line=dict(width=0.5, color='#4c5187'),
+                        hoverinfo='none', mode='lines')
+
+                    node_x = []
+                    node_y = []
+                    node_text = [] 
+                    node_size = []
+                    node_colors = []
                 
-                for node in G.nodes():
-                    if node in pos:
-                        x, y = pos[node]
-                        node_x.append(x)
-                        node_y.append(y)
-                        node_text.append(f"{node} (Menções: {G.nodes[node].get('size', 0)})")
-                        sz = G.nodes[node].get('size', 10)
-                        node_size.append(min(60, max(15, sz / 4)))
-                        if focus_option != "Visão Geral (Top Conectados)" and node == focus_option:
-                            node_colors.append(1000)
-                        else:
-                            node_colors.append(len(list(G.neighbors(node))))
-
-                node_trace = go.Scatter(
-                    x=node_x, y=node_y,
-                    mode='markers+text',
-                    hoverinfo='text',
-                    text=node_text,
-                    textposition="top center",
-                    textfont=dict(color='#1e295a', size=10),
-                    marker=dict(
-                        showscale=True, colorscale='Sunset', reversescale=False,
-                        color=node_colors, size=node_size, line_width=2, line_color='white'
+                    for node in G.nodes():
+                        if node in pos:
+                            x, y = pos[node]
+                            node_x.append(x)
+                            node_y.append(y)
+                            node_text.append(f"{node} (Menções: {G.nodes[node].get('size', 0)})")
+                            sz = G.nodes[node].get('size', 10)
+                            node_size.append(min(60, max(15, sz / 4)))
+                            if focus_option != "Visão Geral (Top Conectados)" and node == focus_option:
+                                node_colors.append(1000)
+                            else:
+                                node_colors.append(len(list(G.neighbors(node))))
+
+                    node_trace = go.Scatter(
+                        x=node_x, y=node_y,
+                        mode='markers+text',
+                        hoverinfo='text',
+                        text=node_text,
+                        textposition="top center",
+                        textfont=dict(color='#1e295a', size=10),
+                        marker=dict(
+                            showscale=True, colorscale='Sunset', reversescale=False,
+                            color=node_colors, size=node_size, line_width=2, line_color='white'
+                        )
                     )
-                )
                 
-                fig_net = go.Figure(data=[edge_trace, node_trace])
-                apply_theme_to_plot(fig_net)
-                fig_net.update_layout(
-                    xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                    margin=dict(b=0,l=0,r=0,t=20)
-                )
-                st.plotly_chart(fig_net, use_container_width=True)
+                    fig_net = go.Figure(data=[edge_trace, node_trace])
+                    apply_theme_to_plot(fig_net)
+                    fig_net.update_layout(
+                        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                        margin=dict(b=0,l=0,r=0,t=20)
+                    )
+                show_chart(fig_net, "sna")
             else:
                 st.warning("Nenhum dado para exibir no grafo.")
 
@@ -769,36 +864,86 @@ if uploaded_file is not None:
         # ---------------------------------------------------------
         elif menu == "🔍 Explorador de Texto":
             st.title("Pesquisa Avançada")
+            modo_busca = st.radio("Modo de busca", ["Relevância (BM25)", "Exata"], horizontal=True)
             col_search, col_stats = st.columns([3, 1])
             with col_search:
-                search_term = st.text_input("Buscar termo", placeholder="Ex: amor, espada, luz...")
+                exemplo = 'Ex: amor, espada OR luz, "no princípio", salv*' if modo_busca == "Exata" else 'Ex: amor ao próximo, coração contrito, salv*'
+                search_term = st.text_input("Buscar termo", placeholder=exemplo, key='busca_termo')
+            traducao_busca = nome_principal
+            if traducoes is not None:
+                traducao_busca = st.selectbox("Buscar na tradução", [nome_principal] + traducoes['nomes'])
+
+            c_f1, c_f2, c_f3 = st.columns([2, 1, 1])
+            livros_filtro = c_f1.multiselect("Filtrar livros", ref_index['livros'])
+            testamento_filtro = c_f2.selectbox("Testamento", ["Todos"] + TESTAMENTOS)
+            max_resultados = c_f3.number_input("Máx. resultados", min_value=10, max_value=1000, value=100, step=10,
+                                               disabled=modo_busca == "Exata")
             
             if search_term:
-                results = df[df['Texto'].str.contains(search_term, case=False, na=False)]
+                mascara = None
+                if livros_filtro or testamento_filtro != "Todos":
+                    mascara = verse_mask(df, livros_filtro, testamento_filtro)
+
+                with span("explorador: busca"):
+                    # Traduções têm o texto alinhado às posições da principal: mesmos filtros e referências
+                    na_principal = traducao_busca == nome_principal
+                    if modo_busca == "Exata":
+                        indice = search_index(dataset) if na_principal else translation_search_index(traducoes, traducao_busca)
+                        posicoes = search_inverted_index(indice, search_term)
+                        if mascara is not None:
+                            posicoes = posicoes[mascara[posicoes]]
+                        results = df.iloc[posicoes][['Livro', 'Capitulo', 'Versiculo', 'Texto']]
+                        total = len(results)
+                    else:
+                        indice = ranking_index(dataset) if na_principal else translation_ranking_index(traducoes, traducao_busca)
+                        posicoes, pontuacoes, total = rank_bm25(indice, search_term, int(max_resultados), mascara)
+                        results = df.iloc[posicoes][['Livro', 'Capitulo', 'Versiculo', 'Texto']]
+                        results.insert(0, 'Relevância', pontuacoes.astype(float).round(2))
+                    if not na_principal:
+                        results['Texto'] = aligned_text(traducoes, traducao_busca).iloc[posicoes].to_numpy()
                 with col_stats:
-                    st.metric("Encontrados", len(results))
-                st.dataframe(results[['Livro', 'Capitulo', 'Versiculo', 'Texto']], use_container_width=True)
+                    st.metric("Encontrados", fmt_num(total))
+                st.dataframe(results, use_container_width=True)
             
             st.divider()
             c_livro, c_cap = st.columns(2)
-            livro_sel = c_livro.selectbox("Livro", df['Livro'].unique())
-            caps_disponiveis = df[df['Livro'] == livro_sel]['Capitulo'].unique()
-            cap_sel = c_cap.selectbox("Capítulo", sorted(caps_disponiveis))
-            
-            texto_capitulo = df[(df['Livro'] == livro_sel) & (df['Capitulo'] == cap_sel)]
+            livro_sel = c_livro.selectbox("Livro", ref_index['livros'])
+            cap_sel = c_cap.selectbox("Capítulo", ref_index['capitulos'].get(livro_sel, []))
             
             st.markdown(f"### {livro_sel} {cap_sel}")
+
+            comparar = []
+            if traducoes is not None:
+                comparar = st.multiselect("Comparar com", traducoes['nomes'])
             
-            texto_html = "<div style='background-color: white; padding: 20px; border-radius: 10px; border-left: 5px solid #F18F01; box-shadow: 2px 2px 10px rgba(0,0,0,0.05);'>"
-            for _, row in texto_capitulo.iterrows():
-                v = row['Versiculo']
-                t = row['Texto']
-                for ent in row['Entidades']:
-                    t = t.replace(ent, f"<b style='color:#833500'>{ent}</b>")
-                texto_html += f"<div style='margin-bottom: 5px;'><sup style='color:#1e295a; font-weight:bold; margin-right: 5px;'>{v}</sup> {t}</div>"
-            texto_html += "</div>"
-            
-            st.markdown(texto_html, unsafe_allow_html=True)
+            texto_html = explorer_chapter(dataset, livro_sel, cap_sel)
+            if not comparar:
+                st.markdown(texto_html, unsafe_allow_html=True)
+            else:
+                # Lado a lado: posições do capítulo na principal indexam direto as colunas alinhadas
+                capitulo_df = chapter_rows(df, ref_index, livro_sel, cap_sel)
+                textos_trad = side_by_side(traducoes, comparar, df.index.get_indexer(capitulo_df.index))
+                colunas = st.columns(1 + len(comparar))
+                colunas[0].markdown(f"**{nome_principal}**")
+                colunas[0].markdown(texto_html, unsafe_allow_html=True)
+                for coluna, nome in zip(colunas[1:], comparar):
+                    coluna.markdown(f"**{nome}**")
+                    corpo = ''.join(
+                        f"<div style='margin-bottom: 5px;'><sup style='color:#1e295a; font-weight:bold; margin-right: 5px;'>{v}</sup> {t or '—'}</div>"
+                        for v, t in zip(capitulo_df['Versiculo'].tolist(), textos_trad[nome])
+                    )
+                    coluna.markdown("<div style='background-color: white; padding: 20px; border-radius: 10px; border-left: 5px solid #4c5187; box-shadow: 2px 2px 10px rgba(0,0,0,0.05);'>"
+                                    + corpo + "</div>", unsafe_allow_html=True)
+
+            with st.expander("🔗 Encontrar versículos semelhantes"):
+                capitulo_df = chapter_rows(df, ref_index, livro_sel, cap_sel)
+                if not capitulo_df.empty and semantic_lookup_enabled(dataset, 'sim_calcular'):
+                    c_v, c_k = st.columns([1, 1])
+                    vers_sim = c_v.selectbox("Versículo", capitulo_df['Versiculo'].tolist(), key='sim_vers')
+                    top_sim = c_k.slider("Quantidade", 5, 50, 10, key='sim_top')
+                    linha = capitulo_df.index[capitulo_df['Versiculo'] == vers_sim][0]
+                    with st.spinner("Calculando vetores semânticos..."):
+                        st.dataframe(similar_verses_frame(dataset, df, linha, top_sim), use_container_width=True)
 
         # ---------------------------------------------------------
         # ASSISTENTE IA
@@ -808,6 +953,7 @@ if uploaded_file is not None:
             
             if not HAS_GENAI:
                 st.error("Biblioteca Google GenAI ausente.")
+                show_profile(perfil_rerun)
                 st.stop()
             
             if not api_key:
@@ -818,19 +964,19 @@ if uploaded_file is not None:
                 """, unsafe_allow_html=True)
 
             c1, c2, c3 = st.columns(3)
-            livro_sel = c1.selectbox("Livro", df['Livro'].unique(), key='ia_livro')
-            caps_disponiveis = df[df['Livro'] == livro_sel]['Capitulo'].unique()
-            cap_sel = c2.selectbox("Capítulo", sorted(caps_disponiveis), key='ia_cap')
-            versiculos_disponiveis = df[(df['Livro'] == livro_sel) & (df['Capitulo'] == cap_sel)]['Versiculo'].unique()
-            versiculos_com_todos = ["Todos"] + list(sorted(versiculos_disponiveis))
+            livro_sel = c1.selectbox("Livro", ref_index['livros'], key='ia_livro')
+            cap_sel = c2.selectbox("Capítulo", ref_index['capitulos'].get(livro_sel, []), key='ia_cap')
+            versiculos_com_todos = ["Todos"] + ref_index['versiculos'].get((livro_sel, cap_sel), [])
             vers_sel = c3.selectbox("Versículo", versiculos_com_todos, key='ia_vers')
             
             if vers_sel == "Todos":
-                texto_df = df[(df['Livro'] == livro_sel) & (df['Capitulo'] == cap_sel)]
+                texto_df = chapter_rows(df, ref_index, livro_sel, cap_sel)
                 texto_completo = " ".join(texto_df['Texto'].astype(str).tolist())
                 referencia = f"{livro_sel} {cap_sel}"
+                trecho = (livro_sel, cap_sel)
             else:
-                texto_df = df[(df['Livro'] == livro_sel) & (df['Capitulo'] == cap_sel) & (df['Versiculo'] == vers_sel)]
+                texto_df = verse_rows(df, ref_index, livro_sel, cap_sel, vers_sel)
+                trecho = (livro_sel, cap_sel, vers_sel)
                 if not texto_df.empty:
                     texto_completo = texto_df.iloc[0]['Texto']
                     referencia = f"{livro_sel} {cap_sel}:{vers_sel}"
@@ -841,7 +987,14 @@ if uploaded_file is not None:
             st.info(f"**Analisando:** {referencia}")
             with st.expander("Ver texto completo"):
                 st.write(texto_completo)
+            if vers_sel != "Todos" and not texto_df.empty:
+                with st.expander("🔗 Versículos semelhantes"):
+                    if semantic_lookup_enabled(dataset, 'ia_sim_calcular'):
+                        st.dataframe(similar_verses_frame(dataset, df, texto_df.index[0], 5), use_container_width=True)
+
+            streaming = st.toggle("Resposta em tempo real (streaming)", value=True)
 
+            analise_exibida = False
             if st.button("🔍 Analisar Profundamente"):
                 if not api_key:
                     st.error("Falta API Key")
@@ -849,21 +1002,57 @@ if uploaded_file is not None:
                     st.error("Sem texto")
                 else:
                     try:
-                        with st.spinner("Consultando especialistas digitais..."):
-                            client = genai.Client(api_key=api_key)
-                            prompt = f"""
-                            Especialista em teologia: analise {referencia}: "{texto_completo}".
-                            1. Contexto Histórico/Literário.
-                            2. Exegese e Teologia.
-                            3. Aplicação Prática Moderna.
-                            Use Markdown estruturado.
-                            """
-                            response = client.models.generate_content(model='gemini-2.5-flash-lite', contents=prompt)
-                            st.markdown("---")
-                            st.markdown(response.text)
+                        client = get_genai_client(api_key)
+                        # Versículos mais relevantes do trecho + referências cruzadas, dentro do orçamento
+                        with st.spinner("Selecionando versículos para o contexto..."):
+                            contexto = passage_context(dataset, [trecho], ORCAMENTO_ASSISTENTE if vers_sel == "Todos" else ORCAMENTO_VERSICULO)
+                        st.caption(f"Contexto enviado: {contexto['selecionados']}/{contexto['candidatos']} versículos "
+                                   f"+ {contexto['relacionados']} relacionados (~{contexto['tokens']} tokens)")
+                        prompt = f"""
+                        Especialista em teologia: analise {referencia}.
+                        Texto: "{contexto['texto'].strip()}"
+                        1. Contexto Histórico/Literário.
+                        2. Exegese e Teologia.
+                        3. Aplicação Prática Moderna.
+                        Use Markdown estruturado.
+                        """
+                        st.markdown("---")
+                        if streaming:
+                            stats = {}
+                            metric_slot = st.empty()
+                            with span("assistente: geração ia (stream)"):
+                                st.write_stream(buffer_lines(stream_cached(client, prompt, stats=stats)))
+                            texto, origem, tempo = stats.get('texto', ''), stats.get('origem'), stats.get('ttft')
+                            rotulo_tempo = "Tempo até o 1º token"
+                        else:
+                            inicio = time.perf_counter()
+                            with st.spinner("Consultando especialistas digitais..."):
+                                with span("assistente: geração ia"):
+                                    texto, origem = generate_cached(client, prompt)
+                            # Sem streaming só se mede a resposta inteira
+                            tempo = time.perf_counter() - inicio
+                            rotulo_tempo = "Tempo total"
+                            metric_slot = st.empty()
+                            st.markdown(texto)
+                        if tempo is not None:
+                            metric_slot.metric(rotulo_tempo, f"{tempo:.2f} s")
+                        if origem == 'cache':
+                            st.caption("⚡ Análise recuperada do cache.")
+                        # Guarda o resultado para não perder a análise no próximo rerun
+                        st.session_state['analise_result'] = {'referencia': referencia, 'texto': texto,
+                                                             'tempo': tempo, 'rotulo_tempo': rotulo_tempo}
+                        analise_exibida = True
                     except Exception as e:
                         st.error(f"Erro: {e}")
 
+            if not analise_exibida and 'analise_result' in st.session_state:
+                ultima = st.session_state['analise_result']
+                st.markdown("---")
+                st.caption(f"Última análise: {ultima['referencia']}")
+                if ultima.get('tempo') is not None:
+                    st.metric(ultima['rotulo_tempo'], f"{ultima['tempo']:.2f} s")
+                st.markdown(ultima['texto'])
+
 else:
     st.markdown("""
     <div style='text-align: center; padding: 50px;'>
@@ -873,3 +1062,9 @@ else:
         <p>📂 Para começar, faça o upload da bíblia <b>blivre.xlsx</b> na barra lateral.</p>
     </div>
     """, unsafe_allow_html=True)
+
+# =========================================================
+# 3. PERFIL DO RERUN (OPCIONAL)
+# =========================================================
+
+show_profile(perfil_rerun)
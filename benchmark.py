@@ -0,0 +1,753 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from contexto import build_context, estimate_tokens
+from cache_colunar import load_bible_bytes
+from busca import build_bm25_index, build_inverted_index, rank_bm25, search_inverted_index, verse_mask
+from dataset import build_dataset, dataset_frame
+from estatisticas import build_corpus_stats, vocabulary_growth, word_counts
+from entidades import (BIG_ENTITIES, build_entity_csr, build_entity_postings, entity_row_positions, extract_entities_batch,
+                       posting_rows, rows_with_all, simple_entity_extractor, top_entities)
+from linha_tempo import timeline_bins, timeline_points
+import llm
+from llm import generate_cached, prompt_key, stream_cached
+from grafo import build_cooccurrence_table, compute_layout, filter_edges_top
+from ingestao import normalize_bible
+from memoria import compact_bible, memory_report
+from semantica import build_ivf, build_vector_index, compute_embeddings, search_vectors
+from plano import generate_reading_plan
+from progresso import ProgressStore, decode_days, encode_days
+from referencias import build_reference_index
+from renderizacao import render_devotional_chapter, render_explorer_chapter
+from traducoes import align_keys, book_names, rekey_books, verse_keys
+
+# =========================================================
+# BENCHMARK DO PIPELINE DE DADOS (sem navegador)
+# Uso: python benchmark.py [--escala 1] [--repeticoes 3]
+#      python benchmark.py --etapas --escalas 1,5,20 --json etapas.json [--paginas]
+#      python benchmark.py --etapas --json novo.json --comparar etapas.json
+#      python benchmark.py --partida [--repeticoes 5]   (imports e primeira renderização)
+# =========================================================
+
+_PALAVRAS = ['e', 'disse', 'o', 'povo', 'de', 'terra', 'luz', 'amor', 'casa', 'filho', 'rei', 'que', 'para', 'sobre',
+             'espada', 'caminho', 'se', 'não', 'com', 'seu', 'monte', 'águas', 'coração', 'palavra', 'fez', 'em']
+
+
+def synthetic_bible(escala=1, seed=42):
+    # Bíblia sintética com ~31k versículos por unidade de escala
+    rng = random.Random(seed)
+    nomes = BIG_ENTITIES + ['Israel', 'Jerusalém', 'Egito', 'Sião', 'Canaã', 'Assim', 'Então']
+    rows = []
+    verse_id = 1
+    for rep in range(escala):
+        for livro_id in range(1, 67):
+            livro = f"Livro {livro_id}" if rep == 0 else f"Livro {livro_id}.{rep}"
+            for cap in range(1, 20):
+                for vers in range(1, 26):
+                    n = rng.randint(8, 40)
+                    words = [rng.choice(_PALAVRAS) if rng.random() > 0.07 else rng.choice(nomes) for _ in range(n)]
+                    words[0] = words[0].capitalize()
+                    texto = " ".join(words) + rng.choice(['.', ';', '!', ',', ':'])
+                    rows.append((livro, livro_id + rep * 66, cap, vers, texto, verse_id))
+                    verse_id += 1
+    return pd.DataFrame(rows, columns=['Livro', 'Livro_ID', 'Capitulo', 'Versiculo', 'Texto', 'ID_Global'])
+
+
+def timed(fn, repeticoes):
+    melhor = float('inf')
+    result = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        result = fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor, result
+
+
+def bench_entities(df, repeticoes):
+    t_linha, por_linha = timed(lambda: df['Texto'].apply(simple_entity_extractor), repeticoes)
+    t_lote, em_lote = timed(lambda: extract_entities_batch(df['Texto']), repeticoes)
+    iguais = por_linha.tolist() == em_lote.tolist()
+    print(f"Entidades por linha (apply): {t_linha * 1000:8.1f} ms")
+    print(f"Entidades em lote          : {t_lote * 1000:8.1f} ms  ({t_linha / t_lote:.1f}x)  idênticas={iguais}")
+    return iguais
+
+
+def bench_search(df, repeticoes):
+    t_indice, indice = timed(lambda: build_inverted_index(df['Texto']), 1)
+    print(f"Índice invertido (construção): {t_indice * 1000:8.1f} ms")
+    for consulta in ['amor', 'amor*', 'Pedro João', 'Pedro OR João', '"disse o povo"']:
+        t_scan, _ = timed(lambda: df['Texto'].str.contains(consulta, case=False, na=False), repeticoes)
+        t_idx, encontrados = timed(lambda: search_inverted_index(indice, consulta), repeticoes)
+        print(f"  {consulta!r:18} str.contains {t_scan * 1000:7.2f} ms | índice {t_idx * 1000:7.2f} ms ({len(encontrados)} versículos)")
+
+
+def bench_statistics(df, repeticoes):
+    def visao_geral_antiga():
+        # O que a página recalculava a cada visita
+        df['Texto'].astype(str).apply(lambda x: len(x.split())).sum()
+        df.groupby(['Livro', 'Capitulo'], observed=True).ngroups
+        df['Livro'].value_counts()
+        df[['Livro', 'Livro_ID']].drop_duplicates()
+
+    referencias = build_reference_index(df)
+    t_antiga, _ = timed(visao_geral_antiga, repeticoes)
+    t_split, _ = timed(lambda: df['Texto'].astype(str).apply(lambda x: len(x.split())), repeticoes)
+    t_bytes, _ = timed(lambda: word_counts(df['Texto']), repeticoes)
+    t_stats, stats = timed(lambda: build_corpus_stats(df, referencias), repeticoes)
+    t_vocab, _ = timed(lambda: vocabulary_growth(stats, build_inverted_index(df['Texto'])), 1)
+    print(f"Visão Geral por visita (antes): {t_antiga * 1000:7.1f} ms | estatísticas no carregamento {t_stats * 1000:7.1f} ms")
+    print(f"  palavras: split {t_split * 1000:7.1f} ms | bytes Arrow {t_bytes * 1000:7.1f} ms"
+          f" | vocabulário (com índice) {t_vocab * 1000:7.1f} ms")
+
+
+def bench_bm25(df, repeticoes):
+    t_indice, indice = timed(lambda: build_bm25_index(df['Texto']), 1)
+    print(f"Índice BM25 (construção)     : {t_indice * 1000:8.1f} ms ({len(indice['vocab'])} radicais, {len(indice['docs'])} pares)")
+    mascara_nt = verse_mask(df, testamento='Novo Testamento')
+    for consulta in ['amor', 'coração palavra', 'águas*', 'Pedro João espada']:
+        t_rank, (posicoes, _, total) = timed(lambda: rank_bm25(indice, consulta, 50), repeticoes)
+        t_nt, _ = timed(lambda: rank_bm25(indice, consulta, 50, mascara_nt), repeticoes)
+        print(f"  {consulta!r:20} top-50 {t_rank * 1000:7.2f} ms | NT {t_nt * 1000:7.2f} ms ({total} versículos pontuados)")
+
+
+def bench_semantic(df, repeticoes):
+    t_vetores, vetores = timed(lambda: compute_embeddings(df['Texto']), 1)
+    print(f"Vetores LSA ({vetores.shape[1]} dims)      : {t_vetores * 1000:8.1f} ms")
+    t_ivf, ivf = timed(lambda: build_ivf(vetores), 1)
+    print(f"Índice IVF ({len(ivf['centroides'])} listas)       : {t_ivf * 1000:8.1f} ms")
+    alvos = range(0, len(vetores), max(1, len(vetores) // 20))
+    t_exato, exatos = timed(lambda: [search_vectors(vetores, vetores[p], 10, excluir=p)[0] for p in alvos], repeticoes)
+    t_aprox, aprox = timed(lambda: [search_vectors(vetores, vetores[p], 10, ivf, excluir=p)[0] for p in alvos], repeticoes)
+    recall = sum(len(set(e) & set(a)) for e, a in zip(exatos, aprox)) / (10 * len(exatos))
+    print(f"  top-10 exato {t_exato / len(exatos) * 1000:7.2f} ms | IVF {t_aprox / len(aprox) * 1000:7.2f} ms (recall@10 {recall:.2f})")
+
+
+def bench_translations(df, repeticoes):
+    # Outra tradução com 95% dos versículos em ordem diferente: merge por colunas x alinhamento int32
+    traducao = df.sample(frac=0.95, random_state=1)[['Livro_ID', 'Livro', 'Capitulo', 'Versiculo', 'Texto']]
+    chaves = verse_keys(df)
+    t_alinhar, alinhamento = timed(lambda: align_keys(chaves, verse_keys(traducao)), repeticoes)
+    t_merge, _ = timed(lambda: df[['Livro_ID', 'Capitulo', 'Versiculo']].merge(
+        traducao, on=['Livro_ID', 'Capitulo', 'Versiculo'], how='left'), repeticoes)
+    print(f"Alinhamento de tradução      : {t_alinhar * 1000:8.1f} ms | merge {t_merge * 1000:8.1f} ms "
+          f"(cobertura {(alinhamento >= 0).mean():.0%}, {alinhamento.nbytes / 1e6:.1f} MB)")
+    # Sem Livro_ID e com os livros em outra ordem: casamento pelo nome do livro
+    invertida = traducao.drop(columns='Livro_ID').iloc[::-1]
+    t_nome, alinhado_nome = timed(lambda: align_keys(
+        verse_keys(df, por_nome=True),
+        rekey_books(verse_keys(invertida, por_nome=True), book_names(invertida), book_names(df))[0]), repeticoes)
+    achou = alinhado_nome >= 0
+    corretos = (invertida['Texto'].to_numpy()[alinhado_nome[achou]] == df['Texto'].to_numpy()[achou]).mean()
+    print(f"  sem Livro_ID (livros em outra ordem): {t_nome * 1000:8.1f} ms | cobertura {achou.mean():.0%}, "
+          f"textos corretos {corretos:.0%}")
+    texto = traducao['Texto'].array
+    capitulo = slice(1000, 1030)
+    t_lado, _ = timed(lambda: texto.take(alinhamento[capitulo], allow_fill=True), repeticoes)
+    print(f"  capítulo lado a lado (30 versículos): {t_lado * 1e6:7.1f} µs")
+
+
+def bench_context(df, repeticoes, dias=30):
+    # Prompt do devocional: corte em 20 mil caracteres vs. contexto empacotado
+    compacto = df.reset_index(drop=True)
+    ref_index = build_reference_index(compacto)
+    indice = build_vector_index(compacto['Texto'])
+    plan, _ = generate_reading_plan(compacto)
+    antes, depois, tempos = [], [], []
+    for dia in range(1, dias + 1):
+        texto = ''.join(f"\n\nTexto de {b} {c}:\n" + ' '.join(compacto['Texto'].iloc[ref_index['fatias'][(b, c)]])
+                        for b, c in plan[dia])
+        antes.append(estimate_tokens(texto[:20000]))
+        t, contexto = timed(lambda: build_context(compacto, ref_index, indice, plan[dia]), repeticoes)
+        depois.append(contexto['tokens'])
+        tempos.append(t)
+    reproduzivel = build_context(compacto, ref_index, indice, plan[1]) == build_context(compacto, ref_index, indice, plan[1])
+    print(f"Contexto devocional ({dias} dias): {sum(antes) / dias:7.0f} -> {sum(depois) / dias:7.0f} tokens/dia "
+          f"({sum(tempos) / dias * 1000:.1f} ms/dia, determinístico={reproduzivel})")
+    # Sem vetores prontos (caminho do app antes do LSA): só os termos do trecho
+    t_lexico, _ = timed(lambda: [build_context(compacto, ref_index, None, plan[dia]) for dia in range(1, dias + 1)], repeticoes)
+    print(f"  sem vetores (termos do trecho): {t_lexico / dias * 1000:.1f} ms/dia")
+    return reproduzivel
+
+
+# Referência para o índice de postings: consultas varrendo o CSR linha -> entidades
+
+def entity_frequencies(csr, top=None):
+    # Equivalente a Counter(todas_as_entidades).most_common(top): contagem
+    # decrescente, empates na ordem de primeira aparição
+    ids = csr['ids']
+    if len(ids) == 0:
+        return []
+    presentes, primeira, contagem = np.unique(ids, return_index=True, return_counts=True)
+    por_aparicao = np.argsort(primeira, kind='stable')
+    ranking = por_aparicao[np.argsort(-contagem[por_aparicao], kind='stable')]
+    if top is not None:
+        ranking = ranking[:top]
+    return list(zip(csr['vocab'][presentes[ranking]].tolist(), contagem[ranking].tolist()))
+
+
+def rows_with_entity(csr, nome):
+    pos = int(np.searchsorted(csr['vocab'], nome)) if len(csr['vocab']) else 0
+    if pos >= len(csr['vocab']) or csr['vocab'][pos] != nome:
+        return np.zeros(0, dtype=np.int32)
+    return entity_row_positions(csr)[csr['ids'] == pos]
+
+
+def bench_entity_postings(df, repeticoes):
+    # Consultas da página de entidades: varredura do CSR x índice entidade -> versículos
+    entidades = extract_entities_batch(df['Texto'])
+    csr = build_entity_csr(entidades)
+    t_indice, postings = timed(lambda: build_entity_postings(csr), repeticoes)
+    nomes = [nome for nome, _ in entity_frequencies(csr, top=20)]
+    t_apply, _ = timed(lambda: [entidades.apply(lambda x: nome in x) for nome in nomes[:3]], 1)
+    t_scan, _ = timed(lambda: [rows_with_entity(csr, nome) for nome in nomes], repeticoes)
+    t_post, _ = timed(lambda: [posting_rows(postings, nome) for nome in nomes], repeticoes)
+    t_freq, _ = timed(lambda: entity_frequencies(csr, top=50), repeticoes)
+    t_top, _ = timed(lambda: top_entities(postings, top=50), repeticoes)
+    t_par_scan, _ = timed(lambda: np.intersect1d(rows_with_entity(csr, 'Pedro'), rows_with_entity(csr, 'João')), repeticoes)
+    t_par, juntos = timed(lambda: rows_with_all(postings, ['Pedro', 'João']), repeticoes)
+    print(f"Índice de entidades (construção): {t_indice * 1000:7.2f} ms ({len(postings['vocab'])} entidades)")
+    print(f"  filtro por entidade: apply {t_apply / 3 * 1000:7.2f} ms | CSR {t_scan / len(nomes) * 1000:7.3f} ms"
+          f" | postings {t_post / len(nomes) * 1e6:7.1f} µs")
+    print(f"  frequências top-50 : CSR {t_freq * 1000:7.2f} ms | postings {t_top * 1e6:7.1f} µs")
+    print(f"  Pedro e João       : CSR {t_par_scan * 1000:7.2f} ms | postings {t_par * 1e6:7.1f} µs ({len(juntos)} versículos)")
+
+
+def bench_timeline(df, repeticoes):
+    # Payload da dispersão para a entidade mais citada: px.scatter com o versículo
+    # inteiro no hover x um Scattergl com hover curto x um ponto por capítulo
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    compacto, csr = compact_bible(normalize_bible(df.copy()))
+    ref_index = build_reference_index(compacto)
+    stats = build_corpus_stats(compacto, ref_index)
+    postings = build_entity_postings(csr)
+    entidade = top_entities(postings, top=1)[0][0]
+    posicoes = posting_rows(postings, entidade)
+
+    def antigo():
+        return px.scatter(compacto.iloc[posicoes], x='ID_Global', y='Livro', color='Livro',
+                          hover_data=['Capitulo', 'Versiculo', 'Texto']).to_json()
+
+    def pontos():
+        p = timeline_points(compacto, posicoes)
+        return go.Figure(go.Scattergl(x=p['x'], y=p['livro'], mode='markers', text=p['hover'])).to_json()
+
+    def caixas():
+        c = timeline_bins(stats, posicoes)
+        return go.Figure(go.Scattergl(x=c['x'], y=c['livro'], mode='markers', marker=dict(size=c['mencoes'], color=c['densidade']),
+                                      customdata=np.column_stack([c['capitulo'], c['mencoes']]))).to_json()
+
+    print(f"Dispersão de '{entidade}' ({len(posicoes)} versículos):")
+    for nome, fn in [('px.scatter (texto inteiro)', antigo), ('Scattergl (hover curto)', pontos), ('por capítulo', caixas)]:
+        t, spec = timed(fn, repeticoes)
+        print(f"  {nome:28} {t * 1000:8.1f} ms | {len(spec) / 1e3:9.1f} KB")
+
+
+def bench_cooccurrence(df, repeticoes):
+    csr = build_entity_csr(extract_entities_batch(df['Texto']))
+    t_tabela, tabela = timed(lambda: build_cooccurrence_table(csr), repeticoes)
+    t_filtro, arestas = timed(lambda: filter_edges_top(tabela, 5, 200), repeticoes)
+    print(f"Tabela de coocorrência       : {t_tabela * 1000:8.1f} ms ({len(tabela['arestas'])} arestas)")
+    print(f"Filtro top-200 / peso >= 5   : {t_filtro * 1000:8.2f} ms ({len(arestas)} arestas)")
+
+
+def bench_layout(df, repeticoes):
+    tabela = build_cooccurrence_table(build_entity_csr(extract_entities_batch(df['Texto'])))
+    nos = tabela['nos']
+
+    def grafo(min_weight, max_nodes):
+        G = nx.Graph()
+        for origem, destino, peso in filter_edges_top(tabela, min_weight, max_nodes).itertuples(index=False):
+            G.add_edge(nos[origem], nos[destino], weight=int(peso))
+        return G
+
+    G = grafo(1, 200)
+    G_vizinho = grafo(2, 200)
+    t_spring, pos = timed(lambda: compute_layout(G, "Spring (Padrão)"), repeticoes)
+    t_quente, _ = timed(lambda: compute_layout(G_vizinho, "Spring (Padrão)", pos), repeticoes)
+    t_espectral, _ = timed(lambda: compute_layout(G, "Espectral Rápido (grafos grandes)"), repeticoes)
+    print(f"Layout spring ({len(G)} nós, {G.number_of_edges()} arestas): {t_spring * 1000:8.1f} ms")
+    print(f"Layout spring (partida quente) : {t_quente * 1000:8.1f} ms")
+    print(f"Layout espectral rápido        : {t_espectral * 1000:8.1f} ms")
+
+
+def bench_memory(df):
+    original = df.copy()
+    original['Entidades'] = extract_entities_batch(original['Texto'])
+    compacto, csr = compact_bible(normalize_bible(original.copy()))
+    relatorio = memory_report(original, compacto, csr)
+    print("Memória por coluna (bytes):")
+    print(relatorio.to_string(index=False))
+
+
+def bench_sessions(df, sessoes):
+    # N sessões simultâneas pedindo o conjunto de dados: st.cache_data entrega
+    # uma cópia (unpickle) por chamada; st.cache_resource entrega o mesmo objeto
+    compacto, csr = compact_bible(normalize_bible(df.copy()))
+
+    @st.cache_data
+    def por_copia(chave):
+        return compacto, csr
+
+    @st.cache_resource
+    def compartilhado(chave):
+        return build_dataset(compacto, csr, chave)
+
+    cenarios = [
+        ('cache_data', lambda: por_copia('sessoes')),
+        ('cache_resource', lambda: dataset_frame(compartilhado('sessoes'))),
+    ]
+    resultados = {}
+    for nome, sessao in cenarios:
+        sessao()  # aquece o cache fora da medição
+        tracemalloc.start()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            vistas = list(pool.map(lambda _: sessao(), range(sessoes)))
+        retido, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del vistas
+        resultados[nome] = retido
+        print(f"{sessoes} sessões via {nome:14}: {retido / 1e6:8.2f} MB retidos ({retido / sessoes / 1e3:.1f} KB/sessão)")
+    return resultados
+
+def _percentis(amostras):
+    ordenadas = sorted(amostras)
+    return ordenadas[len(ordenadas) // 2] * 1000, ordenadas[int(len(ordenadas) * 0.99)] * 1000
+
+
+def bench_progress_store(sessoes, operacoes=20):
+    # N sessões simultâneas: carrega o progresso e marca dias um a um
+    def sessao(store_load, store_save, leitor):
+        rng = random.Random(leitor)
+        leituras, escritas = [], []
+        t0 = time.perf_counter()
+        dias = store_load(f"leitor{leitor}", 'biblia')
+        leituras.append(time.perf_counter() - t0)
+        for _ in range(operacoes):
+            dias = sorted(set(dias) | {rng.randint(1, 365)})
+            t0 = time.perf_counter()
+            store_save(f"leitor{leitor}", 'biblia', dias)
+            escritas.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            store_load(f"leitor{leitor}", 'biblia')
+            leituras.append(time.perf_counter() - t0)
+        return leituras, escritas
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # Referência: uma conexão e um COMMIT por operação
+        ingenuo_path = os.path.join(pasta, 'ingenuo.sqlite')
+        with sqlite3.connect(ingenuo_path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE progresso (leitor TEXT, biblia TEXT, dias BLOB, PRIMARY KEY (leitor, biblia))')
+
+        def ingenuo_load(leitor, biblia):
+            conn = sqlite3.connect(ingenuo_path, timeout=30)
+            linha = conn.execute('SELECT dias FROM progresso WHERE leitor = ? AND biblia = ?', (leitor, biblia)).fetchone()
+            conn.close()
+            return decode_days(linha[0]) if linha else []
+
+        def ingenuo_save(leitor, biblia, dias):
+            conn = sqlite3.connect(ingenuo_path, timeout=30)
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO progresso VALUES (?, ?, ?)', (leitor, biblia, encode_days(dias)))
+            conn.close()
+
+        store = ProgressStore(os.path.join(pasta, 'progresso.sqlite'))
+        cenarios = [('conexão por operação', ingenuo_load, ingenuo_save), ('ProgressStore', store.load, store.save)]
+        for nome, load, save in cenarios:
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=min(sessoes, 64)) as pool:
+                resultados = list(pool.map(lambda i: sessao(load, save, i), range(sessoes)))
+            if nome == 'ProgressStore':
+                store.flush()
+            total = time.perf_counter() - t0
+            leituras = [t for r in resultados for t in r[0]]
+            escritas = [t for r in resultados for t in r[1]]
+            l50, l99 = _percentis(leituras)
+            e50, e99 = _percentis(escritas)
+            print(f"{sessoes} sessões, {nome:22}: leitura p50 {l50:6.3f} ms p99 {l99:7.3f} ms | "
+                  f"escrita p50 {e50:6.3f} ms p99 {e99:7.3f} ms | total {total:.2f}s")
+        store.close()
+        # Carregamento de página com o buffer vazio: toda leitura vai ao SQLite.
+        # Também confere que nada se perdeu no buffer.
+        conferencia = ProgressStore(os.path.join(pasta, 'progresso.sqlite'))
+
+        def carregar(i):
+            t0 = time.perf_counter()
+            dias = conferencia.load(f"leitor{i}", 'biblia')
+            return time.perf_counter() - t0, bool(dias)
+
+        with ThreadPoolExecutor(max_workers=min(sessoes, 64)) as pool:
+            frias = list(pool.map(carregar, range(sessoes)))
+        conferencia.close()
+        f50, f99 = _percentis([t for t, _ in frias])
+        ok = all(lido for _, lido in frias)
+        print(f"Leitura no carregamento (SQLite, pool): p50 {f50:6.3f} ms p99 {f99:7.3f} ms | persistido para todas: {ok}")
+        return ok
+
+
+class FakeLLMClient:
+    # Cliente local no formato do google-genai (client.models.generate_content*):
+    # sem rede, conta as chamadas que chegariam à API
+    def __init__(self, atraso=0.2, trechos=5):
+        self.atraso = atraso
+        self.trechos = trechos
+        self.chamadas = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def _contar(self):
+        with self._lock:
+            self.chamadas += 1
+
+    def generate_content(self, model, contents):
+        self._contar()
+        time.sleep(self.atraso)
+        return SimpleNamespace(text=f"Resposta ({model}) para: {' '.join(contents.split())[:40]}")
+
+    def generate_content_stream(self, model, contents):
+        self._contar()
+        for i in range(self.trechos):
+            time.sleep(self.atraso / self.trechos)
+            yield SimpleNamespace(text=f"trecho {i}\n")
+
+
+def bench_llm_cache(sessoes):
+    # Cache e coalescência das chamadas à IA contra um cliente falso local
+    with tempfile.TemporaryDirectory() as pasta:
+        path = os.path.join(pasta, 'llm.sqlite')
+
+        # N sessões pedem o mesmo prompt ao mesmo tempo: uma chamada à API
+        cliente = FakeLLMClient()
+        prompt = "Especialista em teologia: analise Livro 1 1."
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(sessoes, 64)) as pool:
+            respostas = list(pool.map(lambda _: generate_cached(cliente, prompt, path=path), range(sessoes)))
+        total = time.perf_counter() - t0
+        origens = Counter(origem for _, origem in respostas)
+        coalescidas = cliente.chamadas == 1 and len({texto for texto, _ in respostas}) == 1
+        print(f"IA: {sessoes} pedidos iguais simultâneos: {cliente.chamadas} chamada(s) à API em {total:.2f}s "
+              f"({dict(origens)}) | coalescência ok: {coalescidas}")
+
+        # Mesmo prompt depois (espaços diferentes): vem do SQLite
+        t0 = time.perf_counter()
+        _, origem = generate_cached(cliente, f"  {prompt}\n ", path=path)
+        acerto = origem == 'cache' and cliente.chamadas == 1
+        print(f"  segunda chamada: {origem} em {(time.perf_counter() - t0) * 1000:.2f} ms | acerto ok: {acerto}")
+
+        # Dono que lê o cache antes de outro dono gravar e só depois faz o _claim:
+        # a primeira leitura de cada chave é forçada a falhar
+        lida = set()
+        cache_get = llm.cache_get
+
+        def leitura_atrasada(chave, path=None, ttl_dias=None):
+            if chave not in lida:
+                lida.add(chave)
+                return None
+            return cache_get(chave, path, ttl_dias)
+
+        llm.cache_get = leitura_atrasada
+        try:
+            _, origem_corrida = generate_cached(cliente, prompt, path=path)
+        finally:
+            llm.cache_get = cache_get
+        corrida = origem_corrida == 'cache' and cliente.chamadas == 1
+        print(f"  dono que chega após outro terminar: {origem_corrida} | sem 2ª chamada: {corrida}")
+
+        # Stream interrompido (rerun no meio): a chave é liberada e o próximo pedido refaz a chamada
+        cliente_stream = FakeLLMClient()
+        prompt_stream = "Devocional do dia 1."
+        gerador = stream_cached(cliente_stream, prompt_stream, path=path)
+        next(gerador)
+        gerador.close()
+        liberada = prompt_key(llm.LLM_MODEL, prompt_stream) not in llm._em_andamento
+        stats = {}
+        texto = ''.join(stream_cached(cliente_stream, prompt_stream, path=path, stats=stats))
+        refeita = stats.get('origem') == 'api' and cliente_stream.chamadas == 2 and texto.count('trecho') == 5
+        _, origem_depois = generate_cached(cliente_stream, prompt_stream, path=path)
+        print(f"  stream interrompido: chave liberada {liberada} | refeito via {stats.get('origem')} "
+              f"(ttft {stats.get('ttft', 0) * 1000:.0f} ms) | depois: {origem_depois}")
+        return coalescidas and acerto and corrida and liberada and refeita and origem_depois == 'cache'
+
+
+# ---------------------------------------------------------
+# ETAPAS MEDIDAS (JSON para comparar entre commits)
+# ---------------------------------------------------------
+
+PAGINAS = ["🙏 Devocional Diário", "📊 Visão Geral", "👥 Análise de Entidades", "🕸️ Redes de Conexão (SNA)",
+           "🔍 Explorador de Texto", "🤖 Assistente de Estudo IA"]
+
+
+def measure(resultados, escala, etapa, fn, repeticoes=1):
+    # Tempo: melhor de N sem tracemalloc (que deixa o Python ~2x mais lento).
+    # Memória: uma execução à parte; pico e blocos ainda vivos ao fim da etapa.
+    segundos, resultado = timed(fn, repeticoes)
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+        estatisticas = tracemalloc.take_snapshot().statistics('filename')
+    finally:
+        tracemalloc.stop()
+    resultados.append({
+        'escala': escala,
+        'etapa': etapa,
+        'segundos': round(segundos, 6),
+        'pico_mb': round(pico / 1e6, 3),
+        'retido_mb': round(sum(e.size for e in estatisticas) / 1e6, 3),
+        'blocos': sum(e.count for e in estatisticas),
+    })
+    print(f"  {etapa:28} {segundos * 1000:10.1f} ms | pico {pico / 1e6:8.1f} MB | "
+          f"{resultados[-1]['blocos']:9d} blocos retidos")
+    return resultado
+
+
+def bench_stages(df, escala, repeticoes, cache_dir):
+    # O caminho de dados de cada página, sem navegador
+    resultados = []
+    dados = df.rename(columns={
+        'Livro': 'Book Name', 'Livro_ID': 'Book Number', 'Capitulo': 'Chapter', 'Versiculo': 'Verse', 'Texto': 'Text', 'ID_Global': 'Verse ID',
+    }).to_csv(index=False).encode('utf-8')
+    print(f"Escala {escala}x ({len(df)} versículos, CSV {len(dados) / 1e6:.1f} MB)")
+
+    def carregar_frio():
+        pasta = tempfile.mkdtemp(dir=cache_dir)
+        return load_bible_bytes(dados, 'biblia.csv', pasta)
+
+    compacto, csr = measure(resultados, escala, 'load_data (frio)', carregar_frio)
+    load_bible_bytes(dados, 'biblia.csv', cache_dir)
+    measure(resultados, escala, 'load_data (cache parquet)', lambda: load_bible_bytes(dados, 'biblia.csv', cache_dir), repeticoes)
+    measure(resultados, escala, 'entidades', lambda: build_entity_csr(extract_entities_batch(compacto['Texto'])), repeticoes)
+    dataset = measure(resultados, escala, 'build_dataset', lambda: build_dataset(compacto, csr), repeticoes)
+    df_ds, ref_index = dataset['df'], dataset['referencias']
+    measure(resultados, escala, 'plano de leitura', lambda: generate_reading_plan(df_ds), repeticoes)
+    measure(resultados, escala, 'visão geral (estatísticas)', lambda: build_corpus_stats(df_ds, ref_index), repeticoes)
+
+    tabela = measure(resultados, escala, 'sna: coocorrência', lambda: build_cooccurrence_table(dataset['entidades']), repeticoes)
+    arestas = measure(resultados, escala, 'sna: filtro de arestas', lambda: filter_edges_top(tabela, 5, 200), repeticoes)
+
+    def layout():
+        G = nx.Graph()
+        for origem, destino, peso in arestas.itertuples(index=False):
+            G.add_edge(tabela['nos'][origem], tabela['nos'][destino], weight=int(peso))
+        return compute_layout(G, "Spring (Padrão)")
+
+    measure(resultados, escala, 'sna: layout spring', layout, repeticoes)
+
+    indice = measure(resultados, escala, 'explorador: índice', lambda: build_inverted_index(df_ds['Texto']))
+    consultas = ['amor', 'salv*', 'Pedro OR João', '"disse o povo"']
+    measure(resultados, escala, 'explorador: busca exata',
+            lambda: [search_inverted_index(indice, c) for c in consultas], repeticoes)
+    bm25 = measure(resultados, escala, 'explorador: índice BM25', lambda: build_bm25_index(df_ds['Texto']))
+    measure(resultados, escala, 'explorador: busca BM25',
+            lambda: [rank_bm25(bm25, c, 50) for c in ['amor', 'coração palavra', 'águas*']], repeticoes)
+
+    capitulos = list(ref_index['fatias'])[::max(1, len(ref_index['fatias']) // 50)]
+    measure(resultados, escala, 'capítulos (explorador)',
+            lambda: [render_explorer_chapter(df_ds, ref_index, dataset['entidades'], b, c) for b, c in capitulos], repeticoes)
+    measure(resultados, escala, 'capítulos (devocional)',
+            lambda: [render_devotional_chapter(df_ds, ref_index, b, c) for b, c in capitulos], repeticoes)
+    return resultados, dados
+
+
+def bench_pages(dados, escala, cache_dir):
+    # Rerun completo de cada página (AppTest, sem navegador): primeira visita e rerun
+    from streamlit.testing.v1 import AppTest
+
+    caminho = os.path.join(cache_dir, f"biblia-{escala}x.csv")
+    with open(caminho, 'wb') as f:
+        f.write(dados)
+    os.environ['BIBLIA_ARQUIVO'] = caminho
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analise_biblica.py'),
+                            default_timeout=600)
+    resultados = []
+
+    def rodar(pagina, visita, acao):
+        t0 = time.perf_counter()
+        acao()
+        segundos = time.perf_counter() - t0
+        erro = str(app.exception[0].message) if len(app.exception) else None
+        resultados.append({'escala': escala, 'pagina': pagina, 'visita': visita,
+                           'segundos': round(segundos, 4), 'erro': erro})
+        print(f"  {pagina:30} {visita:8} {segundos * 1000:10.1f} ms" + (f" ERRO: {erro}" if erro else ""))
+
+    rodar('(carregamento)', 'primeira', app.run)
+    if not app.sidebar.radio:
+        return resultados
+    for pagina in PAGINAS:
+        rodar(pagina, 'primeira', lambda: app.sidebar.radio[0].set_value(pagina).run())
+        rodar(pagina, 'rerun', app.run)
+    return resultados
+
+
+# ---------------------------------------------------------
+# PARTIDA A FRIO (cada medição num interpretador novo)
+# ---------------------------------------------------------
+
+MODULOS_PESADOS = ['networkx', 'plotly.express', 'plotly.graph_objects', 'google.genai', 'sentence_transformers', 'openpyxl']
+
+_SONDA_PARTIDA = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+base = time.perf_counter() - t0
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+etapas = []
+def medir(nome, acao):
+    t0 = time.perf_counter()
+    acao()
+    etapas.append({'etapa': nome, 'segundos': time.perf_counter() - t0, 'erro': bool(app.exception),
+                   'modulos': [m for m in json.loads(sys.argv[3]) if m in sys.modules]})
+medir('tela inicial (sem arquivo)', app.run)
+os.environ['BIBLIA_ARQUIVO'] = sys.argv[2]
+medir('primeira página com dados', app.run)
+for pagina in json.loads(sys.argv[4]):
+    medir(pagina, lambda: app.sidebar.radio[0].set_value(pagina).run())
+print(json.dumps({'streamlit': base, 'etapas': etapas}))
+"""
+
+
+def _import_times(saida_importtime, top=12):
+    # Linhas "import time: self | cumulativo | nome"; sem recuo = import de primeiro nível
+    tempos = []
+    for linha in saida_importtime.splitlines():
+        if not linha.startswith('import time:') or '|' not in linha:
+            continue
+        _, cumulativo, nome = linha.split('|')
+        if nome.startswith(' ') and not nome.startswith('  ') and cumulativo.strip().isdigit():
+            tempos.append((int(cumulativo) / 1e6, nome.strip()))
+    return sorted(tempos, reverse=True)[:top]
+
+
+def bench_startup(repeticoes, cache_dir):
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analise_biblica.py')
+    caminho = os.path.join(cache_dir, 'biblia-partida.csv')
+    synthetic_bible(1).rename(columns={
+        'Livro': 'Book Name', 'Livro_ID': 'Book Number', 'Capitulo': 'Chapter', 'Versiculo': 'Verse',
+        'Texto': 'Text', 'ID_Global': 'Verse ID',
+    }).to_csv(caminho, index=False)
+    paginas = ["🔍 Explorador de Texto", "🕸️ Redes de Conexão (SNA)", "🤖 Assistente de Estudo IA"]
+    ambiente = dict(os.environ, BIBLIA_CACHE_DIR=cache_dir)
+    ambiente.pop('BIBLIA_ARQUIVO', None)
+    comando = [app, caminho, json.dumps(MODULOS_PESADOS), json.dumps(paginas)]
+
+    execucoes = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', _SONDA_PARTIDA] + comando, capture_output=True, text=True,
+                               env=ambiente, timeout=900)
+        execucoes.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    print(f"Partida a frio ({repeticoes} interpretadores, mediana; import do Streamlit "
+          f"{statistics.median(e['streamlit'] for e in execucoes) * 1000:.0f} ms à parte):")
+    for i, etapa in enumerate(execucoes[0]['etapas']):
+        mediana = statistics.median(e['etapas'][i]['segundos'] for e in execucoes)
+        erro = " ERRO" if any(e['etapas'][i]['erro'] for e in execucoes) else ""
+        print(f"  {etapa['etapa']:30} {mediana * 1000:9.1f} ms | carregados: {', '.join(etapa['modulos']) or '-'}{erro}")
+
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', _SONDA_PARTIDA] + comando,
+                           capture_output=True, text=True, env=ambiente, timeout=900)
+    print("Imports mais caros (cumulativo, -X importtime):")
+    for segundos, nome in _import_times(saida.stderr):
+        print(f"  {nome:30} {segundos * 1000:9.1f} ms")
+    return execucoes
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare_results(atual, anterior):
+    base = {(r['escala'], r['etapa']): r for r in anterior.get('etapas', [])}
+    print(f"Comparação com {anterior.get('commit') or 'execução anterior'}:")
+    for r in atual['etapas']:
+        antes = base.get((r['escala'], r['etapa']))
+        if antes is None or not antes['segundos']:
+            continue
+        razao = r['segundos'] / antes['segundos']
+        alerta = '  <-- mais lento' if razao > 1.2 else ''
+        print(f"  {r['escala']:3}x {r['etapa']:28} {antes['segundos'] * 1000:9.1f} -> {r['segundos'] * 1000:9.1f} ms "
+              f"({razao:5.2f}x) | pico {antes['pico_mb']:.1f} -> {r['pico_mb']:.1f} MB{alerta}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de dados")
+    parser.add_argument("--escala", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sessoes", type=int, default=20)
+    parser.add_argument("--leitores", type=int, default=200)
+    parser.add_argument("--etapas", action='store_true', help="Mede tempo e memória por etapa (em vez das comparações)")
+    parser.add_argument("--escalas", default="1", help="Ex: 1,5,20 (com --etapas)")
+    parser.add_argument("--paginas", action='store_true', help="Também mede o rerun de cada página via AppTest")
+    parser.add_argument("--json", default=None, help="Grava os resultados de --etapas neste arquivo")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--partida", action='store_true', help="Mede imports e a primeira renderização do app")
+    args = parser.parse_args()
+
+    if args.partida:
+        with tempfile.TemporaryDirectory() as pasta:
+            bench_startup(args.repeticoes, pasta)
+    elif args.etapas:
+        relatorio = {
+            'commit': git_commit(),
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'repeticoes': args.repeticoes,
+            'etapas': [],
+            'paginas': [],
+        }
+        with tempfile.TemporaryDirectory() as pasta:
+            for escala in [int(e) for e in args.escalas.split(',')]:
+                df = synthetic_bible(escala)
+                etapas, dados = bench_stages(df, escala, args.repeticoes, pasta)
+                relatorio['etapas'].extend(etapas)
+                if args.paginas:
+                    relatorio['paginas'].extend(bench_pages(dados, escala, pasta))
+        if args.comparar:
+            with open(args.comparar, encoding='utf-8') as f:
+                compare_results(relatorio, json.load(f))
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(relatorio, f, ensure_ascii=False, indent=2)
+            print(f"Resultados gravados em {args.json}")
+    else:
+        df = synthetic_bible(args.escala)
+        print(f"Versículos: {len(df)}")
+        bench_entities(df, args.repeticoes)
+        bench_search(df, args.repeticoes)
+        bench_statistics(df, args.repeticoes)
+        bench_bm25(df, args.repeticoes)
+        bench_semantic(df, args.repeticoes)
+        bench_translations(df, args.repeticoes)
+        bench_context(df, args.repeticoes)
+        bench_entity_postings(df, args.repeticoes)
+        bench_timeline(df, args.repeticoes)
+        bench_cooccurrence(df, args.repeticoes)
+        bench_layout(df, args.repeticoes)
+        bench_memory(df)
+        bench_sessions(df, args.sessoes)
+        bench_progress_store(args.leitores)
+        bench_llm_cache(args.sessoes)
@@ -0,0 +1,258 @@
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from entidades import STOPWORDS_PT
+
+# =========================================================
+# ÍNDICE INVERTIDO PARA O EXPLORADOR DE TEXTO
+# =========================================================
+
+_RE_TOKEN = re.compile(r'\w+')
+_RE_CONSULTA = re.compile(r'"[^"]*"|\S+')
+_SEPARADOR = '\x1e'
+_VAZIO = np.empty(0, dtype=np.int32)
+
+
+def normalize_text(text):
+    # Minúsculas e sem acentos: "Coração" -> "coracao"
+    decomposto = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposto if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return _RE_TOKEN.findall(normalize_text(text))
+
+
+def build_inverted_index(textos):
+    # Normaliza tudo numa passada só e mapeia token -> posições (iloc) dos versículos
+    textos = [t if isinstance(t, str) else '' for t in textos]
+    normalizados = normalize_text(_SEPARADOR.join(textos)).split(_SEPARADOR)
+    if len(normalizados) != len(textos):
+        normalizados = [normalize_text(t) for t in textos]
+
+    postings = defaultdict(list)
+    sequencias = []
+    for pos, linha in enumerate(normalizados):
+        tokens = _RE_TOKEN.findall(linha)
+        for tok in set(tokens):
+            postings[tok].append(pos)
+        # Sequência de tokens com espaços nas bordas, usada para confirmar frases
+        sequencias.append(' ' + ' '.join(tokens) + ' ')
+
+    return {
+        'vocab': sorted(postings),
+        'postings': {tok: np.array(p, dtype=np.int32) for tok, p in postings.items()},
+        'sequencias': sequencias,
+        'n_docs': len(textos),
+    }
+
+
+def _intersect(listas):
+    if not listas:
+        return _VAZIO
+    listas = sorted(listas, key=len)
+    resultado = listas[0]
+    for lista in listas[1:]:
+        if len(resultado) == 0:
+            break
+        resultado = np.intersect1d(resultado, lista, assume_unique=True)
+    return resultado
+
+
+def _prefix_postings(index, prefixo):
+    vocab = index['vocab']
+    ini = bisect.bisect_left(vocab, prefixo)
+    fim = bisect.bisect_left(vocab, prefixo + '\uffff')
+    if ini == fim:
+        return _VAZIO
+    if fim - ini == 1:
+        return index['postings'][vocab[ini]]
+    return np.unique(np.concatenate([index['postings'][tok] for tok in vocab[ini:fim]]))
+
+
+def _clause_postings(index, clausula):
+    if clausula.startswith('"'):
+        tokens = tokenize(clausula.strip('"'))
+        if not tokens:
+            return None
+        candidatos = _intersect([index['postings'].get(tok, _VAZIO) for tok in tokens])
+        if len(tokens) == 1 or len(candidatos) == 0:
+            return candidatos
+        frase = ' ' + ' '.join(tokens) + ' '
+        sequencias = index['sequencias']
+        return np.array([p for p in candidatos if frase in sequencias[p]], dtype=np.int32)
+
+    if clausula.endswith('*'):
+        tokens = tokenize(clausula)
+        if len(tokens) != 1:
+            return _intersect([index['postings'].get(tok, _VAZIO) for tok in tokens]) if tokens else None
+        return _prefix_postings(index, tokens[0])
+
+    tokens = tokenize(clausula)
+    if not tokens:
+        return None
+    # "d'Ele" ou "pré-exílio" geram mais de um token: exige todos
+    return _intersect([index['postings'].get(tok, _VAZIO) for tok in tokens])
+
+
+def search_inverted_index(index, query):
+    # Sintaxe: termos separados por espaço (E), "OR" ou "|" (OU),
+    # "frase entre aspas" e prefixo com * (ex: amor*).
+    # Retorna as posições (iloc) ordenadas dos versículos encontrados.
+    grupos = [[]]
+    for parte in _RE_CONSULTA.findall(query):
+        if parte in ('OR', '|'):
+            grupos.append([])
+        else:
+            grupos[-1].append(parte)
+
+    resultado = _VAZIO
+    for grupo in grupos:
+        listas = [p for p in (_clause_postings(index, c) for c in grupo) if p is not None]
+        if listas:
+            resultado = np.union1d(resultado, _intersect(listas)).astype(np.int32)
+    return resultado
+
+
+# =========================================================
+# BUSCA RANQUEADA (BM25)
+# Matriz termo x versículo em CSC feita à mão (como o CSR de entidades):
+# os pesos BM25 de cada par já ficam calculados na construção, e uma
+# consulta é só somar as colunas dos seus termos com np.bincount.
+# =========================================================
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TESTAMENTOS = ['Antigo Testamento', 'Novo Testamento']
+LIVROS_AT = 39
+
+# As stopwords da extração de entidades, sem acento; nomes divinos continuam
+# pesquisáveis aqui, já que buscar "Deus" ou "Cristo" é comum
+_NOMES_PESQUISAVEIS = frozenset(['deus', 'jesus', 'cristo', 'senhor'])
+_STOP_BM25 = frozenset(normalize_text(w) for w in STOPWORDS_PT) - _NOMES_PESQUISAVEIS
+
+# Plurais mais comuns do português (já sem acento), testados em ordem
+_SUFIXOS_PLURAL = (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+                   ('ns', 'm'), ('res', 'r'), ('zes', 'z'), ('les', 'l'), ('ses', 's'), ('s', ''))
+
+
+def stem_pt(token):
+    # Radical leve: tira o plural e a vogal final ("amados" e "amada" -> "amad")
+    if len(token) <= 3:
+        return token
+    for sufixo, troca in _SUFIXOS_PLURAL:
+        if token.endswith(sufixo) and len(token) - len(sufixo) >= 2:
+            token = token[:-len(sufixo)] + troca
+            break
+    if len(token) > 4 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def bm25_terms(text):
+    return [stem_pt(tok) for tok in tokenize(text) if tok not in _STOP_BM25]
+
+
+def build_bm25_index(textos, k1=BM25_K1, b=BM25_B):
+    textos = [t if isinstance(t, str) else '' for t in textos]
+    normalizados = normalize_text(_SEPARADOR.join(textos)).split(_SEPARADOR)
+    if len(normalizados) != len(textos):
+        normalizados = [normalize_text(t) for t in textos]
+
+    # Radical memoizado por token distinto: o vocabulário é bem menor que o texto
+    radicais = {}
+    termos_por_doc = []
+    for linha in normalizados:
+        termos = []
+        for tok in _RE_TOKEN.findall(linha):
+            radical = radicais.get(tok)
+            if radical is None:
+                radical = radicais[tok] = '' if tok in _STOP_BM25 else stem_pt(tok)
+            if radical:
+                termos.append(radical)
+        termos_por_doc.append(termos)
+
+    vocab = sorted(set(radicais.values()) - {''})
+    ids = {termo: i for i, termo in enumerate(vocab)}
+    n_docs = len(textos)
+    tamanhos = np.fromiter((len(t) for t in termos_por_doc), dtype=np.int64, count=n_docs)
+    termo_ids = np.fromiter((ids[t] for termos in termos_por_doc for t in termos), dtype=np.int64, count=int(tamanhos.sum()))
+    doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), tamanhos)
+
+    # Pares (termo, versículo) únicos já ordenados por termo: tf e layout CSC de uma vez
+    pares, tf = np.unique(termo_ids * max(n_docs, 1) + doc_ids, return_counts=True)
+    termo_par = pares // max(n_docs, 1)
+    docs = (pares % max(n_docs, 1)).astype(np.int32)
+    df_termo = np.bincount(termo_par, minlength=len(vocab))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(df_termo, out=offsets[1:])
+
+    idf = np.log1p((n_docs - df_termo + 0.5) / (df_termo + 0.5))
+    media = tamanhos.mean() if n_docs and tamanhos.sum() else 1.0
+    norma = k1 * (1 - b + b * tamanhos[docs] / media)
+    pesos = (idf[termo_par] * tf * (k1 + 1) / (tf + norma)).astype(np.float32)
+
+    return {'vocab': vocab, 'offsets': offsets, 'docs': docs, 'pesos': pesos, 'n_docs': n_docs}
+
+
+def _bm25_term_ids(index, query):
+    vocab = index['vocab']
+    ids = set()
+    for parte in _RE_CONSULTA.findall(query):
+        if parte in ('OR', '|'):
+            continue
+        if parte.endswith('*'):
+            tokens = tokenize(parte)
+            if len(tokens) == 1:
+                # Prefixo: todos os radicais que começam com o radical digitado
+                prefixo = stem_pt(tokens[0])
+                ids.update(range(bisect.bisect_left(vocab, prefixo), bisect.bisect_left(vocab, prefixo + '\uffff')))
+                continue
+        for termo in bm25_terms(parte):
+            i = bisect.bisect_left(vocab, termo)
+            if i < len(vocab) and vocab[i] == termo:
+                ids.add(i)
+    return sorted(ids)
+
+
+def rank_bm25(index, query, top_k=50, mascara=None):
+    # Retorna (posições, pontuações, total): os top_k versículos por relevância
+    # e quantos versículos casaram com algum termo (após o filtro)
+    ids = _bm25_term_ids(index, query)
+    if not ids:
+        return _VAZIO, np.empty(0, dtype=np.float32), 0
+    offsets = index['offsets']
+    fatias = [slice(offsets[i], offsets[i + 1]) for i in ids]
+    docs = np.concatenate([index['docs'][f] for f in fatias])
+    pesos = np.concatenate([index['pesos'][f] for f in fatias])
+    pontuacao = np.bincount(docs, weights=pesos, minlength=index['n_docs'])
+    if mascara is not None:
+        pontuacao[~mascara] = 0
+
+    candidatos = np.flatnonzero(pontuacao > 0)
+    total = len(candidatos)
+    if total > top_k:
+        candidatos = candidatos[np.argpartition(-pontuacao[candidatos], top_k - 1)[:top_k]]
+    # Maior pontuação primeiro; empates na ordem do texto
+    ordem = np.lexsort((candidatos, -pontuacao[candidatos]))
+    candidatos = candidatos[ordem]
+    return candidatos.astype(np.int32), pontuacao[candidatos].astype(np.float32), total
+
+
+def verse_mask(df, livros=None, testamento=None):
+    # Filtro por livro(s) e testamento como vetor booleano por posição (iloc)
+    mascara = np.ones(len(df), dtype=bool)
+    if livros:
+        mascara &= df['Livro'].isin(livros).to_numpy()
+    if testamento in TESTAMENTOS:
+        if 'Livro_ID' in df.columns:
+            ordem_livro = df['Livro_ID'].to_numpy()
+        else:
+            ordem_livro = pd.factorize(df['Livro'], sort=False)[0] + 1
+        mascara &= (ordem_livro <= LIVROS_AT) if testamento == TESTAMENTOS[0] else (ordem_livro > LIVROS_AT)
+    return mascara
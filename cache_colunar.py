@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import os
+import time
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from ingestao import parse_bible
+from memoria import compact_bible
+
+# =========================================================
+# CACHE COLUNAR EM DISCO (PARQUET)
+# Uso: python cache_colunar.py seed blivre.xlsx [outra.csv ...]
+#      python cache_colunar.py evict [--max-mb 512] [--max-dias 30]
+# =========================================================
+
+# Incrementar quando a normalização mudar, invalidando os arquivos antigos
+CACHE_VERSION = 2
+# Temporários de escritas interrompidas (processo morto entre gravar e renomear)
+MAX_TMP_HORAS = 1
+CACHE_DIR = os.environ.get('BIBLIA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'analise_biblica'))
+MAX_CACHE_MB = int(os.environ.get('BIBLIA_CACHE_MAX_MB', '512'))
+MAX_CACHE_DIAS = int(os.environ.get('BIBLIA_CACHE_MAX_DIAS', '30'))
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_path(chave, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{chave}-v{CACHE_VERSION}.parquet")
+
+
+def _csr_from_arrow(lista):
+    # ListArray do Arrow -> CSR com vocabulário em ordem alfabética, sem passar
+    # por listas Python
+    lista = lista.combine_chunks() if hasattr(lista, 'combine_chunks') else lista
+    offsets = np.asarray(lista.offsets, dtype=np.int64)
+    offsets = offsets - offsets[0]
+    codificado = pc.dictionary_encode(lista.flatten())
+    dicionario = np.asarray(codificado.dictionary.to_pylist(), dtype=object)
+    ordem = np.argsort(dicionario, kind='stable')
+    posto = np.empty(len(ordem), dtype=np.int32)
+    posto[ordem] = np.arange(len(ordem), dtype=np.int32)
+    indices = codificado.indices.to_numpy(zero_copy_only=False)
+    return {'vocab': dicionario[ordem], 'offsets': offsets, 'ids': posto[indices] if len(indices) else np.zeros(0, dtype=np.int32)}
+
+
+def read_cached(chave, cache_dir=None):
+    path = cache_path(chave, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        tabela = pq.read_table(path, memory_map=True)
+        csr = _csr_from_arrow(tabela.column('Entidades'))
+        df = tabela.drop_columns(['Entidades']).to_pandas()
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        # Arquivo truncado ou corrompido: descarta a entrada e o chamador relê o original
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    # Atualiza o horário de acesso usado pela remoção por antiguidade
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return df, csr
+
+
+def write_cached(chave, df, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(chave, cache_dir)
+    # Escrita atômica: outras sessões nunca leem um arquivo pela metade
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    evict_cache(cache_dir=cache_dir)
+    return path
+
+
+def evict_cache(max_mb=None, max_dias=None, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = (MAX_CACHE_MB if max_mb is None else max_mb) * 1024 * 1024
+    max_idade = (MAX_CACHE_DIAS if max_dias is None else max_dias) * 86400
+    if not os.path.isdir(cache_dir):
+        return []
+
+    agora = time.time()
+    arquivos = []
+    removidos = []
+    for nome in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, nome)
+        # Parquet das Bíblias e vetores semânticos (.npy) seguem o mesmo limite;
+        # .tmp antigos são restos de escritas interrompidas
+        if not nome.endswith(('.parquet', '.npy', '.tmp')):
+            continue
+        try:
+            info = os.stat(path)
+        except OSError:
+            continue
+        if nome.endswith('.tmp'):
+            if agora - info.st_mtime > MAX_TMP_HORAS * 3600:
+                try:
+                    os.remove(path)
+                    removidos.append(path)
+                except OSError:
+                    pass
+            continue
+        arquivos.append((info.st_mtime, info.st_size, path))
+
+    # Mais antigos primeiro: vencidos saem sempre, os demais até caber no limite
+    arquivos.sort()
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for mtime, tamanho, path in arquivos:
+        if agora - mtime <= max_idade and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= tamanho
+        removidos.append(path)
+    return removidos
+
+
+def load_bible_bytes(data, filename, cache_dir=None):
+    chave = content_hash(data)
+    cached = read_cached(chave, cache_dir)
+    if cached is not None:
+        return cached
+    df = parse_bible(data, filename)
+    try:
+        write_cached(chave, df, cache_dir)
+    except OSError:
+        # Sem permissão de escrita (ou disco cheio): segue sem cache em disco
+        pass
+    return compact_bible(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache colunar das Bíblias carregadas")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_seed = sub.add_parser('seed', help="Pré-carrega arquivos CSV/XLSX no cache")
+    p_seed.add_argument('arquivos', nargs='+')
+    p_seed.add_argument('--sem-vetores', action='store_true', help="Não pré-calcula os vetores semânticos")
+    p_evict = sub.add_parser('evict', help="Remove entradas antigas ou excedentes")
+    p_evict.add_argument('--max-mb', type=int, default=None)
+    p_evict.add_argument('--max-dias', type=int, default=None)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    if args.comando == 'seed':
+        for arquivo in args.arquivos:
+            with open(arquivo, 'rb') as f:
+                data = f.read()
+            t0 = time.perf_counter()
+            df, _ = load_bible_bytes(data, arquivo, args.cache_dir)
+            print(f"{arquivo}: {len(df)} versículos -> {cache_path(content_hash(data), args.cache_dir)} ({time.perf_counter() - t0:.2f}s)")
+            if not args.sem_vetores:
+                # Vetores da página de semelhantes gravados junto (.npy com a mesma chave)
+                from semantica import compute_embeddings, load_encoder
+                t0 = time.perf_counter()
+                vetores = compute_embeddings(df['Texto'], content_hash(data), load_encoder(), cache_dir=args.cache_dir)
+                print(f"{arquivo}: vetores {vetores.shape[0]} x {vetores.shape[1]} ({time.perf_counter() - t0:.2f}s)")
+    else:
+        for path in evict_cache(args.max_mb, args.max_dias, args.cache_dir):
+            print(f"removido: {path}")
@@ -0,0 +1,143 @@
+import numpy as np
+
+from busca import BM25_K1, bm25_terms
+from referencias import chapter_rows
+from semantica import search_vectors
+
+# =========================================================
+# CONTEXTO PARA A IA (RECUPERAÇÃO + ORÇAMENTO DE TOKENS)
+# Em vez de cortar o texto em N caracteres, os versículos do trecho são
+# ranqueados pela proximidade com o tema do trecho (vetores semânticos),
+# versículos relacionados de outros livros entram como referências cruzadas,
+# e o melhor conjunto é empacotado até o orçamento de tokens. Sem vetores
+# prontos (vector_index=None), o ranking usa só os termos do próprio trecho
+# e não há referências cruzadas: nada de índice global no caminho da IA.
+# =========================================================
+
+CHARS_POR_TOKEN = 4
+ORCAMENTO_DEVOCIONAL = 2000
+ORCAMENTO_ASSISTENTE = 1500
+# Versículo isolado: ele mesmo, os mais ligados do capítulo e algumas referências
+ORCAMENTO_VERSICULO = 400
+N_RELACIONADOS = 5
+# Parte do orçamento guardada para as referências cruzadas
+FRACAO_RELACIONADOS = 0.15
+
+
+def estimate_tokens(texto):
+    # Aproximação sem tokenizador: ~4 caracteres por token em português
+    return len(texto) // CHARS_POR_TOKEN + 1
+
+
+def _passage_positions(df, ref_index, trechos):
+    # trechos: [(livro, cap)] ou [(livro, cap, vers)] -> (posições, posições em foco)
+    posicoes, foco = [], []
+    for trecho in trechos:
+        capitulo = chapter_rows(df, ref_index, trecho[0], trecho[1])
+        locs = df.index.get_indexer(capitulo.index)
+        posicoes.extend(locs.tolist())
+        if len(trecho) > 2:
+            foco.extend(locs[capitulo['Versiculo'].to_numpy() == trecho[2]].tolist())
+    return np.array(posicoes, dtype=np.int64), np.array(foco, dtype=np.int64)
+
+
+def _lexical_vectors(textos):
+    # Pesos BM25 (tf saturado x idf) calculados só dentro do trecho, normalizados
+    termos = [bm25_terms(t if isinstance(t, str) else '') for t in textos]
+    vocab = {}
+    for lista in termos:
+        for termo in lista:
+            vocab.setdefault(termo, len(vocab))
+    tf = np.zeros((len(textos), max(1, len(vocab))), dtype=np.float64)
+    for i, lista in enumerate(termos):
+        for termo in lista:
+            tf[i, vocab[termo]] += 1
+    df_termo = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(textos) - df_termo + 0.5) / (df_termo + 0.5))
+    pesos = tf * (BM25_K1 + 1) / (tf + BM25_K1) * idf
+    normas = np.linalg.norm(pesos, axis=1, keepdims=True)
+    normas[normas == 0] = 1
+    return pesos / normas
+
+
+def _greedy_pack(candidatos, pontuacao, custos, orcamento):
+    # Maior pontuação primeiro (empate: ordem do texto) enquanto couber
+    escolhidos, usado = [], 0
+    for i in np.lexsort((candidatos, -pontuacao)):
+        if usado + custos[i] <= orcamento:
+            escolhidos.append(candidatos[i])
+            usado += custos[i]
+    return escolhidos, usado
+
+
+def build_context(df, ref_index, vector_index, trechos, orcamento=ORCAMENTO_DEVOCIONAL, n_relacionados=N_RELACIONADOS):
+    # Retorna {'texto', 'tokens', 'selecionados', 'candidatos', 'relacionados'}.
+    # Determinístico: mesmos trechos e orçamento -> mesmo contexto.
+    posicoes, foco = _passage_positions(df, ref_index, trechos)
+    if len(posicoes) == 0:
+        return {'texto': '', 'tokens': 0, 'selecionados': 0, 'candidatos': 0, 'relacionados': 0}
+
+    if vector_index is not None:
+        vetores = vector_index['vetores']
+        trecho = np.asarray(vetores[posicoes], dtype=np.float32)
+    else:
+        trecho = _lexical_vectors(df['Texto'].iloc[posicoes].tolist())
+        n_relacionados = 0
+    em_foco = np.isin(posicoes, foco)
+    tema = trecho[em_foco if len(foco) else slice(None)].sum(axis=0)
+    norma = np.linalg.norm(tema)
+    tema = tema / norma if norma else tema
+
+    pontuacao = np.asarray(trecho @ tema, dtype=np.float64)
+    # Versículos escolhidos explicitamente sempre entram primeiro
+    pontuacao[em_foco] = np.inf
+    relacionados, pont_rel = search_vectors(vetores, tema, n_relacionados, vector_index['ivf'], excluir=posicoes) \
+        if n_relacionados else (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+    relacionados = relacionados.astype(np.int64)
+
+    # Só as linhas envolvidas saem do frame: posição -> (livro, cap, vers, texto)
+    todas = np.concatenate([posicoes, relacionados])
+    sub = df.iloc[todas]
+    linha = dict(zip(todas.tolist(), zip(sub['Livro'].tolist(), sub['Capitulo'].tolist(),
+                                         sub['Versiculo'].tolist(), sub['Texto'].tolist())))
+
+    def versiculo(p):
+        return f"{linha[p][2]}. {linha[p][3]} "
+
+    def referencia(p):
+        return f"- {linha[p][0]} {linha[p][1]}:{linha[p][2]} {linha[p][3]}\n"
+
+    custos = np.array([estimate_tokens(versiculo(p)) for p in posicoes.tolist()], dtype=np.int64)
+    custos_rel = np.array([estimate_tokens(referencia(p)) for p in relacionados.tolist()], dtype=np.int64)
+
+    # O trecho usa o orçamento todo se não houver relacionados; senão reserva uma fatia
+    reserva = min(int(orcamento * FRACAO_RELACIONADOS), int(custos_rel.sum()))
+    escolhidos, usado = _greedy_pack(posicoes, pontuacao, custos, orcamento - reserva)
+    escolhidos_rel, usado_rel = _greedy_pack(relacionados, pont_rel.astype(np.float64),
+                                             custos_rel, orcamento - usado) if len(relacionados) else ([], 0)
+
+    # Texto na ordem de leitura, agrupado por capítulo, marcando os cortes
+    selecionados = set(int(p) for p in escolhidos)
+    partes = []
+    for trecho in dict.fromkeys((t[0], t[1]) for t in trechos):
+        pos_cap = _passage_positions(df, ref_index, [trecho])[0].tolist()
+        linhas, anterior_omitido = [], False
+        for p in pos_cap:
+            if p in selecionados:
+                linhas.append(versiculo(p))
+                anterior_omitido = False
+            elif not anterior_omitido:
+                linhas.append("(...) ")
+                anterior_omitido = True
+        if any(p in selecionados for p in pos_cap):
+            partes.append(f"\n\nTexto de {trecho[0]} {trecho[1]}:\n" + ''.join(linhas))
+    if escolhidos_rel:
+        partes.append("\n\nReferências relacionadas:\n" + ''.join(referencia(int(p)) for p in escolhidos_rel))
+
+    return {
+        'texto': ''.join(partes),
+        'tokens': int(usado + usado_rel),
+        'selecionados': len(escolhidos),
+        'candidatos': len(posicoes),
+        'relacionados': len(escolhidos_rel),
+    }
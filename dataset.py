@@ -0,0 +1,234 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+from pandas.arrays import ArrowStringArray
+
+from busca import build_bm25_index, build_inverted_index
+from contexto import N_RELACIONADOS, ORCAMENTO_DEVOCIONAL, build_context
+from entidades import build_entity_postings
+from estatisticas import build_corpus_stats, vocabulary_growth
+from grafo import build_cooccurrence_table
+from perfil import count_cache, span
+from plano import build_plan_index, generate_reading_plan
+from referencias import build_reference_index
+from renderizacao import render_devotional_chapter, render_explorer_chapter
+from semantica import build_vector_index, has_embeddings, load_encoder
+
+# =========================================================
+# CONJUNTO DE DADOS COMPARTILHADO ENTRE SESSÕES
+# Um único objeto imutável por Bíblia carregada, servido via st.cache_resource:
+# todas as sessões leem os mesmos buffers, sem cópia por rerun.
+# =========================================================
+
+# Contextos da IA guardados por conjunto de dados (LRU): um por trecho e orçamento
+MAX_CONTEXTOS = 256
+
+
+def freeze_array(arr):
+    arr = np.asarray(arr)
+    arr.flags.writeable = False
+    return arr
+
+
+class ReadOnlyStringArray(ArrowStringArray):
+    # O buffer Arrow é imutável, mas o ArrowStringArray troca o array inteiro num
+    # __setitem__: df.loc[i, 'Texto'] = ... alteraria o frame de todas as sessões.
+    # Só o array congelado é somente leitura; cópias, fatias e resultados de
+    # operações voltam a ser ArrowStringArray comuns.
+    def __new__(cls, values, *, dtype=None, _congelado=False):
+        if not _congelado:
+            return ArrowStringArray(values, dtype=dtype)
+        return super().__new__(cls)
+
+    def __init__(self, values, *, dtype=None, _congelado=False):
+        super().__init__(values, dtype=dtype)
+
+    def __setitem__(self, key, value):
+        raise ValueError("Texto compartilhado entre sessões é somente leitura.")
+
+    def __reduce__(self):
+        # Despickle (cópia em outro processo) volta a ser um array comum
+        return _plain_string_array, (self._pa_array, self.dtype)
+
+
+def _plain_string_array(valores, dtype):
+    return ArrowStringArray(valores, dtype=dtype)
+
+
+def freeze_frame(df):
+    # Reconstrói o frame sobre arrays somente leitura: escritas in-place
+    # (df.loc[...] = ...) levantam ValueError em vez de vazar para outras sessões
+    colunas = {}
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codes = freeze_array(serie.cat.codes.to_numpy().copy())
+            colunas[col] = pd.Categorical.from_codes(codes, dtype=serie.dtype)
+        elif isinstance(serie.array, ArrowStringArray):
+            colunas[col] = ReadOnlyStringArray(serie.array._pa_array, dtype=serie.dtype, _congelado=True)
+        elif isinstance(serie.dtype, np.dtype):
+            # Números e objetos: ndarray sem permissão de escrita
+            colunas[col] = freeze_array(serie.to_numpy().copy())
+        else:
+            colunas[col] = serie.array
+    return pd.DataFrame(colunas, index=df.index, copy=False)
+
+
+def freeze_csr(csr):
+    return MappingProxyType({chave: freeze_array(valor) for chave, valor in csr.items()})
+
+
+def build_dataset(df, entity_csr, chave=None):
+    df = freeze_frame(df)
+    referencias = build_reference_index(df)
+    return MappingProxyType({
+        'chave': chave,
+        'df': df,
+        'entidades': freeze_csr(entity_csr),
+        # Entidade -> versículos (postings), para filtros e frequências sem varrer o CSR
+        'indice_entidades': freeze_csr(build_entity_postings(entity_csr)),
+        'referencias': referencias,
+        # Agregados da Visão Geral, já no carregamento (barato e sempre usado)
+        'estatisticas': build_corpus_stats(df, referencias),
+        # Componentes derivados construídos sob demanda, uma vez para todas as sessões.
+        # Uma trava por componente: construir um (ex. vetores -> BM25) não bloqueia
+        # a consulta aos outros; '_lock' só protege os próprios dicionários.
+        '_componentes': {},
+        '_travas': {},
+        # Contextos da IA: LRU limitado; os em construção ficam como Future
+        '_contextos': OrderedDict(),
+        '_contextos_pendentes': {},
+        '_lock': threading.RLock(),
+    })
+
+
+def dataset_frame(dataset):
+    # Cópia rasa: mesmos buffers, mas colunas novas numa sessão não aparecem nas outras
+    return dataset['df'].copy(deep=False)
+
+
+def dataset_component(dataset, nome, builder):
+    componentes = dataset['_componentes']
+    # Perfil: componentes por capítulo/trecho somam no mesmo rótulo
+    rotulo = nome[0] if isinstance(nome, tuple) else nome
+    if nome in componentes:
+        count_cache(rotulo, True)
+        return componentes[nome]
+    with dataset['_lock']:
+        trava = dataset['_travas'].setdefault(nome, threading.Lock())
+    with trava:
+        construido = nome not in componentes
+        if construido:
+            with span(f"construir {rotulo}"):
+                componentes[nome] = builder()
+    count_cache(rotulo, not construido)
+    return componentes[nome]
+
+
+def bounded_component(dataset, nome, builder, maximo=MAX_CONTEXTOS):
+    # Como dataset_component, mas num LRU de até 'maximo' entradas e construído
+    # fora de qualquer trava global; pedidos iguais simultâneos esperam o mesmo Future
+    rotulo = nome[0] if isinstance(nome, tuple) else nome
+    cache, pendentes = dataset['_contextos'], dataset['_contextos_pendentes']
+    with dataset['_lock']:
+        if nome in cache:
+            cache.move_to_end(nome)
+            valor = cache[nome]
+            futuro, dono = None, False
+        else:
+            futuro = pendentes.get(nome)
+            dono = futuro is None
+            if dono:
+                futuro = pendentes[nome] = Future()
+    if futuro is None:
+        count_cache(rotulo, True)
+        return valor
+    if not dono:
+        count_cache(rotulo, True)
+        return futuro.result()
+    try:
+        with span(f"construir {rotulo}"):
+            valor = builder()
+    except BaseException as e:
+        futuro.set_exception(e)
+        with dataset['_lock']:
+            pendentes.pop(nome, None)
+        raise
+    with dataset['_lock']:
+        cache[nome] = valor
+        while len(cache) > maximo:
+            cache.popitem(last=False)
+        pendentes.pop(nome, None)
+    futuro.set_result(valor)
+    count_cache(rotulo, False)
+    return valor
+
+
+def search_index(dataset):
+    return dataset_component(dataset, 'busca', lambda: build_inverted_index(dataset['df']['Texto']))
+
+
+def ranking_index(dataset):
+    return dataset_component(dataset, 'bm25', lambda: build_bm25_index(dataset['df']['Texto']))
+
+
+def vector_index(dataset):
+    # Vetores em .npy (mmap) por Bíblia; o LSA reaproveita a matriz do BM25,
+    # que só é montada se os vetores ainda não estiverem no disco
+    def construir():
+        encoder = load_encoder()
+        bm25 = ranking_index(dataset) if encoder is None and not has_embeddings(dataset['chave']) else None
+        return build_vector_index(dataset['df']['Texto'], dataset['chave'], encoder, bm25=bm25)
+    return dataset_component(dataset, 'vetores', construir)
+
+
+def vectors_ready(dataset):
+    # Consulta por vizinhos é imediata: vetores já em memória ou pré-calculados no disco
+    return 'vetores' in dataset['_componentes'] or has_embeddings(dataset['chave'])
+
+
+def passage_context(dataset, trechos, orcamento=ORCAMENTO_DEVOCIONAL, n_relacionados=N_RELACIONADOS, semantico=None):
+    # Contexto empacotado para a IA, memoizado por referência e orçamento. Por
+    # padrão só usa os vetores semânticos se já estiverem prontos: o pedido à IA
+    # nunca espera a construção do LSA (ranking pelos termos do trecho, sem
+    # referências cruzadas). semantico=True força os vetores (lote offline).
+    trechos = tuple(tuple(t) for t in trechos)
+    semantico = vectors_ready(dataset) if semantico is None else semantico
+    return bounded_component(dataset, ('contexto', trechos, orcamento, n_relacionados, semantico),
+                             lambda: build_context(dataset['df'], dataset['referencias'],
+                                                   vector_index(dataset) if semantico else None,
+                                                   trechos, orcamento, n_relacionados))
+
+
+def vocabulary_curve(dataset):
+    # Reaproveita o índice invertido do Explorador
+    return dataset_component(dataset, 'vocabulario',
+                             lambda: vocabulary_growth(dataset['estatisticas'], search_index(dataset)))
+
+
+def cooccurrence_table(dataset):
+    return dataset_component(dataset, 'coocorrencia', lambda: build_cooccurrence_table(dataset['entidades']))
+
+
+def reading_plan(dataset):
+    return dataset_component(dataset, 'plano', lambda: generate_reading_plan(dataset['df']))
+
+
+def plan_index(dataset):
+    return dataset_component(dataset, 'plano_indice',
+                             lambda: build_plan_index(dataset['df'], dataset['referencias'], reading_plan(dataset)[0]))
+
+
+def devotional_chapter(dataset, livro, cap):
+    # HTML memoizado por capítulo: revisitar custa só a consulta ao dicionário
+    return dataset_component(dataset, ('html_devocional', livro, cap),
+                             lambda: render_devotional_chapter(dataset['df'], dataset['referencias'], livro, cap))
+
+
+def explorer_chapter(dataset, livro, cap):
+    return dataset_component(dataset, ('html_explorador', livro, cap),
+                             lambda: render_explorer_chapter(dataset['df'], dataset['referencias'], dataset['entidades'], livro, cap))
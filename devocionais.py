@@ -0,0 +1,261 @@
+import argparse
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache_colunar import CACHE_DIR, content_hash, load_bible_bytes
+from dataset import build_dataset, passage_context, reading_plan, vector_index
+from llm import LLM_MODEL
+
+# =========================================================
+# DEVOCIONAIS PRÉ-GERADOS (LOTE OFFLINE)
+# Uso: GEMINI_API_KEY=... python devocionais.py gerar blivre.xlsx [--workers 4]
+#      python devocionais.py gerar blivre.xlsx --stub   (modelo local, sem rede)
+#      python devocionais.py status blivre.xlsx
+# O plano é determinístico (semente 42), então o devocional de cada dia é o
+# mesmo para todos os usuários: gerado uma vez e lido pela aba Devocional.
+# =========================================================
+
+DEVOCIONAIS_PATH = os.environ.get('BIBLIA_DEVOCIONAIS', os.path.join(CACHE_DIR, 'devocionais.sqlite'))
+
+
+def reading_title(capitulos):
+    refs = [f"{book} {chap}" for book, chap in capitulos]
+    if len(refs) > 3:
+        return ", ".join(refs[:3]) + f" e mais {len(refs) - 3}"
+    return ", ".join(refs)
+
+
+def day_text(dataset, capitulos):
+    # Versículos mais centrais da leitura do dia dentro do orçamento de tokens
+    return passage_context(dataset, capitulos)['texto']
+
+
+def devotional_prompt(titulo, texto):
+    return f"""
+    Crie um devocional curto e inspirador baseado em: {titulo}.
+    Trechos: {texto}
+    Foque em um tema de união entre os textos ou no texto mais forte.
+    Formate com Markdown bonito, usando negrito e itálico.
+    Estrutura: Versículo Chave, Reflexão Profunda, Aplicação Prática, Oração.
+    """
+
+
+# ---------------------------------------------------------
+# ARMAZENAMENTO (SQLite, uma linha por Bíblia + dia)
+# ---------------------------------------------------------
+
+# Arquivos já preparados neste processo (WAL e tabela): cada rerun só abre a conexão
+_esquema_pronto = set()
+_esquema_lock = threading.Lock()
+
+
+def _connect(path):
+    if path not in _esquema_pronto:
+        with _esquema_lock:
+            if path not in _esquema_pronto:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                conn = sqlite3.connect(path, timeout=10)
+                try:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS devocionais ('
+                        'biblia TEXT, dia INTEGER, modelo TEXT, texto TEXT, criado REAL, '
+                        'PRIMARY KEY (biblia, dia))'
+                    )
+                finally:
+                    conn.close()
+                _esquema_pronto.add(path)
+    return sqlite3.connect(path, timeout=10)
+
+
+def devotional_get(biblia, dia, path=None):
+    if biblia is None:
+        return None
+    try:
+        conn = _connect(path or DEVOCIONAIS_PATH)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        linha = conn.execute('SELECT texto FROM devocionais WHERE biblia = ? AND dia = ?', (biblia, dia)).fetchone()
+        return linha[0] if linha else None
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def devotional_put(biblia, dia, texto, model=LLM_MODEL, path=None):
+    if biblia is None or not texto:
+        return
+    try:
+        conn = _connect(path or DEVOCIONAIS_PATH)
+    except (OSError, sqlite3.Error):
+        return
+    try:
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO devocionais VALUES (?, ?, ?, ?, ?)',
+                         (biblia, dia, model, texto, time.time()))
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+
+def stored_days(biblia, path=None):
+    try:
+        conn = _connect(path or DEVOCIONAIS_PATH)
+    except (OSError, sqlite3.Error):
+        return set()
+    try:
+        return {dia for (dia,) in conn.execute('SELECT dia FROM devocionais WHERE biblia = ?', (biblia,))}
+    except sqlite3.Error:
+        return set()
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------
+# GERAÇÃO EM LOTE
+# ---------------------------------------------------------
+
+def is_rate_limit(erro):
+    # google.genai.errors.APIError traz .code; outros clientes só a mensagem
+    codigo = getattr(erro, 'code', None) or getattr(erro, 'status_code', None)
+    if codigo == 429:
+        return True
+    mensagem = str(erro)
+    return '429' in mensagem or 'RESOURCE_EXHAUSTED' in mensagem
+
+
+def generate_with_retry(client, prompt, model=LLM_MODEL, tentativas=5, espera_base=1.0, espera_max=60.0, dormir=time.sleep):
+    # Backoff exponencial com jitter; limite de taxa (429) espera o dobro
+    for tentativa in range(tentativas):
+        try:
+            texto = client.models.generate_content(model=model, contents=prompt).text
+            if texto:
+                return texto
+            erro = RuntimeError("Resposta vazia do modelo.")
+        except Exception as e:
+            erro = e
+        if tentativa == tentativas - 1:
+            raise erro
+        espera = min(espera_max, espera_base * 2 ** tentativa * (2 if is_rate_limit(erro) else 1))
+        dormir(espera * random.uniform(0.5, 1.0))
+
+
+def generate_devotionals(dataset, client, dias=None, model=LLM_MODEL, workers=4, tentativas=5,
+                         path=None, espera_base=1.0, progresso=None):
+    # Retomável: dias já gravados são pulados, e cada dia é gravado assim que
+    # fica pronto. Retorna {'gerados': [...], 'pulados': [...], 'falhas': {dia: erro}}.
+    plan, _ = reading_plan(dataset)
+    biblia = dataset['chave']
+    dias = sorted(plan) if dias is None else sorted(dias)
+    prontos = stored_days(biblia, path)
+    pendentes = [dia for dia in dias if dia not in prontos and plan.get(dia)]
+
+    if pendentes:
+        # Lote offline: vale montar (e gravar em .npy) os vetores para o contexto
+        # semântico, que a página do app reaproveita depois
+        vector_index(dataset)
+    resultado = {'gerados': [], 'pulados': [d for d in dias if d in prontos], 'falhas': {}}
+    lock = threading.Lock()
+
+    def gerar(dia):
+        capitulos = plan[dia]
+        prompt = devotional_prompt(reading_title(capitulos), day_text(dataset, capitulos))
+        texto = generate_with_retry(client, prompt, model, tentativas, espera_base)
+        devotional_put(biblia, dia, texto, model, path)
+        return dia
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futuros = {pool.submit(gerar, dia): dia for dia in pendentes}
+        for futuro in as_completed(futuros):
+            dia = futuros[futuro]
+            with lock:
+                try:
+                    resultado['gerados'].append(futuro.result())
+                except Exception as e:
+                    resultado['falhas'][dia] = e
+                if progresso is not None:
+                    progresso(dia, len(resultado['gerados']) + len(resultado['falhas']), len(pendentes))
+    resultado['gerados'].sort()
+    return resultado
+
+
+class StubClient:
+    # Modelo local para testes: responde com texto determinístico e pode
+    # simular limite de taxa (429) numa fração das chamadas
+    def __init__(self, taxa_falha=0.0, atraso=0.0, seed=0):
+        self.models = self
+        self.chamadas = 0
+        self._taxa_falha = taxa_falha
+        self._atraso = atraso
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents):
+        with self._lock:
+            self.chamadas += 1
+            falha = self._rng.random() < self._taxa_falha
+        if self._atraso:
+            time.sleep(self._atraso)
+        if falha:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED (stub)")
+        titulo = contents.split('baseado em:', 1)[-1].split('\n', 1)[0].strip()
+        return type('Resposta', (), {'text': f"**Versículo Chave**\n\nDevocional de teste para {titulo}"})()
+
+
+def load_dataset_file(arquivo):
+    with open(arquivo, 'rb') as f:
+        data = f.read()
+    df, csr = load_bible_bytes(data, arquivo)
+    return build_dataset(df, csr, chave=content_hash(data))
+
+
+def _parse_days(texto):
+    dias = set()
+    for parte in texto.split(','):
+        ini, _, fim = parte.partition('-')
+        dias.update(range(int(ini), int(fim or ini) + 1))
+    return dias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Devocionais pré-gerados para o plano anual")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_gerar = sub.add_parser('gerar', help="Gera os devocionais que faltam (retomável)")
+    p_gerar.add_argument('arquivo')
+    p_gerar.add_argument('--dias', default='1-365', help="Ex: 1-365 ou 1,5,10-20")
+    p_gerar.add_argument('--workers', type=int, default=4)
+    p_gerar.add_argument('--tentativas', type=int, default=5)
+    p_gerar.add_argument('--modelo', default=LLM_MODEL)
+    p_gerar.add_argument('--stub', action='store_true', help="Usa o modelo local de teste, sem rede")
+    p_gerar.add_argument('--stub-falhas', type=float, default=0.0, help="Fração de respostas 429 simuladas pelo stub")
+    p_status = sub.add_parser('status', help="Mostra quantos dias já estão gravados")
+    p_status.add_argument('arquivo')
+    parser.add_argument('--store', default=None)
+    args = parser.parse_args()
+
+    dataset = load_dataset_file(args.arquivo)
+    if args.comando == 'status':
+        prontos = stored_days(dataset['chave'], args.store)
+        print(f"{len(prontos)}/365 dias gravados em {args.store or DEVOCIONAIS_PATH}")
+    else:
+        if args.stub:
+            client = StubClient(taxa_falha=args.stub_falhas)
+        else:
+            from google import genai
+            client = genai.Client(api_key=os.environ['GEMINI_API_KEY'])
+        t0 = time.perf_counter()
+        resultado = generate_devotionals(
+            dataset, client, _parse_days(args.dias), args.modelo, args.workers, args.tentativas, args.store,
+            progresso=lambda dia, feitos, total: print(f"[{feitos}/{total}] dia {dia}", flush=True),
+        )
+        print(f"gerados: {len(resultado['gerados'])}, já existentes: {len(resultado['pulados'])}, "
+              f"falhas: {len(resultado['falhas'])} ({time.perf_counter() - t0:.1f}s)")
+        for dia, erro in sorted(resultado['falhas'].items()):
+            print(f"  dia {dia}: {erro}")
@@ -0,0 +1,158 @@
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+
+# =========================================================
+# EXTRAÇÃO DE ENTIDADES
+# =========================================================
+
+STOPWORDS_PT = set(['a', 'o', 'as', 'os', 'de', 'do', 'da', 'dos', 'das', 'em', 'no', 'na', 'nos', 'nas', 'por', 'pelo', 'pela', 'para', 'que', 'e', 'é', 'era', 'foi', 'com', 'sem', 'seu', 'sua', 'seus', 'suas', 'ele', 'ela', 'eles', 'elas', 'mas', 'ou', 'quando', 'como', 'onde', 'quem', 'porque', 'se', 'eu', 'tu', 'nós', 'vós', 'me', 'te', 'lhe', 'nos', 'vos', 'lhes', 'mim', 'ti', 'si', 'este', 'esta', 'isto', 'esse', 'essa', 'isso', 'aquele', 'aquela', 'aquilo', 'meu', 'teu', 'nosso', 'vosso', 'tua', 'minha', 'nossa', 'vossa', 'senhor', 'deus', 'jesus', 'cristo', 'não', 'eis', 'quis', 'então', 'amém', 'segunda', 'Assim'])
+
+BIG_ENTITIES = ['Deus', 'Jesus', 'Senhor', 'Espírito', 'Moisés', 'Arão', 'Faraó', 'Josué', 'Davi', 'Saul', 'Salomão', 'Elias', 'Eliseu', 'Isaías', 'Jeremias', 'Ezequiel', 'Daniel', 'Pedro', 'Paulo', 'João', 'Tiago', 'Maria', 'José', 'Abraão', 'Isaque', 'Jacó', 'José', 'Judá', 'Pilatos', 'Herodes', 'Judas', 'Timóteo', 'Barnabé', 'Silas', 'Tito', 'Noé', 'Adão', 'Eva', 'Caim', 'Abel', 'Golias', 'Jonas', 'Jó', 'Samuel', 'Absalão', 'Nabucodonosor', 'Calebe']
+
+# Estruturas de consulta pré-compiladas (congeladas) para o motor em lote
+_RE_PONTUACAO = re.compile(r'[^\w\s]')
+_BIG_SET = frozenset(BIG_ENTITIES)
+_STOP_SET = frozenset(STOPWORDS_PT)
+# Separador de linhas no texto concatenado: é espaço em branco para split() e
+# para \s, então sobrevive à limpeza e não gruda palavras de versículos vizinhos
+_SEPARADOR = '\x1e'
+
+
+def simple_entity_extractor(text):
+    if not isinstance(text, str): return []
+    clean_text = re.sub(r'[^\w\s]', '', text)
+    words = clean_text.split()
+    entities = []
+    for i, word in enumerate(words):
+        if word in BIG_ENTITIES:
+            entities.append(word)
+            continue
+        if i > 0 and word[0].isupper() and word.lower() not in STOPWORDS_PT:
+            if len(word) > 2: entities.append(word)
+    return list(set(entities))
+
+
+def extract_entities_batch(textos):
+    # Mesma regra do simple_entity_extractor aplicada à coluna inteira: uma única
+    # passada da regex de pontuação sobre o texto concatenado e consultas em
+    # frozensets (BIG_ENTITIES como lista custava uma busca linear por palavra).
+    index = textos.index if isinstance(textos, pd.Series) else None
+    textos = [t if isinstance(t, str) else '' for t in textos]
+    if not textos:
+        return pd.Series([], dtype=object, index=index)
+    concatenado = _SEPARADOR.join(textos)
+    if concatenado.count(_SEPARADOR) != len(textos) - 1:
+        # Algum texto contém o separador e viraria duas linhas; usa o caminho por linha
+        return pd.Series([simple_entity_extractor(t) for t in textos], dtype=object, index=index)
+
+    limpos = _RE_PONTUACAO.sub('', concatenado).split(_SEPARADOR)
+    resultado = []
+    for linha in limpos:
+        words = linha.split()
+        if not words:
+            resultado.append([])
+            continue
+        # Todas as BIG_ENTITIES começam com maiúscula, então o teste de
+        # maiúscula pode vir primeiro sem mudar o resultado
+        entities = [w for w in words[1:] if w[0].isupper() and (w in _BIG_SET or (len(w) > 2 and w.lower() not in _STOP_SET))]
+        if words[0] in _BIG_SET:
+            entities.insert(0, words[0])
+        # Mesma ordem de inserção no set => mesma lista final do extrator por linha
+        resultado.append(list(set(entities)))
+    return pd.Series(resultado, dtype=object, index=index)
+
+
+# =========================================================
+# ENTIDADES EM FORMATO CSR (offsets + ids internados)
+# =========================================================
+
+def build_entity_csr(entidades):
+    # Linha i -> ids[offsets[i]:offsets[i + 1]], ids apontando para 'vocab'
+    # (nomes únicos em ordem alfabética). A ordem dentro de cada linha é mantida.
+    entidades = list(entidades)
+    tamanhos = np.fromiter((len(ents) for ents in entidades), dtype=np.int64, count=len(entidades))
+    offsets = np.zeros(len(entidades) + 1, dtype=np.int64)
+    np.cumsum(tamanhos, out=offsets[1:])
+    planas = np.array(list(itertools.chain.from_iterable(entidades)), dtype=object)
+    if len(planas) == 0:
+        return {'vocab': np.array([], dtype=object), 'offsets': offsets, 'ids': np.zeros(0, dtype=np.int32)}
+    vocab, ids = np.unique(planas, return_inverse=True)
+    return {'vocab': vocab, 'offsets': offsets, 'ids': ids.astype(np.int32).ravel()}
+
+
+def row_entities(csr, pos):
+    ini, fim = csr['offsets'][pos], csr['offsets'][pos + 1]
+    return csr['vocab'][csr['ids'][ini:fim]].tolist()
+
+
+def entity_row_positions(csr):
+    # Linha de origem de cada posição de 'ids'
+    return np.repeat(np.arange(len(csr['offsets']) - 1, dtype=np.int32), np.diff(csr['offsets']))
+
+
+# =========================================================
+# ÍNDICE INVERTIDO DE ENTIDADES (POSTINGS)
+# Entidade -> linhas onde aparece (int32, crescentes), num CSR "por entidade":
+# linhas[offsets[e]:offsets[e + 1]]. É a transposta do CSR linha -> entidades,
+# construída uma vez por conjunto de dados; consultas viram fatias e interseções.
+# =========================================================
+
+def build_entity_postings(csr):
+    ids = csr['ids']
+    n = len(csr['vocab'])
+    # Estável: dentro de cada entidade as linhas ficam em ordem crescente
+    ordem = np.argsort(ids, kind='stable')
+    contagem = np.bincount(ids, minlength=n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(contagem, out=offsets[1:])
+    # Cada linha tem entidades únicas, então o tamanho da lista é a frequência.
+    # Ranking igual ao Counter().most_common(): empates pela primeira aparição.
+    primeira = ordem[offsets[:-1][contagem > 0]]
+    presentes = np.flatnonzero(contagem)
+    ranking = presentes[np.lexsort((primeira, -contagem[presentes]))]
+    return {
+        'vocab': csr['vocab'],
+        'offsets': offsets,
+        'linhas': entity_row_positions(csr)[ordem],
+        'contagem': contagem,
+        'ranking': ranking.astype(np.int32),
+    }
+
+
+def entity_id(postings, nome):
+    vocab = postings['vocab']
+    pos = int(np.searchsorted(vocab, nome)) if len(vocab) else 0
+    return pos if pos < len(vocab) and vocab[pos] == nome else None
+
+
+def posting_rows(postings, nome):
+    e = entity_id(postings, nome)
+    if e is None:
+        return np.zeros(0, dtype=np.int32)
+    return postings['linhas'][postings['offsets'][e]:postings['offsets'][e + 1]]
+
+
+def top_entities(postings, top=None):
+    ranking = postings['ranking'] if top is None else postings['ranking'][:top]
+    return list(zip(postings['vocab'][ranking].tolist(), postings['contagem'][ranking].tolist()))
+
+
+def rows_with_all(postings, nomes):
+    # Versículos com todas as entidades: interseção a partir da lista mais curta
+    listas = sorted((posting_rows(postings, nome) for nome in nomes), key=len)
+    if not listas:
+        return np.zeros(0, dtype=np.int32)
+    resultado = listas[0]
+    for lista in listas[1:]:
+        if len(resultado) == 0:
+            break
+        resultado = np.intersect1d(resultado, lista, assume_unique=True)
+    return resultado
+
+
+def rows_with_any(postings, nomes):
+    listas = [posting_rows(postings, nome) for nome in nomes]
+    return np.unique(np.concatenate(listas)) if listas else np.zeros(0, dtype=np.int32)
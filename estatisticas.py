@@ -0,0 +1,106 @@
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# =========================================================
+# ESTATÍSTICAS DO CORPUS (VISÃO GERAL)
+# Calculadas uma vez no carregamento e guardadas com o conjunto de dados:
+# a página só lê agregados prontos por livro e por capítulo.
+# =========================================================
+
+def word_counts(textos):
+    # Mesmo resultado de len(t.split()) para espaços ASCII, direto nos bytes UTF-8
+    # do Arrow: início de palavra = byte não-espaço precedido de espaço (ou no
+    # começo do versículo); a contagem por versículo sai dos offsets.
+    arr = pa.array(textos.astype('str').array)
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    arr = arr.fill_null('')
+    _, buf_offsets, buf_dados = arr.buffers()
+    tipo = np.int64 if pa.types.is_large_string(arr.type) else np.int32
+    offsets = np.frombuffer(buf_offsets, dtype=tipo)[arr.offset:arr.offset + len(arr) + 1].astype(np.int64)
+    dados = np.frombuffer(buf_dados, dtype=np.uint8) if buf_dados is not None else np.empty(0, dtype=np.uint8)
+    dados = dados[:offsets[-1]]
+
+    espaco = (dados == 32) | ((dados >= 9) & (dados <= 13))
+    inicio = ~espaco
+    inicio[1:] &= espaco[:-1]
+    comecos = offsets[:-1][offsets[:-1] < len(dados)]
+    inicio[comecos] = ~espaco[comecos]
+    return np.diff(np.searchsorted(np.flatnonzero(inicio), offsets)).astype(np.int32)
+
+
+def book_order(df):
+    # Ordem canônica: Livro_ID quando existe, senão a ordem de aparição
+    livros = list(df['Livro'].dropna().unique())
+    if 'Livro_ID' in df.columns:
+        ids = df.groupby('Livro', sort=False, observed=True)['Livro_ID'].min()
+        livros = sorted(livros, key=lambda livro: ids[livro])
+    return livros
+
+
+def build_corpus_stats(df, ref_index):
+    palavras = word_counts(df['Texto'])
+
+    # Capítulo (na ordem de aparição) de cada linha, para agregar com bincount;
+    # -1 nas linhas sem referência, que ficam fora dos agregados por capítulo
+    capitulos = list(ref_index['fatias'])
+    capitulo_da_linha = np.full(len(df), -1, dtype=np.int32)
+    for i, fatia in enumerate(ref_index['fatias'].values()):
+        capitulo_da_linha[fatia] = i
+    com_capitulo = capitulo_da_linha >= 0
+    versiculos_cap = np.bincount(capitulo_da_linha[com_capitulo], minlength=len(capitulos))
+    palavras_cap = np.bincount(capitulo_da_linha[com_capitulo], weights=palavras[com_capitulo],
+                               minlength=len(capitulos)).astype(np.int64)
+
+    ordem_livros = {livro: i for i, livro in enumerate(book_order(df))}
+    por_capitulo = pd.DataFrame({
+        'Livro': [livro for livro, _ in capitulos],
+        'Capitulo': [cap for _, cap in capitulos],
+        'Versiculos': versiculos_cap,
+        'Palavras': palavras_cap,
+    })
+    por_capitulo['_livro'] = por_capitulo['Livro'].map(ordem_livros)
+    por_capitulo = por_capitulo.sort_values(['_livro', 'Capitulo'], kind='stable')
+    # Linha -> posição do capítulo na ordem canônica
+    canonico = np.empty(len(capitulos), dtype=np.int32)
+    canonico[por_capitulo.index.to_numpy()] = np.arange(len(capitulos), dtype=np.int32)
+    por_capitulo = por_capitulo.reset_index(drop=True)
+    por_capitulo['Ordem'] = np.arange(1, len(por_capitulo) + 1)
+
+    por_livro = por_capitulo.groupby('_livro', sort=True).agg(
+        Livro=('Livro', 'first'), Capitulos=('Capitulo', 'size'),
+        Versiculos=('Versiculos', 'sum'), Palavras=('Palavras', 'sum'),
+    ).reset_index(drop=True)
+
+    capitulo_da_linha = np.where(com_capitulo, canonico[capitulo_da_linha], -1).astype(np.int32)
+    capitulo_da_linha.flags.writeable = False
+    return MappingProxyType({
+        'totais': {
+            'livros': len(por_livro),
+            'capitulos': len(por_capitulo),
+            'versiculos': len(df),
+            'palavras': int(palavras.sum()),
+        },
+        'por_livro': por_livro,
+        'por_capitulo': por_capitulo.drop(columns='_livro'),
+        'capitulo_da_linha': capitulo_da_linha,
+    })
+
+
+def vocabulary_growth(stats, index):
+    # Palavras distintas acumuladas ao longo da leitura (capítulo a capítulo).
+    # Primeira ocorrência de cada token = menor capítulo da sua lista de postings.
+    n_caps = stats['totais']['capitulos']
+    postings = list(index['postings'].values())
+    if not postings:
+        return np.zeros(n_caps, dtype=np.int64)
+    tamanhos = np.fromiter((len(p) for p in postings), dtype=np.int64, count=len(postings))
+    inicios = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+    capitulos = stats['capitulo_da_linha'][np.concatenate(postings)]
+    # Linhas sem capítulo (-1) não contam como primeira ocorrência
+    capitulos = np.where(capitulos >= 0, capitulos, n_caps)
+    primeiros = np.minimum.reduceat(capitulos, inicios)
+    return np.cumsum(np.bincount(primeiros[primeiros < n_caps], minlength=n_caps))
@@ -0,0 +1,152 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from entidades import entity_row_positions
+
+# =========================================================
+# TABELA DE COOCORRÊNCIA (SNA)
+# =========================================================
+
+def build_cooccurrence_table(entity_csr):
+    # Conta nós e arestas uma única vez por conjunto de dados, a partir das
+    # entidades em CSR. Os ids do vocabulário seguem a ordem alfabética, então
+    # (origem < destino) equivale ao sorted() do laço original; a ordem das
+    # arestas e o desempate dos nós reproduzem a primeira aparição dos antigos Counter().
+    nos = entity_csr['vocab']
+    tamanhos = np.diff(entity_csr['offsets'])
+    linhas = entity_row_positions(entity_csr)
+    multiplas = tamanhos[linhas] > 1
+    ids, linhas = entity_csr['ids'][multiplas], linhas[multiplas]
+    if len(ids) == 0:
+        return {
+            'nos': nos,
+            'contagem': np.zeros(len(nos), dtype=np.int64),
+            'ordem_insercao': np.arange(len(nos)),
+            'arestas': pd.DataFrame({'origem': np.zeros(0, np.int32), 'destino': np.zeros(0, np.int32), 'peso': np.zeros(0, np.int32)}),
+        }
+
+    ordem = np.lexsort((ids, linhas))
+    ids, linhas = ids[ordem], linhas[ordem]
+
+    contagem = np.bincount(ids, minlength=len(nos))
+    primeira_linha = np.full(len(nos), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(primeira_linha, ids, linhas)
+    ordem_insercao = np.lexsort((np.arange(len(nos)), primeira_linha))
+
+    pares = pd.DataFrame({'linha': linhas, 'origem': ids})
+    pares = pares.merge(pares.rename(columns={'origem': 'destino'}), on='linha')
+    pares = pares[pares['origem'] < pares['destino']]
+
+    chave = pares['origem'].to_numpy(np.int64) * len(nos) + pares['destino'].to_numpy(np.int64)
+    unicas, primeira, peso = np.unique(chave, return_index=True, return_counts=True)
+    por_aparicao = np.argsort(primeira, kind='stable')
+    unicas, peso = unicas[por_aparicao], peso[por_aparicao]
+
+    arestas = pd.DataFrame({
+        'origem': (unicas // len(nos)).astype(np.int32),
+        'destino': (unicas % len(nos)).astype(np.int32),
+        'peso': peso.astype(np.int32),
+    })
+    return {
+        'nos': nos,
+        'contagem': contagem,
+        'ordem_insercao': ordem_insercao,
+        'arestas': arestas,
+    }
+
+
+def available_nodes(tabela):
+    return tabela['nos'][tabela['contagem'] > 1].tolist()
+
+
+def top_node_ids(tabela, max_nodes):
+    # Equivalente a Counter.most_common(max_nodes): maior contagem primeiro,
+    # empates na ordem de primeira aparição
+    ordem = tabela['ordem_insercao']
+    ranking = np.argsort(-tabela['contagem'][ordem], kind='stable')
+    return ordem[ranking[:max_nodes]]
+
+
+def filter_edges_top(tabela, min_weight, max_nodes):
+    arestas = tabela['arestas']
+    no_topo = np.zeros(len(tabela['nos']), dtype=bool)
+    no_topo[top_node_ids(tabela, max_nodes)] = True
+    origem = arestas['origem'].to_numpy()
+    destino = arestas['destino'].to_numpy()
+    mascara = (arestas['peso'].to_numpy() >= min_weight) & no_topo[origem] & no_topo[destino]
+    return arestas[mascara]
+
+
+def node_id(tabela, entidade):
+    nos = tabela['nos']
+    pos = int(np.searchsorted(nos, entidade)) if len(nos) else 0
+    if pos < len(nos) and nos[pos] == entidade:
+        return pos
+    return None
+
+
+def node_count(tabela, entidade):
+    pos = node_id(tabela, entidade)
+    return int(tabela['contagem'][pos]) if pos is not None else 0
+
+
+def filter_edges_focus(tabela, entidade, min_weight):
+    arestas = tabela['arestas']
+    pos = node_id(tabela, entidade)
+    if pos is None:
+        return arestas.iloc[0:0]
+    mascara = (arestas['peso'].to_numpy() >= min_weight) & (
+        (arestas['origem'].to_numpy() == pos) | (arestas['destino'].to_numpy() == pos)
+    )
+    return arestas[mascara]
+
+
+# =========================================================
+# LAYOUTS DO GRAFO
+# =========================================================
+
+LAYOUTS = ["Spring (Padrão)", "Circular", "Aleatório", "Shell", "Espectral Rápido (grafos grandes)"]
+
+# Fração mínima de nós já posicionados para reaproveitar o layout anterior
+_MIN_REAPROVEITAMENTO = 0.5
+
+
+def graph_signature(G):
+    # Identifica o grafo pelas arestas (com peso) e pelos nós isolados
+    arestas = sorted((min(u, v), max(u, v), d.get('weight', 1)) for u, v, d in G.edges(data=True))
+    isolados = sorted(n for n in G.nodes if G.degree(n) == 0)
+    return hashlib.sha1(repr((arestas, isolados)).encode('utf-8')).hexdigest()
+
+
+def _warm_start(G, pos_anterior):
+    if not pos_anterior:
+        return None
+    conhecidos = {n: pos_anterior[n] for n in G.nodes if n in pos_anterior}
+    if len(conhecidos) < _MIN_REAPROVEITAMENTO * len(G):
+        return None
+    return conhecidos
+
+
+def compute_layout(G, layout_opt, pos_anterior=None):
+    # pos_anterior: posições do último grafo exibido; quando a maior parte dos
+    # nós se repete, o spring parte delas e converge em menos iterações.
+    # networkx só é importado aqui (~100 ms): as outras páginas não pagam por ele
+    import networkx as nx
+
+    if layout_opt == "Circular":
+        return nx.circular_layout(G)
+    if layout_opt == "Aleatório":
+        return nx.random_layout(G, seed=42)
+    if layout_opt == "Shell":
+        return nx.shell_layout(G)
+
+    inicial = _warm_start(G, pos_anterior)
+    if layout_opt == "Espectral Rápido (grafos grandes)":
+        if inicial is None and len(G) > 2:
+            inicial = nx.spectral_layout(G)
+        return nx.spring_layout(G, k=0.6, seed=42, pos=inicial, iterations=15)
+    if inicial is not None:
+        return nx.spring_layout(G, k=0.6, seed=42, pos=inicial, iterations=20)
+    return nx.spring_layout(G, k=0.6, seed=42)
@@ -0,0 +1,110 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from entidades import extract_entities_batch
+
+# Leitor de Excel em Rust (opcional), bem mais rápido que o openpyxl
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# =========================================================
+# INGESTÃO (CSV, EXCEL E FORMATOS FUTUROS)
+# =========================================================
+
+COLS_MAP = {
+    'Book Name': 'Livro', 'Book Number': 'Livro_ID',
+    'Chapter': 'Capitulo', 'Verse': 'Versiculo',
+    'Text': 'Texto', 'Verse ID': 'ID_Global'
+}
+REQUIRED_COLS = ['Livro', 'Capitulo', 'Versiculo', 'Texto']
+# Sem estas a linha não tem referência: não dá para agrupar nem alinhar
+KEY_COLS = ['Livro', 'Capitulo', 'Versiculo']
+
+# Colunas inteiras e o menor tipo que comporta uma Bíblia inteira
+INT_COLS = {'Capitulo': 'int16', 'Versiculo': 'int16', 'Livro_ID': 'int16', 'ID_Global': 'int32'}
+
+
+def _read_csv(data):
+    return pd.read_csv(io.BytesIO(data))
+
+
+def _read_excel(data):
+    if HAS_CALAMINE:
+        return pd.read_excel(io.BytesIO(data), engine='calamine')
+
+    # Caminho somente leitura: o openpyxl percorre as linhas sem montar o
+    # modelo de células da planilha
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True, keep_links=False)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            raise ValueError("A planilha está vazia.")
+        # Linhas formatadas mas vazias também vêm do modo somente leitura;
+        # o read_excel as descarta, aqui é preciso fazer o mesmo
+        return pd.DataFrame(list(linhas), columns=cabecalho).dropna(how='all').reset_index(drop=True)
+    finally:
+        wb.close()
+
+
+# Extensão -> leitor. Novos formatos só precisam de uma entrada aqui.
+READERS = {
+    '.csv': _read_csv,
+    '.xlsx': _read_excel,
+}
+SUPPORTED_TYPES = [ext.lstrip('.') for ext in READERS]
+
+
+def read_table(data, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    reader = READERS.get(ext)
+    if reader is None:
+        raise ValueError(f"Formato não suportado: {ext or filename}. Use: {', '.join(SUPPORTED_TYPES)}")
+    return reader(data)
+
+
+def validate_columns(df):
+    faltando = [col for col in REQUIRED_COLS if col not in df.columns]
+    if faltando:
+        raise ValueError(f"O arquivo deve conter as colunas: {REQUIRED_COLS} (faltando: {faltando})")
+
+
+def coerce_dtypes(df):
+    # Livro como categoria e referências como inteiros pequenos. Colunas com
+    # valores ausentes ou fracionários ficam como estão.
+    df['Livro'] = df['Livro'].astype('category')
+    for col, dtype in INT_COLS.items():
+        if col not in df.columns:
+            continue
+        valores = pd.to_numeric(df[col], errors='coerce')
+        if valores.isna().any() or not (valores % 1 == 0).all():
+            continue
+        limites = np.iinfo(dtype)
+        if valores.min() >= limites.min and valores.max() <= limites.max:
+            df[col] = valores.astype(dtype)
+    return df
+
+
+def normalize_bible(df):
+    df = df.rename(columns=COLS_MAP, errors='ignore')
+    validate_columns(df)
+    sem_referencia = df[KEY_COLS].isna().any(axis=1)
+    if sem_referencia.all():
+        raise ValueError(f"Nenhuma linha tem {', '.join(KEY_COLS)} preenchidos.")
+    if sem_referencia.any():
+        df = df[~sem_referencia].reset_index(drop=True)
+    df = coerce_dtypes(df)
+    if 'Entidades' not in df.columns:
+        df['Entidades'] = extract_entities_batch(df['Texto'])
+    return df
+
+
+def parse_bible(data, filename):
+    return normalize_bible(read_table(data, filename))
@@ -0,0 +1,52 @@
+import numpy as np
+
+# =========================================================
+# RASTREAMENTO DE ENTIDADE (DISPERSÃO LEVE)
+# O gráfico vai inteiro para o navegador pelo websocket: em vez de um ponto
+# com o versículo completo no hover, cada ponto leva só um trecho curto, e
+# acima de LIMIAR_PONTOS os versículos viram um ponto por capítulo (densidade).
+# O texto completo é buscado no servidor quando o ponto é selecionado.
+# =========================================================
+
+LIMIAR_PONTOS = 1500
+TEXTO_HOVER = 80
+
+
+def truncate_texts(textos, max_chars=TEXTO_HOVER):
+    curtos = textos.str.slice(0, max_chars)
+    return curtos.where(textos.str.len() <= max_chars, curtos.str.rstrip() + '…')
+
+
+def timeline_points(df, posicoes, max_chars=TEXTO_HOVER):
+    # Um ponto por versículo; x = ID_Global (ou a posição), hover com trecho curto
+    sub = df.iloc[posicoes]
+    x = sub['ID_Global'].to_numpy() if 'ID_Global' in df.columns else np.asarray(posicoes)
+    ref = sub['Capitulo'].astype(str) + ':' + sub['Versiculo'].astype(str)
+    return {
+        'x': x,
+        'livro': sub['Livro'].astype(str).to_numpy(),
+        'hover': (ref + ' ' + truncate_texts(sub['Texto'].astype(str), max_chars)).to_numpy(),
+        'posicoes': np.asarray(posicoes),
+    }
+
+
+def timeline_bins(stats, posicoes):
+    # Um ponto por capítulo com menções; x = ordem do capítulo na leitura
+    por_capitulo = stats['por_capitulo']
+    capitulos = stats['capitulo_da_linha'][posicoes]
+    contagem = np.bincount(capitulos[capitulos >= 0], minlength=len(por_capitulo))
+    caps = np.flatnonzero(contagem)
+    versiculos = por_capitulo['Versiculos'].to_numpy()[caps]
+    return {
+        'x': por_capitulo['Ordem'].to_numpy()[caps],
+        'livro': por_capitulo['Livro'].astype(str).to_numpy()[caps],
+        'capitulo': por_capitulo['Capitulo'].to_numpy()[caps],
+        'mencoes': contagem[caps],
+        'densidade': contagem[caps] / np.maximum(versiculos, 1),
+    }
+
+
+def bin_positions(stats, posicoes, capitulo_ordem):
+    # Versículos da entidade dentro do capítulo selecionado (Ordem começa em 1)
+    posicoes = np.asarray(posicoes)
+    return posicoes[stats['capitulo_da_linha'][posicoes] == capitulo_ordem - 1]
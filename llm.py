@@ -0,0 +1,221 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from cache_colunar import CACHE_DIR
+
+# =========================================================
+# CACHE PERSISTENTE E COALESCÊNCIA DAS CHAMADAS AO GEMINI
+# =========================================================
+
+LLM_MODEL = 'gemini-2.5-flash-lite'
+LLM_CACHE_PATH = os.environ.get('BIBLIA_LLM_CACHE', os.path.join(CACHE_DIR, 'llm_respostas.sqlite'))
+LLM_CACHE_TTL_DIAS = int(os.environ.get('BIBLIA_LLM_CACHE_TTL_DIAS', '30'))
+LLM_CACHE_MAX_MB = int(os.environ.get('BIBLIA_LLM_CACHE_MAX_MB', '64'))
+
+# Chamadas em andamento neste processo: chave -> Future com o texto
+_em_andamento = {}
+_em_andamento_lock = threading.Lock()
+
+
+def normalize_prompt(prompt):
+    # Os prompts vêm de f-strings indentadas; espaços não mudam a resposta
+    return ' '.join(prompt.split())
+
+
+def prompt_key(model, prompt):
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS respostas ('
+        'chave TEXT PRIMARY KEY, modelo TEXT, texto TEXT, '
+        'criado REAL, acessado REAL, tamanho INTEGER)'
+    )
+    return conn
+
+
+def cache_get(chave, path=None, ttl_dias=None):
+    path = path or LLM_CACHE_PATH
+    ttl = (LLM_CACHE_TTL_DIAS if ttl_dias is None else ttl_dias) * 86400
+    try:
+        conn = _connect(path)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        linha = conn.execute('SELECT texto, criado FROM respostas WHERE chave = ?', (chave,)).fetchone()
+        if linha is None or time.time() - linha[1] > ttl:
+            return None
+        with conn:
+            conn.execute('UPDATE respostas SET acessado = ? WHERE chave = ?', (time.time(), chave))
+        return linha[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def cache_put(chave, model, texto, path=None, max_mb=None, ttl_dias=None):
+    path = path or LLM_CACHE_PATH
+    agora = time.time()
+    try:
+        conn = _connect(path)
+    except (OSError, sqlite3.Error):
+        return
+    try:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?)',
+                (chave, model, texto, agora, agora, len(texto.encode('utf-8'))),
+            )
+        _evict(conn, max_mb, ttl_dias)
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+
+def _evict(conn, max_mb=None, ttl_dias=None):
+    max_bytes = (LLM_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    ttl = (LLM_CACHE_TTL_DIAS if ttl_dias is None else ttl_dias) * 86400
+    with conn:
+        conn.execute('DELETE FROM respostas WHERE criado < ?', (time.time() - ttl,))
+        total = conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM respostas').fetchone()[0]
+        if total <= max_bytes:
+            return
+        # Remove as menos acessadas recentemente até caber no limite
+        excedente = total - max_bytes
+        removidas = []
+        for chave, tamanho in conn.execute('SELECT chave, tamanho FROM respostas ORDER BY acessado'):
+            if excedente <= 0:
+                break
+            removidas.append((chave,))
+            excedente -= tamanho
+        conn.executemany('DELETE FROM respostas WHERE chave = ?', removidas)
+
+
+def _claim(chave):
+    # (futuro, dono): o dono faz a chamada; os demais esperam o mesmo futuro
+    with _em_andamento_lock:
+        futuro = _em_andamento.get(chave)
+        if futuro is not None:
+            return futuro, False
+        futuro = Future()
+        _em_andamento[chave] = futuro
+        return futuro, True
+
+
+def _release(chave):
+    with _em_andamento_lock:
+        _em_andamento.pop(chave, None)
+
+
+def generate_cached(client, prompt, model=LLM_MODEL, path=None, renovar=False):
+    # Retorna (texto, origem) com origem em 'cache', 'api' ou 'coalescida'.
+    # 'client' é qualquer objeto com client.models.generate_content(model=, contents=),
+    # o que permite usar um cliente falso local em testes. renovar=True ignora
+    # a resposta guardada e grava a nova no lugar dela.
+    chave = prompt_key(model, prompt)
+    texto = None if renovar else cache_get(chave, path)
+    if texto is not None:
+        return texto, 'cache'
+
+    futuro, dono = _claim(chave)
+    if not dono:
+        # Outra sessão já pediu o mesmo prompt: espera a mesma resposta
+        return futuro.result(), 'coalescida'
+
+    try:
+        # Outro dono pode ter terminado (e liberado a chave) entre a consulta
+        # acima e o _claim: confere o cache de novo antes de ir à API
+        texto = None if renovar else cache_get(chave, path)
+        if texto is not None:
+            futuro.set_result(texto)
+            return texto, 'cache'
+        response = client.models.generate_content(model=model, contents=prompt)
+        texto = response.text
+        if texto:
+            cache_put(chave, model, texto, path)
+        futuro.set_result(texto)
+        return texto, 'api'
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    finally:
+        _release(chave)
+
+
+def stream_cached(client, prompt, model=LLM_MODEL, path=None, stats=None):
+    # Gerador de trechos de texto via generate_content_stream. Respostas em
+    # cache ou coalescidas saem num único trecho. Ao final, 'stats' recebe
+    # origem, ttft (segundos até o primeiro trecho) e o texto completo.
+    stats = {} if stats is None else stats
+    inicio = time.perf_counter()
+    chave = prompt_key(model, prompt)
+    texto = cache_get(chave, path)
+    if texto is not None:
+        stats.update(origem='cache', ttft=time.perf_counter() - inicio, texto=texto)
+        yield texto
+        return
+
+    futuro, dono = _claim(chave)
+    if not dono:
+        texto = futuro.result()
+        stats.update(origem='coalescida', ttft=time.perf_counter() - inicio, texto=texto)
+        yield texto
+        return
+
+    partes = []
+    try:
+        # Mesmo cuidado do generate_cached: o dono anterior pode ter acabado de gravar
+        texto = cache_get(chave, path)
+        if texto is not None:
+            stats.update(origem='cache', ttft=time.perf_counter() - inicio, texto=texto)
+            futuro.set_result(texto)
+            yield texto
+            return
+        for chunk in client.models.generate_content_stream(model=model, contents=prompt):
+            pedaco = chunk.text or ''
+            if not pedaco:
+                continue
+            if not partes:
+                stats['ttft'] = time.perf_counter() - inicio
+            partes.append(pedaco)
+            yield pedaco
+        texto = ''.join(partes)
+        if texto:
+            cache_put(chave, model, texto, path)
+        stats.update(origem='api', texto=texto)
+        futuro.set_result(texto)
+    except GeneratorExit:
+        # Um rerun interrompeu a renderização: quem esperava recebe o erro e pode repetir
+        if not futuro.done():
+            futuro.set_exception(RuntimeError("Geração interrompida."))
+        raise
+    except BaseException as e:
+        if not futuro.done():
+            futuro.set_exception(e)
+        raise
+    finally:
+        _release(chave)
+
+
+def buffer_lines(trechos):
+    # Só entrega linhas completas: negrito, itálico e listas não aparecem
+    # abertos pela metade enquanto o Markdown é renderizado aos poucos
+    pendente = ''
+    for trecho in trechos:
+        pendente += trecho
+        corte = pendente.rfind('\n')
+        if corte >= 0:
+            yield pendente[:corte + 1]
+            pendente = pendente[corte + 1:]
+    if pendente:
+        yield pendente
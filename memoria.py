@@ -0,0 +1,59 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from entidades import build_entity_csr, extract_entities_batch
+from ingestao import COLS_MAP, parse_bible, read_table
+
+# =========================================================
+# LAYOUT COMPACTO EM MEMÓRIA
+# Uso: python memoria.py blivre.xlsx   (relatório de bytes por coluna)
+# =========================================================
+
+def compact_bible(df):
+    # Troca a coluna de listas 'Entidades' pelo CSR de ids internados. O índice
+    # vira posicional para que a linha i do frame seja a linha i do CSR.
+    csr = build_entity_csr(df['Entidades'])
+    compacto = df.drop(columns=['Entidades']).reset_index(drop=True)
+    return compacto, csr
+
+
+def csr_nbytes(csr):
+    vocab = sum(sys.getsizeof(nome) for nome in csr['vocab']) + csr['vocab'].nbytes
+    return int(csr['offsets'].nbytes + csr['ids'].nbytes + vocab)
+
+
+def memory_report(df_original, df_compacto, csr):
+    antes = df_original.memory_usage(deep=True, index=False)
+    depois = df_compacto.memory_usage(deep=True, index=False)
+    linhas = []
+    for col in df_original.columns:
+        if col == 'Entidades':
+            # memory_usage(deep=True) mede só as listas, não as strings dentro delas
+            listas = sum(sys.getsizeof(ents) + sum(sys.getsizeof(e) for e in ents) for ents in df_original[col])
+            linhas.append((col, int(listas), csr_nbytes(csr), 'CSR int32'))
+        else:
+            linhas.append((col, int(antes[col]), int(depois.get(col, 0)), str(df_compacto[col].dtype)))
+    relatorio = pd.DataFrame(linhas, columns=['Coluna', 'Antes (bytes)', 'Depois (bytes)', 'Formato'])
+    total = pd.DataFrame([('TOTAL', relatorio['Antes (bytes)'].sum(), relatorio['Depois (bytes)'].sum(), '')], columns=relatorio.columns)
+    return pd.concat([relatorio, total], ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relatório de memória do DataFrame de versículos")
+    parser.add_argument('arquivo')
+    args = parser.parse_args()
+
+    with open(args.arquivo, 'rb') as f:
+        data = f.read()
+    # Antes: como o app carregava (object/int64 e listas de strings)
+    original = read_table(data, args.arquivo).rename(columns=COLS_MAP, errors='ignore')
+    original['Entidades'] = extract_entities_batch(original['Texto'])
+    compacto, csr = compact_bible(parse_bible(data, args.arquivo))
+
+    relatorio = memory_report(original, compacto, csr)
+    relatorio['Redução'] = (1 - relatorio['Depois (bytes)'] / relatorio['Antes (bytes)'].replace(0, np.nan)).map(
+        lambda r: f"{r:.0%}" if pd.notna(r) else '')
+    print(relatorio.to_string(index=False))
@@ -0,0 +1,189 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache_colunar import CACHE_DIR
+
+# =========================================================
+# PERFIL POR RERUN (OPCIONAL)
+# Ligado com BIBLIA_PERFIL=1 ou ?perfil=1 na URL. Cada rerun roda numa thread
+# do Streamlit e guarda ali seus intervalos (spans) e acertos/falhas de cache;
+# os totais de todos os reruns ficam agregados para exportar em JSON ou no
+# formato texto do Prometheus. Desligado, cada span custa um getattr.
+# =========================================================
+
+PERFIL_PATH = os.environ.get('BIBLIA_PERFIL_ARQUIVO', os.path.join(CACHE_DIR, 'perfil.json'))
+# Só a máquina local por padrão; 0.0.0.0 expõe as métricas em todas as interfaces
+PERFIL_HOST = os.environ.get('BIBLIA_PERFIL_HOST', '127.0.0.1')
+
+_local = threading.local()
+_agregado_lock = threading.Lock()
+# nome -> [chamadas, segundos, máximo]
+_spans = {}
+# nome -> [acertos, falhas]
+_caches = {}
+_servidor = None
+_erro_servidor = None
+
+
+def start_rerun(ativo):
+    _local.rerun = {'inicio': time.perf_counter(), 'spans': [], 'caches': {}, 'falhas': set(), 'profundidade': 0} \
+        if ativo else None
+    return _local.rerun
+
+
+def current_rerun():
+    return getattr(_local, 'rerun', None)
+
+
+def rerun_elapsed(rerun):
+    return time.perf_counter() - rerun['inicio']
+
+
+@contextmanager
+def span(nome):
+    rerun = current_rerun()
+    if rerun is None:
+        yield
+        return
+    # [nome, profundidade, segundos], na ordem de início (aninhados logo abaixo do pai)
+    registro = [nome, rerun['profundidade'], 0.0]
+    rerun['spans'].append(registro)
+    rerun['profundidade'] += 1
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro[2] = time.perf_counter() - t0
+        rerun['profundidade'] -= 1
+        with _agregado_lock:
+            total = _spans.setdefault(nome, [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += registro[2]
+            total[2] = max(total[2], registro[2])
+
+
+def count_cache(nome, acerto):
+    rerun = current_rerun()
+    if rerun is None:
+        return
+    rerun['caches'].setdefault(nome, [0, 0])[0 if acerto else 1] += 1
+    with _agregado_lock:
+        _caches.setdefault(nome, [0, 0])[0 if acerto else 1] += 1
+
+
+def cached(nome, cache):
+    # Envolve um st.cache_*: cache=st.cache_resource(...). O corpo só roda na
+    # falha, então marcá-lo por dentro separa acerto de falha sem API interna.
+    def decorador(fn):
+        @functools.wraps(fn)
+        def corpo(*args, **kwargs):
+            rerun = current_rerun()
+            if rerun is not None:
+                rerun['falhas'].add(nome)
+            return fn(*args, **kwargs)
+
+        cacheada = cache(corpo)
+
+        @functools.wraps(fn)
+        def chamada(*args, **kwargs):
+            rerun = current_rerun()
+            if rerun is None:
+                return cacheada(*args, **kwargs)
+            rerun['falhas'].discard(nome)
+            with span(nome):
+                resultado = cacheada(*args, **kwargs)
+            count_cache(nome, nome not in rerun['falhas'])
+            rerun['falhas'].discard(nome)
+            return resultado
+
+        chamada.clear = cacheada.clear
+        return chamada
+    return decorador
+
+
+def rerun_table(rerun):
+    # Linhas para exibir: (span com recuo, ms, % do rerun)
+    total = rerun_elapsed(rerun) or 1.0
+    return [('  ' * profundidade + nome, segundos * 1000, segundos / total * 100)
+            for nome, profundidade, segundos in rerun['spans']]
+
+
+def snapshot():
+    with _agregado_lock:
+        return {
+            'spans': {nome: {'chamadas': n, 'segundos': round(s, 6), 'max_segundos': round(m, 6)}
+                      for nome, (n, s, m) in sorted(_spans.items())},
+            'caches': {nome: {'acertos': a, 'falhas': f} for nome, (a, f) in sorted(_caches.items())},
+        }
+
+
+def export_json(path=None):
+    path = path or PERFIL_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    dados = dict(snapshot(), gerado=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def _label(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def prometheus_text():
+    dados = snapshot()
+    linhas = [
+        '# HELP biblia_span_seconds Tempo gasto em cada span do app.',
+        '# TYPE biblia_span_seconds summary',
+    ]
+    for nome, s in dados['spans'].items():
+        linhas.append(f'biblia_span_seconds_sum{{span="{_label(nome)}"}} {s["segundos"]}')
+        linhas.append(f'biblia_span_seconds_count{{span="{_label(nome)}"}} {s["chamadas"]}')
+    linhas += [
+        '# HELP biblia_span_max_seconds Maior duração observada do span.',
+        '# TYPE biblia_span_max_seconds gauge',
+    ]
+    linhas += [f'biblia_span_max_seconds{{span="{_label(nome)}"}} {s["max_segundos"]}' for nome, s in dados['spans'].items()]
+    linhas += [
+        '# HELP biblia_cache_requests_total Consultas a caches, por resultado.',
+        '# TYPE biblia_cache_requests_total counter',
+    ]
+    for nome, c in dados['caches'].items():
+        linhas.append(f'biblia_cache_requests_total{{cache="{_label(nome)}",resultado="acerto"}} {c["acertos"]}')
+        linhas.append(f'biblia_cache_requests_total{{cache="{_label(nome)}",resultado="falha"}} {c["falhas"]}')
+    return '\n'.join(linhas) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        corpo = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_prometheus(porta, host=None):
+    # /metrics (qualquer caminho) numa thread à parte; uma tentativa por processo.
+    # Devolve (servidor, erro): porta ocupada vira aviso, sem nova tentativa a cada rerun
+    global _servidor, _erro_servidor
+    with _agregado_lock:
+        if _servidor is None and _erro_servidor is None:
+            try:
+                _servidor = ThreadingHTTPServer((host or PERFIL_HOST, porta), _MetricsHandler)
+            except OSError as e:
+                _erro_servidor = e
+            else:
+                threading.Thread(target=_servidor.serve_forever, name='perfil-prometheus', daemon=True).start()
+    return _servidor, _erro_servidor
@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+
+# =========================================================
+# PLANO DE LEITURA ANUAL
+# =========================================================
+
+def generate_reading_plan(df):
+    if 'Livro_ID' in df.columns:
+        chapters = df[['Livro_ID', 'Livro', 'Capitulo']].drop_duplicates().sort_values(['Livro_ID', 'Capitulo'])
+    else:
+        chapters = df[['Livro', 'Capitulo']].drop_duplicates()
+
+    chapters_list = chapters[['Livro', 'Capitulo']].values.tolist()
+    total_chapters = len(chapters_list)
+
+    # Gerador próprio com a mesma semente: mesmo plano de sempre, sem mexer
+    # no estado global do random compartilhado entre sessões
+    random.Random(42).shuffle(chapters_list)
+
+    plan = {}
+    chunk_size = total_chapters / 365
+    current_idx = 0
+    for day in range(1, 366):
+        end_idx = int(day * chunk_size)
+        daily_chapters = chapters_list[current_idx:end_idx]
+        plan[day] = daily_chapters
+        current_idx = end_idx
+    return plan, total_chapters
+
+
+# =========================================================
+# PROGRESSO DE LEITURA (VETORIZADO)
+# Cada capítulo cai em exatamente um dia do plano; guardar o dia de cada
+# capítulo torna o progresso uma máscara de dias lidos + np.bincount por livro.
+# =========================================================
+
+def build_plan_index(df, ref_index, plan):
+    if 'Livro_ID' in df.columns:
+        ordem = df[['Livro', 'Livro_ID']].drop_duplicates().sort_values('Livro_ID')['Livro'].tolist()
+    else:
+        ordem = sorted(df['Livro'].unique())
+    ordem = list(dict.fromkeys(ordem))
+    livro_idx = {livro: i for i, livro in enumerate(ordem)}
+
+    pares = list(ref_index['fatias'])
+    capitulo_id = {par: i for i, par in enumerate(pares)}
+    livro_do_capitulo = np.array([livro_idx[livro] for livro, _ in pares], dtype=np.int32)
+    # Dia 0 = capítulo fora do plano
+    dia_do_capitulo = np.zeros(len(pares), dtype=np.int16)
+    for dia, capitulos in plan.items():
+        for livro, cap in capitulos:
+            dia_do_capitulo[capitulo_id[(livro, cap)]] = dia
+
+    return {
+        'livros': ordem,
+        'livro_do_capitulo': livro_do_capitulo,
+        'dia_do_capitulo': dia_do_capitulo,
+        'total_por_livro': np.bincount(livro_do_capitulo, minlength=len(ordem)),
+    }
+
+
+def reading_progress(plan_index, dias):
+    # Capítulos lidos por livro, na ordem de plan_index['livros']
+    lidos = np.zeros(367, dtype=bool)
+    dias = np.asarray(list(dias), dtype=np.int64)
+    lidos[dias[(dias >= 1) & (dias <= 366)]] = True
+    capitulo_lido = lidos[plan_index['dia_do_capitulo']]
+    return np.bincount(plan_index['livro_do_capitulo'][capitulo_lido], minlength=len(plan_index['livros']))
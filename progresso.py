@@ -0,0 +1,151 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from cache_colunar import CACHE_DIR
+
+# =========================================================
+# PROGRESSO DE LEITURA PERSISTENTE (VÁRIOS USUÁRIOS)
+# Uma linha por (leitor, Bíblia) com os dias lidos num bitset de 46 bytes.
+# Leituras usam um pool de conexões (WAL: leitores não bloqueiam o escritor);
+# escritas entram num buffer e uma thread grava tudo numa transação só.
+# =========================================================
+
+PROGRESSO_PATH = os.environ.get('BIBLIA_PROGRESSO', os.path.join(CACHE_DIR, 'progresso.sqlite'))
+DIAS_NO_ANO = 366
+
+
+def encode_days(dias):
+    mascara = np.zeros(DIAS_NO_ANO, dtype=bool)
+    dias = np.asarray(list(dias), dtype=np.int64)
+    mascara[dias[(dias >= 1) & (dias <= DIAS_NO_ANO)] - 1] = True
+    return np.packbits(mascara).tobytes()
+
+
+def decode_days(bitset):
+    if not bitset:
+        return []
+    mascara = np.unpackbits(np.frombuffer(bitset, dtype=np.uint8))[:DIAS_NO_ANO]
+    return (np.flatnonzero(mascara) + 1).tolist()
+
+
+class ProgressStore:
+    def __init__(self, path=None, pool_size=8, flush_ms=50):
+        self.path = path or PROGRESSO_PATH
+        self._flush_s = flush_ms / 1000
+        self._pool = queue.LifoQueue()
+        self._vagas = threading.Semaphore(pool_size)
+        # Gravações pendentes: (leitor, biblia) -> bitset; a última vence
+        self._pendentes = {}
+        # Lote sendo gravado agora: continua visível para leituras até o COMMIT
+        self._gravando = {}
+        self._pendentes_lock = threading.Lock()
+        self._escrita_lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._fechado = False
+
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS progresso ('
+                'leitor TEXT, biblia TEXT, dias BLOB, atualizado REAL, '
+                'PRIMARY KEY (leitor, biblia)) WITHOUT ROWID'
+            )
+        self._escritor = threading.Thread(target=self._writer_loop, name='progresso-escritor', daemon=True)
+        self._escritor.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        # Pool limitado: no máximo pool_size conexões abertas, reaproveitadas
+        self._vagas.acquire()
+        try:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._pool.put(conn)
+        finally:
+            self._vagas.release()
+
+    def load(self, leitor, biblia):
+        with self._pendentes_lock:
+            pendente = self._pendentes.get((leitor, biblia), self._gravando.get((leitor, biblia)))
+        if pendente is not None:
+            return decode_days(pendente)
+        with self._connection() as conn:
+            linha = conn.execute('SELECT dias FROM progresso WHERE leitor = ? AND biblia = ?', (leitor, biblia)).fetchone()
+        return decode_days(linha[0]) if linha else []
+
+    def save(self, leitor, biblia, dias):
+        with self._pendentes_lock:
+            self._pendentes[(leitor, biblia)] = encode_days(dias)
+        self._acordar.set()
+
+    def flush(self):
+        with self._escrita_lock:
+            with self._pendentes_lock:
+                lote, self._pendentes = self._pendentes, {}
+                self._gravando = lote
+            if not lote:
+                return 0
+            agora = time.time()
+            try:
+                with self._connection() as conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        conn.executemany('INSERT OR REPLACE INTO progresso VALUES (?, ?, ?, ?)',
+                                         [(leitor, biblia, dias, agora) for (leitor, biblia), dias in lote.items()])
+                        conn.execute('COMMIT')
+                    except sqlite3.Error:
+                        conn.execute('ROLLBACK')
+                        raise
+            except sqlite3.Error:
+                # Devolve ao buffer sem sobrescrever gravações mais novas
+                with self._pendentes_lock:
+                    for chave, dias in lote.items():
+                        self._pendentes.setdefault(chave, dias)
+                raise
+            finally:
+                with self._pendentes_lock:
+                    self._gravando = {}
+            return len(lote)
+
+    def _writer_loop(self):
+        while not self._fechado:
+            self._acordar.wait()
+            self._acordar.clear()
+            # Junta as gravações que chegarem na janela de flush numa transação só
+            time.sleep(self._flush_s)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                self._acordar.set()
+
+    def close(self):
+        if self._fechado:
+            return
+        self._fechado = True
+        self._acordar.set()
+        self._escritor.join(timeout=5)
+        self.flush()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,42 @@
+import numpy as np
+
+# =========================================================
+# ÍNDICE DE REFERÊNCIAS (LIVRO / CAPÍTULO / VERSÍCULO)
+# =========================================================
+
+def build_reference_index(df):
+    # Uma única passada agrupando as linhas por (Livro, Capitulo), na ordem de
+    # aparição. Capítulos contíguos viram fatias (slice) e a busca é O(1).
+    grupos = df.groupby(['Livro', 'Capitulo'], sort=False, observed=True).indices
+    versiculos_col = df['Versiculo'].to_numpy()
+
+    fatias = {}
+    capitulos = {}
+    versiculos = {}
+    for (livro, cap), posicoes in grupos.items():
+        ini, fim = int(posicoes[0]), int(posicoes[-1]) + 1
+        if fim - ini == len(posicoes):
+            fatias[(livro, cap)] = slice(ini, fim)
+        else:
+            fatias[(livro, cap)] = np.sort(posicoes)
+        capitulos.setdefault(livro, []).append(cap)
+        versiculos[(livro, cap)] = sorted(set(versiculos_col[posicoes].tolist()))
+
+    return {
+        'livros': list(df['Livro'].unique()),
+        'capitulos': {livro: sorted(caps) for livro, caps in capitulos.items()},
+        'versiculos': versiculos,
+        'fatias': fatias,
+    }
+
+
+def chapter_rows(df, ref_index, livro, cap):
+    fatia = ref_index['fatias'].get((livro, cap))
+    if fatia is None:
+        return df.iloc[0:0]
+    return df.iloc[fatia]
+
+
+def verse_rows(df, ref_index, livro, cap, vers):
+    capitulo = chapter_rows(df, ref_index, livro, cap)
+    return capitulo[capitulo['Versiculo'] == vers]
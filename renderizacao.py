@@ -0,0 +1,56 @@
+import re
+
+from entidades import row_entities
+from referencias import chapter_rows
+
+# =========================================================
+# RENDERIZAÇÃO DE CAPÍTULOS (HTML)
+# =========================================================
+
+_SEPARADOR = '\x1e'
+_DESTAQUE = "<b style='color:#833500'>{}</b>"
+
+
+def entity_pattern(entidades):
+    # Uma única alternância compilada, nomes mais longos primeiro e palavra
+    # inteira: cada trecho é destacado uma vez, sem substituições em cascata
+    # ("Eva" não marca "Evangelho", nem o HTML já inserido)
+    nomes = sorted(set(entidades), key=lambda nome: (-len(nome), nome))
+    if not nomes:
+        return None
+    return re.compile(r'(?<!\w)(' + '|'.join(re.escape(nome) for nome in nomes) + r')(?!\w)')
+
+
+def render_devotional_chapter(df, ref_index, livro, cap):
+    # Retorna (html, texto_puro) do capítulo para a aba "Texto Bíblico"
+    subset = chapter_rows(df, ref_index, livro, cap)
+    versiculos = subset['Versiculo'].tolist()
+    textos = subset['Texto'].tolist()
+    texto = ''.join(f"{v}. {t} " for v, t in zip(versiculos, textos))
+    html = ''.join(
+        f"<div style='margin-bottom: 8px;'><span style='color:#833500; font-weight:bold;'>{v}.</span> <span style='color:#353535;'>{t}</span></div>"
+        for v, t in zip(versiculos, textos)
+    )
+    return html, texto
+
+
+def render_explorer_chapter(df, ref_index, entity_csr, livro, cap):
+    subset = chapter_rows(df, ref_index, livro, cap)
+    versiculos = subset['Versiculo'].tolist()
+    textos = [str(t) for t in subset['Texto'].tolist()]
+
+    entidades = [ent for pos in subset.index for ent in row_entities(entity_csr, pos)]
+    padrao = entity_pattern(entidades)
+    if padrao is not None and textos:
+        # Uma passada da regex sobre o capítulo inteiro
+        destacado = padrao.sub(lambda m: _DESTAQUE.format(m.group(1)), _SEPARADOR.join(textos))
+        partes = destacado.split(_SEPARADOR)
+        if len(partes) == len(textos):
+            textos = partes
+
+    corpo = ''.join(
+        f"<div style='margin-bottom: 5px;'><sup style='color:#1e295a; font-weight:bold; margin-right: 5px;'>{v}</sup> {t}</div>"
+        for v, t in zip(versiculos, textos)
+    )
+    return ("<div style='background-color: white; padding: 20px; border-radius: 10px; border-left: 5px solid #F18F01; box-shadow: 2px 2px 10px rgba(0,0,0,0.05);'>"
+            + corpo + "</div>")
@@ -0,0 +1,291 @@
+import argparse
+import importlib.util
+import os
+import time
+import uuid
+
+import numpy as np
+
+from busca import build_bm25_index
+from cache_colunar import CACHE_DIR
+
+# Encoder externo opcional (ex: BIBLIA_ENCODER=st:paraphrase-multilingual-MiniLM-L12-v2).
+# Só verifica se está instalado: o import (torch junto) fica para load_encoder.
+HAS_SENTENCE_TRANSFORMERS = importlib.util.find_spec('sentence_transformers') is not None
+
+# =========================================================
+# SIMILARIDADE SEMÂNTICA ENTRE VERSÍCULOS
+# Uso: python semantica.py build blivre.xlsx [--dim 128]   (pré-calcula os vetores)
+#      python semantica.py similar blivre.xlsx "Livro" 3 16
+# Modelo padrão local (LSA: pesos BM25 + SVD aleatória em NumPy), sem rede
+# nem GPU. Vetores float32 normalizados, gravados em .npy e lidos via mmap.
+# =========================================================
+
+EMBEDDINGS_VERSION = 1
+LSA_DIM = 128
+ENCODER = os.environ.get('BIBLIA_ENCODER', 'lsa')
+# Acima disso a busca exata dá lugar ao índice IVF (k-means esférico)
+IVF_MIN_VERSOS = 200_000
+_BLOCO_NNZ = 1 << 17
+_LOTE = 2048
+
+
+# ---------------------------------------------------------
+# ÁLGEBRA ESPARSA MÍNIMA (CSR em arrays NumPy)
+# ---------------------------------------------------------
+
+def _spmm(indptr, indices, data, B, ini=0, fim=None):
+    # Linhas ini:fim da matriz esparsa vezes B denso, em blocos de até _BLOCO_NNZ
+    # não zeros para limitar a memória temporária
+    fim = len(indptr) - 1 if fim is None else fim
+    out = np.zeros((fim - ini, B.shape[1]), dtype=np.float32)
+    linha = ini
+    while linha < fim:
+        prox = int(np.searchsorted(indptr, indptr[linha] + _BLOCO_NNZ, side='right')) - 1
+        prox = min(fim, max(prox, linha + 1))
+        k0, k1 = indptr[linha], indptr[prox]
+        if k1 > k0:
+            contrib = data[k0:k1, None] * B[indices[k0:k1]]
+            tamanhos = np.diff(indptr[linha:prox + 1])
+            cheias = np.flatnonzero(tamanhos)
+            # Linhas vazias não têm segmento: reduceat só nos inícios das cheias
+            out[linha - ini + cheias] = np.add.reduceat(contrib, (indptr[linha:prox] - k0)[cheias], axis=0)
+        linha = prox
+    return out
+
+
+def _doc_major(bm25):
+    # O índice BM25 é termo x versículo; a SVD precisa também de versículo x termo
+    offsets, docs = bm25['offsets'], bm25['docs']
+    termos = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+    ordem = np.argsort(docs, kind='stable')
+    indptr = np.zeros(bm25['n_docs'] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(docs, minlength=bm25['n_docs']), out=indptr[1:])
+    return indptr, termos[ordem], bm25['pesos'][ordem]
+
+
+def _normalize_rows(vetores):
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    normas[normas == 0] = 1
+    return (vetores / normas).astype(np.float32, copy=False)
+
+
+# ---------------------------------------------------------
+# MODELO LSA LOCAL
+# ---------------------------------------------------------
+
+def build_lsa_model(bm25, dim=LSA_DIM, iteracoes=3, seed=42):
+    # SVD truncada aleatória (Halko et al.) da matriz de pesos BM25
+    n_docs, n_termos = bm25['n_docs'], len(bm25['vocab'])
+    dim = max(1, min(dim, n_termos - 1, n_docs - 1))
+    r = min(dim + 10, n_termos, n_docs)
+    linhas = _doc_major(bm25)
+    colunas = (bm25['offsets'], bm25['docs'], bm25['pesos'])
+
+    rng = np.random.default_rng(seed)
+    Q, _ = np.linalg.qr(_spmm(*linhas, rng.standard_normal((n_termos, r)).astype(np.float32)))
+    for _ in range(iteracoes):
+        Z, _ = np.linalg.qr(_spmm(*colunas, Q.astype(np.float32)))
+        Q, _ = np.linalg.qr(_spmm(*linhas, Z.astype(np.float32)))
+    B = _spmm(*colunas, Q.astype(np.float32)).T
+    _, _, Vt = np.linalg.svd(B, full_matrices=False)
+
+    return {
+        'vocab': bm25['vocab'],
+        'componentes': np.ascontiguousarray(Vt[:dim].T, dtype=np.float32),
+        'linhas': linhas,
+    }
+
+
+def encoder_tag(nome=None, dim=LSA_DIM):
+    # Rótulo do encoder no nome do .npy, sem carregar o modelo
+    nome = nome or ENCODER
+    return 'st-' + nome[3:].replace('/', '_') if nome.startswith('st:') else f"lsa{dim}"
+
+
+def load_encoder(nome=None):
+    # 'lsa' (padrão, construído junto com os vetores) ou 'st:<modelo>'
+    nome = nome or ENCODER
+    if nome.startswith('st:'):
+        if not HAS_SENTENCE_TRANSFORMERS:
+            raise ValueError("Encoder 'st:' requer o pacote sentence-transformers.")
+        from sentence_transformers import SentenceTransformer
+        modelo = SentenceTransformer(nome[3:])
+
+        def encode(textos):
+            return _normalize_rows(modelo.encode(list(textos), convert_to_numpy=True))
+
+        encode.nome = encoder_tag(nome)
+        return encode
+    return None
+
+
+# ---------------------------------------------------------
+# VETORES EM DISCO (float32, memory-mapped)
+# ---------------------------------------------------------
+
+def embeddings_path(chave, nome, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{chave}-{nome}-e{EMBEDDINGS_VERSION}.npy")
+
+
+def has_embeddings(chave, nome=None, dim=LSA_DIM, cache_dir=None):
+    # Vetores já gravados (pré-calculados com 'build' ou 'cache_colunar seed')
+    return bool(chave) and os.path.exists(embeddings_path(chave, encoder_tag(nome, dim), cache_dir))
+
+
+def write_embeddings(path, n, dim, lotes):
+    # 'lotes' produz (ini, matriz) em ordem; escrita atômica como no cache Parquet
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    saida = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(n, dim))
+    for ini, matriz in lotes:
+        saida[ini:ini + len(matriz)] = matriz
+    saida.flush()
+    del saida
+    os.replace(tmp, path)
+    return np.load(path, mmap_mode='r')
+
+
+def compute_embeddings(textos, chave=None, encoder=None, dim=LSA_DIM, cache_dir=None, lote=_LOTE, bm25=None):
+    # Vetores normalizados de todos os versículos, calculados em lotes. Com
+    # chave, reaproveita o .npy gravado; sem chave (ou sem disco), fica em memória.
+    textos = [t if isinstance(t, str) else '' for t in textos]
+    n = len(textos)
+    nome = f"lsa{dim}" if encoder is None else encoder.nome
+    path = embeddings_path(chave, nome, cache_dir) if chave else None
+    if path and os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+
+    if encoder is None:
+        modelo = build_lsa_model(bm25 if bm25 is not None else build_bm25_index(textos), dim)
+        V = modelo['componentes']
+        dim = V.shape[1]
+
+        def lotes():
+            for ini in range(0, n, lote):
+                yield ini, _normalize_rows(_spmm(*modelo['linhas'], V, ini, min(n, ini + lote)))
+    else:
+        dim = encoder(textos[:1]).shape[1]
+
+        def lotes():
+            for ini in range(0, n, lote):
+                yield ini, encoder(textos[ini:ini + lote])
+
+    if path:
+        try:
+            return write_embeddings(path, n, dim, lotes())
+        except OSError:
+            # Sem disco: recalcula em memória
+            pass
+    vetores = np.zeros((n, dim), dtype=np.float32)
+    for ini, matriz in lotes():
+        vetores[ini:ini + len(matriz)] = matriz
+    return vetores
+
+
+# ---------------------------------------------------------
+# BUSCA POR VIZINHOS (exata ou IVF)
+# ---------------------------------------------------------
+
+def _top_k(pontuacao, top_k):
+    if len(pontuacao) > top_k:
+        candidatos = np.argpartition(-pontuacao, top_k - 1)[:top_k]
+    else:
+        candidatos = np.arange(len(pontuacao))
+    return candidatos[np.lexsort((candidatos, -pontuacao[candidatos]))]
+
+
+def build_ivf(vetores, n_listas=None, iteracoes=10, seed=42, lote=65536):
+    # k-means esférico; listas guardadas como CSR (offsets + ids ordenados por lista)
+    n = len(vetores)
+    n_listas = n_listas or max(1, int(np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+    centroides = np.array(vetores[rng.choice(n, n_listas, replace=False)], dtype=np.float32)
+
+    def atribuir():
+        return np.concatenate([np.argmax(vetores[i:i + lote] @ centroides.T, axis=1) for i in range(0, n, lote)])
+
+    for _ in range(iteracoes):
+        lista = atribuir()
+        ordem = np.argsort(lista, kind='stable')
+        contagem = np.bincount(lista, minlength=n_listas)
+        cheias = np.flatnonzero(contagem)
+        inicios = np.concatenate([[0], np.cumsum(contagem)[:-1]])[cheias]
+        # Listas vazias mantêm o centroide anterior
+        centroides[cheias] = _normalize_rows(np.add.reduceat(vetores[ordem], inicios, axis=0))
+
+    lista = atribuir()
+    ordem = np.argsort(lista, kind='stable').astype(np.int32)
+    offsets = np.zeros(n_listas + 1, dtype=np.int64)
+    np.cumsum(np.bincount(lista, minlength=n_listas), out=offsets[1:])
+    return {'centroides': centroides, 'offsets': offsets, 'ids': ordem}
+
+
+def search_vectors(vetores, consulta, top_k=10, ivf=None, n_sondas=8, excluir=None):
+    # Retorna (posições, similaridades cosseno) dos top_k vizinhos de 'consulta'
+    consulta = np.asarray(consulta, dtype=np.float32)
+    if ivf is None:
+        candidatos = None
+        pontuacao = np.asarray(vetores @ consulta)
+    else:
+        listas = _top_k(ivf['centroides'] @ consulta, n_sondas)
+        candidatos = np.sort(np.concatenate([ivf['ids'][ivf['offsets'][l]:ivf['offsets'][l + 1]] for l in listas]))
+        pontuacao = np.asarray(vetores[candidatos] @ consulta)
+    if excluir is not None:
+        if candidatos is None:
+            pontuacao[excluir] = -np.inf
+        else:
+            pontuacao[np.isin(candidatos, excluir)] = -np.inf
+    melhores = _top_k(pontuacao, top_k + (0 if excluir is None else np.size(excluir)))
+    melhores = melhores[np.isfinite(pontuacao[melhores])][:top_k]
+    posicoes = melhores if candidatos is None else candidatos[melhores]
+    return posicoes.astype(np.int32), pontuacao[melhores].astype(np.float32)
+
+
+def build_vector_index(textos, chave=None, encoder=None, cache_dir=None, bm25=None):
+    vetores = compute_embeddings(textos, chave, encoder, cache_dir=cache_dir, bm25=bm25)
+    ivf = build_ivf(vetores) if len(vetores) >= IVF_MIN_VERSOS else None
+    return {'vetores': vetores, 'ivf': ivf}
+
+
+def similar_verses(index, pos, top_k=10):
+    # "Versículos como este": vizinhos do vetor do próprio versículo, sem ele
+    return search_vectors(index['vetores'], index['vetores'][pos], top_k, index['ivf'], excluir=pos)
+
+
+if __name__ == "__main__":
+    from devocionais import load_dataset_file
+    from referencias import chapter_rows
+
+    parser = argparse.ArgumentParser(description="Vetores semânticos dos versículos")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_build = sub.add_parser('build', help="Calcula e grava os vetores (.npy)")
+    p_build.add_argument('arquivo')
+    p_build.add_argument('--dim', type=int, default=LSA_DIM)
+    p_sim = sub.add_parser('similar', help="Lista os versículos mais parecidos")
+    p_sim.add_argument('arquivo')
+    p_sim.add_argument('livro')
+    p_sim.add_argument('capitulo', type=int)
+    p_sim.add_argument('versiculo', type=int)
+    p_sim.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    dataset = load_dataset_file(args.arquivo)
+    df = dataset['df']
+    encoder = load_encoder()
+    if args.comando == 'build':
+        t0 = time.perf_counter()
+        vetores = compute_embeddings(df['Texto'], dataset['chave'], encoder, getattr(args, 'dim', LSA_DIM))
+        print(f"{vetores.shape[0]} x {vetores.shape[1]} float32 em {time.perf_counter() - t0:.1f}s")
+    else:
+        index = build_vector_index(df['Texto'], dataset['chave'], encoder)
+        capitulo = chapter_rows(df, dataset['referencias'], args.livro, args.capitulo)
+        alvo = capitulo.index[capitulo['Versiculo'] == args.versiculo]
+        if len(alvo) == 0:
+            raise SystemExit("Versículo não encontrado.")
+        t0 = time.perf_counter()
+        posicoes, similaridades = similar_verses(index, int(alvo[0]), args.top)
+        print(f"consulta: {(time.perf_counter() - t0) * 1000:.2f} ms")
+        for pos, sim in zip(posicoes, similaridades):
+            linha = df.iloc[pos]
+            print(f"{sim:.3f}  {linha['Livro']} {linha['Capitulo']}:{linha['Versiculo']}  {linha['Texto'][:80]}")
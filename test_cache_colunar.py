@@ -0,0 +1,37 @@
+import os
+import time
+
+from cache_colunar import MAX_TMP_HORAS, cache_path, content_hash, evict_cache, load_bible_bytes
+
+# =========================================================
+# CACHE COLUNAR: ENTRADAS CORROMPIDAS E TEMPORÁRIOS ÓRFÃOS
+# =========================================================
+
+CSV = ("Book Name,Book Number,Chapter,Verse,Text\n"
+       "Gênesis,1,1,1,No princípio criou Deus os céus e a terra.\n"
+       "Gênesis,1,1,2,E a terra era sem forma e vazia.\n").encode('utf-8')
+
+
+def test_corrupt_entry_is_discarded_and_reparsed(tmp_path):
+    df, _ = load_bible_bytes(CSV, 'biblia.csv', str(tmp_path))
+    path = cache_path(content_hash(CSV), str(tmp_path))
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    relido, _ = load_bible_bytes(CSV, 'biblia.csv', str(tmp_path))
+    assert relido['Texto'].tolist() == df['Texto'].tolist()
+    # Reescrito inteiro: a próxima leitura vem do cache de novo
+    assert load_bible_bytes(CSV, 'biblia.csv', str(tmp_path))[0]['Texto'].tolist() == df['Texto'].tolist()
+
+
+def test_evict_removes_stale_tmp_files(tmp_path):
+    antigo = tmp_path / 'abc-v2.parquet.dead.tmp'
+    recente = tmp_path / 'def-v2.parquet.live.tmp'
+    antigo.write_bytes(b'x')
+    recente.write_bytes(b'x')
+    velho = time.time() - MAX_TMP_HORAS * 3600 - 60
+    os.utime(antigo, (velho, velho))
+
+    removidos = evict_cache(cache_dir=str(tmp_path))
+    assert str(antigo) in removidos
+    assert not antigo.exists() and recente.exists()
@@ -0,0 +1,63 @@
+import random
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from dataset import build_dataset, dataset_frame
+from ingestao import normalize_bible
+from memoria import compact_bible
+
+# =========================================================
+# CONJUNTO DE DADOS COMPARTILHADO: IMUTÁVEL E SEM CÓPIA POR SESSÃO
+# Uso: python -m pytest -q
+# =========================================================
+
+_PALAVRAS = ['e', 'disse', 'o', 'povo', 'de', 'terra', 'luz', 'amor', 'Pedro', 'João', 'Moisés', 'rei']
+SESSOES = 20
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    rng = random.Random(42)
+    linhas = [(f"Livro {livro}", livro, cap, vers, ' '.join(rng.choice(_PALAVRAS) for _ in range(20)))
+              for livro in range(1, 11) for cap in range(1, 11) for vers in range(1, 21)]
+    df = pd.DataFrame(linhas, columns=['Book Name', 'Book Number', 'Chapter', 'Verse', 'Text'])
+    return build_dataset(*compact_bible(normalize_bible(df)), chave='teste')
+
+
+@pytest.mark.parametrize('escrita', [
+    lambda df: df.loc.__setitem__((0, 'Texto'), 'X'),
+    lambda df: df['Texto'].array.__setitem__(3, 'Z'),
+    lambda df: df.loc.__setitem__((0, 'Capitulo'), 99),
+    lambda df: df.loc.__setitem__((0, 'Livro'), 'Livro 2'),
+], ids=['texto loc', 'texto array', 'capitulo', 'livro'])
+def test_shared_frame_is_read_only(dataset, escrita):
+    antes = dataset['df'].iloc[[0, 3]].copy()
+    with pytest.raises(ValueError):
+        escrita(dataset['df'])
+    pd.testing.assert_frame_equal(dataset['df'].iloc[[0, 3]], antes)
+
+
+def test_session_frame_changes_stay_in_the_session(dataset):
+    original = dataset['df']['Texto'].iloc[0]
+    sessao = dataset_frame(dataset)
+    sessao.loc[0, 'Texto'] = 'só nesta sessão'
+    sessao['Coluna_da_sessao'] = 1
+    assert dataset['df']['Texto'].iloc[0] == original
+    assert 'Coluna_da_sessao' not in dataset['df'].columns
+    assert dataset_frame(dataset)['Texto'].iloc[0] == original
+
+
+def test_sessions_do_not_multiply_memory(dataset):
+    tamanho = int(dataset['df'].memory_usage(deep=True).sum())
+    dataset_frame(dataset)
+    tracemalloc.start()
+    try:
+        vistas = [dataset_frame(dataset) for _ in range(SESSOES)]
+        retido, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(vistas) == SESSOES
+    # Cada sessão custa só o objeto do frame, nunca uma cópia dos dados
+    assert retido / SESSOES < tamanho * 0.05
@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from busca import build_bm25_index, build_inverted_index
+from cache_colunar import cache_path, content_hash, load_bible_bytes
+
+# =========================================================
+# VÁRIAS TRADUÇÕES ALINHADAS PELA REFERÊNCIA
+# Chave (Livro_ID, Capitulo, Versiculo) empacotada em int64; sem Livro_ID nos
+# dois arquivos, o livro é casado pelo nome normalizado. Cada tradução
+# guarda só o alinhamento com a Bíblia principal (int32 por versículo); o
+# texto é lido do cache Parquet quando a tradução é usada pela primeira vez,
+# com no máximo MAX_TRADUCOES_CARREGADAS colunas em memória.
+# =========================================================
+
+MAX_TRADUCOES_CARREGADAS = 3
+MAX_PROCESSOS = max(1, min(4, (os.cpu_count() or 1)))
+
+
+def normalize_book(nome):
+    # 'Gênesis', ' GENESIS' -> 'genesis'
+    sem_acento = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acento.casefold().split())
+
+
+def book_names(df):
+    # Nomes normalizados na ordem de aparição (livro n -> número n + 1 nas chaves)
+    return [normalize_book(livro) for livro in pd.unique(df['Livro'])]
+
+
+def verse_keys(df, por_nome=False):
+    # Livro_ID quando existe; por_nome (ou sem Livro_ID) numera pela ordem de aparição
+    if 'Livro_ID' in df.columns and not por_nome:
+        livro = df['Livro_ID'].to_numpy().astype(np.int64)
+    else:
+        livro = pd.factorize(df['Livro'], sort=False)[0].astype(np.int64) + 1
+    return (livro << 32) | (df['Capitulo'].to_numpy().astype(np.int64) << 16) | df['Versiculo'].to_numpy().astype(np.int64)
+
+
+def rekey_books(chaves, livros_traducao, livros_principal):
+    # Troca o número do livro (ordem de aparição na tradução) pelo da principal com o
+    # mesmo nome; livros sem par ficam com 0, que não casa com nenhuma chave
+    numero = {nome: i + 1 for i, nome in enumerate(livros_principal)}
+    mapa = np.array([0] + [numero.get(nome, 0) for nome in livros_traducao], dtype=np.int64)
+    sem_par = [nome for nome in livros_traducao if nome not in numero]
+    return (mapa[chaves >> 32] << 32) | (chaves & 0xFFFFFFFF), sem_par
+
+
+def align_keys(chaves_principal, chaves_traducao):
+    # Linha da tradução para cada versículo da principal (-1 se não existir)
+    if len(chaves_traducao) == 0:
+        return np.full(len(chaves_principal), -1, dtype=np.int32)
+    ordem = np.argsort(chaves_traducao, kind='stable')
+    ordenadas = chaves_traducao[ordem]
+    idx = np.minimum(np.searchsorted(ordenadas, chaves_principal), len(ordenadas) - 1)
+    achou = ordenadas[idx] == chaves_principal
+    return np.where(achou, ordem[idx], -1).astype(np.int32)
+
+
+def _parse_translation(nome, data, cache_dir):
+    # Roda num processo separado: lê, normaliza e grava o Parquet; devolve só as
+    # chaves (o texto fica no disco), ou o texto junto se não houver cache em disco
+    df, _ = load_bible_bytes(data, nome, cache_dir)
+    chave = content_hash(data)
+    em_disco = os.path.exists(cache_path(chave, cache_dir))
+    return {
+        'nome': os.path.splitext(os.path.basename(nome))[0],
+        'chave': chave,
+        'chaves': verse_keys(df) if 'Livro_ID' in df.columns else None,
+        'chaves_por_nome': verse_keys(df, por_nome=True),
+        'livros': book_names(df),
+        'texto': None if em_disco else df['Texto'].astype(str).tolist(),
+    }
+
+
+def parse_translations(arquivos, cache_dir=None, processos=MAX_PROCESSOS):
+    # arquivos: [(nome, bytes)]. Um arquivo só é lido aqui mesmo; vários vão
+    # para um pool de processos ('spawn': seguro dentro do servidor com threads)
+    if len(arquivos) <= 1 or processos <= 1:
+        return [_parse_translation(nome, data, cache_dir) for nome, data in arquivos]
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processos, len(arquivos)), mp_context=contexto) as pool:
+        futuros = [pool.submit(_parse_translation, nome, data, cache_dir) for nome, data in arquivos]
+        return [f.result() for f in futuros]
+
+
+def build_translation_store(df_principal, traducoes, cache_dir=None):
+    # Com Livro_ID nos dois arquivos o alinhamento é direto; senão os livros são
+    # casados pelo nome. Sem nenhum livro em comum a ordem não pode ser conferida:
+    # a tradução é recusada (aviso) em vez de alinhar versículos errados.
+    com_id = 'Livro_ID' in df_principal.columns
+    chaves = verse_keys(df_principal) if com_id else None
+    chaves_por_nome = verse_keys(df_principal, por_nome=True)
+    livros_principal = book_names(df_principal)
+    alinhamentos = {}
+    origens = {}
+    avisos = {}
+    for trad in traducoes:
+        nome = trad['nome']
+        while nome in alinhamentos or nome in avisos:
+            nome += "'"
+        if com_id and trad['chaves'] is not None:
+            alinhamento = align_keys(chaves, trad['chaves'])
+        else:
+            chaves_trad, sem_par = rekey_books(trad['chaves_por_nome'], trad['livros'], livros_principal)
+            if len(sem_par) == len(trad['livros']):
+                avisos[nome] = ("nenhum livro com o mesmo nome da Bíblia principal e sem Livro_ID/Book Number "
+                                "para conferir a ordem; tradução ignorada.")
+                continue
+            if sem_par:
+                avisos[nome] = f"{len(sem_par)} livro(s) sem nome correspondente, sem texto paralelo: {', '.join(sem_par[:5])}"
+            alinhamento = align_keys(chaves_por_nome, chaves_trad)
+        alinhamentos[nome] = alinhamento
+        alinhamentos[nome].flags.writeable = False
+        origens[nome] = trad['texto'] if trad['texto'] is not None else cache_path(trad['chave'], cache_dir)
+    return MappingProxyType({
+        'nomes': list(alinhamentos),
+        'alinhamentos': alinhamentos,
+        'cobertura': {nome: float((a >= 0).mean()) if len(a) else 0.0 for nome, a in alinhamentos.items()},
+        'avisos': avisos,
+        '_origens': origens,
+        # Colunas carregadas (LRU) e índices de cada tradução, descartados juntos
+        '_carregadas': OrderedDict(),
+        '_lock': threading.RLock(),
+    })
+
+
+def _read_text_column(origem):
+    if isinstance(origem, list):
+        return pd.array(origem, dtype='str')
+    return pq.read_table(origem, columns=['Texto'], memory_map=True).column('Texto').to_pandas().astype('str').array
+
+
+def _translation_entry(store, nome):
+    carregadas = store['_carregadas']
+    with store['_lock']:
+        if nome in carregadas:
+            carregadas.move_to_end(nome)
+            return carregadas[nome]
+        texto = _read_text_column(store['_origens'][nome])
+        alinhamento = store['alinhamentos'][nome]
+        # Texto já na ordem da Bíblia principal: posições iguais nas duas
+        alinhado = pd.Series(texto.take(np.where(alinhamento >= 0, alinhamento, 0)), dtype='str')
+        alinhado[alinhamento < 0] = ''
+        carregadas[nome] = {'texto': alinhado}
+        while len(carregadas) > MAX_TRADUCOES_CARREGADAS:
+            carregadas.popitem(last=False)
+        return carregadas[nome]
+
+
+def aligned_text(store, nome):
+    return _translation_entry(store, nome)['texto']
+
+
+def _translation_component(store, nome, componente, builder):
+    entrada = _translation_entry(store, nome)
+    with store['_lock']:
+        if componente not in entrada:
+            entrada[componente] = builder(entrada['texto'])
+        return entrada[componente]
+
+
+def translation_search_index(store, nome):
+    return _translation_component(store, nome, 'busca', build_inverted_index)
+
+
+def translation_ranking_index(store, nome):
+    return _translation_component(store, nome, 'bm25', build_bm25_index)
+
+
+def side_by_side(store, nomes, posicoes):
+    # Textos das traduções para as posições (iloc) da principal, sem join
+    return {nome: aligned_text(store, nome).iloc[posicoes].tolist() for nome in nomes}